@@ -1,11 +1,11 @@
 import json
 
 from Poem.api import serializers
-from Poem.api.internal_views.utils import sync_webapi
 from Poem.api.views import NotFound
 from Poem.helpers.history_helpers import create_profile_history
+from Poem.helpers.webapi_sync import request_sync, sync_forced, \
+    AGGREGATION_PROFILES
 from Poem.poem import models as poem_models
-from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from rest_framework import status
 from rest_framework.authentication import SessionAuthentication
@@ -203,7 +203,15 @@ class ListAggregations(APIView):
             )
 
     def get(self, request, aggregation_name=None):
-        sync_webapi(settings.WEBAPI_AGGREGATION, poem_models.Aggregation)
+        try:
+            request_sync(AGGREGATION_PROFILES, force=sync_forced(request))
+
+        except Exception as e:
+            return error_response(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail='Error syncing aggregation profiles with WEB-API: '
+                       '{}'.format(str(e))
+            )
 
         if aggregation_name:
             try:
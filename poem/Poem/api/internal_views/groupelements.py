@@ -1,5 +1,5 @@
 from Poem.api.views import NotFound
-from Poem.helpers.history_helpers import create_history
+from Poem.helpers.history_helpers import create_histories
 from Poem.poem import models as poem_models
 from django.db import IntegrityError
 from rest_framework import status
@@ -40,12 +40,13 @@ class ListMetricsInGroup(APIView):
                     name=request.data['name']
                 )
 
+                changed = []
                 for name in dict(request.data)['items']:
                     metric = poem_models.Metric.objects.get(name=name)
                     if metric.group != group:
                         metric.group = group
                         metric.save()
-                        create_history(metric, request.user.username)
+                        changed.append(metric)
 
                 # remove the metrics that existed before, and now were removed
                 metrics = poem_models.Metric.objects.filter(group=group)
@@ -53,7 +54,9 @@ class ListMetricsInGroup(APIView):
                     if metric.name not in dict(request.data)['items']:
                         metric.group = None
                         metric.save()
-                        create_history(metric, request.user.username)
+                        changed.append(metric)
+
+                create_histories(changed, request.user.username)
 
                 return Response(status=status.HTTP_201_CREATED)
 
@@ -76,11 +79,14 @@ class ListMetricsInGroup(APIView):
                 )
 
                 if 'items' in dict(request.data):
+                    changed = []
                     for name in dict(request.data)['items']:
                         metric = poem_models.Metric.objects.get(name=name)
                         metric.group = group
                         metric.save()
-                        create_history(metric, request.user.username)
+                        changed.append(metric)
+
+                    create_histories(changed, request.user.username)
 
             except IntegrityError:
                 return error_response(
@@ -1,99 +1,124 @@
 import datetime
 
 from Poem.api.internal_views.utils import one_value_inline, \
-    two_value_inline
+    two_value_inline, iterate_in_order, list_response
 from Poem.api.views import NotFound
 from Poem.helpers.versioned_comments import new_comment
 from Poem.poem_super_admin import models as admin_models
 from rest_framework.authentication import SessionAuthentication
-from rest_framework.response import Response
 from rest_framework.views import APIView
 
 
+def _serialize_version(obj, ver):
+    if obj == 'probe':
+        version = ver.package.version
+        fields = {
+            'name': ver.name,
+            'version': ver.package.version,
+            'package': ver.package.__str__(),
+            'description': ver.description,
+            'comment': ver.comment,
+            'repository': ver.repository,
+            'docurl': ver.docurl
+        }
+    else:
+        if ver.probekey:
+            probekey = ver.probekey.__str__()
+            version = ver.probekey.__str__().split(' ')[1][1:-1]
+        else:
+            probekey = ''
+            version = datetime.datetime.strftime(
+                ver.date_created, '%Y%m%d-%H%M%S'
+            )
+        fields = {
+            'name': ver.name,
+            'mtype': ver.mtype.name,
+            'tags': [tag.name for tag in ver.tags.all()],
+            'probeversion': probekey,
+            'description': ver.description,
+            'parent': one_value_inline(ver.parent),
+            'probeexecutable': one_value_inline(
+                ver.probeexecutable
+            ),
+            'config': two_value_inline(ver.config),
+            'attribute': two_value_inline(ver.attribute),
+            'dependency': two_value_inline(ver.dependency),
+            'flags': two_value_inline(ver.flags),
+            'files': two_value_inline(ver.files),
+            'parameter': two_value_inline(ver.parameter),
+            'fileparameter': two_value_inline(ver.fileparameter)
+        }
+
+    return dict(
+        id=ver.id,
+        object_repr=ver.__str__(),
+        fields=fields,
+        user=ver.version_user,
+        date_created=datetime.datetime.strftime(
+            ver.date_created, '%Y-%m-%d %H:%M:%S'
+        ),
+        comment=new_comment(ver.version_comment),
+        version=version
+    )
+
+
+def _object_repr(obj, values):
+    # the same as __str__() of history entry, built from values_list()
+    if obj == 'probe':
+        return u'%s (%s)' % (values[1], values[2])
+
+    elif values[2] is not None:
+        return u'%s [%s (%s)]' % (values[1], values[2], values[3])
+
+    else:
+        return u'%s' % values[1]
+
+
 class ListVersions(APIView):
     authentication_classes = (SessionAuthentication,)
 
     def get(self, request, obj, name=None):
-        history_model = {
-            'probe': admin_models.ProbeHistory,
-            'metrictemplate': admin_models.MetricTemplateHistory
-        }
+        if obj == 'probe':
+            vers = admin_models.ProbeHistory.objects.select_related('package')
+
+        else:
+            vers = admin_models.MetricTemplateHistory.objects.select_related(
+                'mtype', 'probekey__package'
+            ).prefetch_related('tags')
 
         if name:
-            history_instance = history_model[obj].objects.filter(name=name)
+            history_instance = vers.model.objects.filter(name=name)
 
             if history_instance.count() == 0:
                 raise NotFound(status=404, detail='Version not found')
 
             else:
-                instance = history_instance[0].object_id
-
-                vers = history_model[obj].objects.filter(
-                    object_id=instance
-                ).order_by('-date_created')
+                ids = list(vers.model.objects.filter(
+                    object_id=history_instance[0].object_id_id
+                ).order_by('-id').values_list('id', flat=True))
 
         else:
-            vers = history_model[obj].objects.all()
-
-        results = []
-        for ver in vers:
             if obj == 'probe':
-                version = ver.package.version
-                fields = {
-                    'name': ver.name,
-                    'version': ver.package.version,
-                    'package': ver.package.__str__(),
-                    'description': ver.description,
-                    'comment': ver.comment,
-                    'repository': ver.repository,
-                    'docurl': ver.docurl
-                }
+                values = vers.model.objects.values_list(
+                    'id', 'name', 'package__version'
+                )
+
             else:
-                if ver.probekey:
-                    probekey = ver.probekey.__str__()
-                    version = ver.probekey.__str__().split(' ')[1][1:-1]
-                else:
-                    probekey = ''
-                    version = datetime.datetime.strftime(
-                        ver.date_created, '%Y%m%d-%H%M%S'
-                    )
-                fields = {
-                    'name': ver.name,
-                    'mtype': ver.mtype.name,
-                    'tags': [tag.name for tag in ver.tags.all()],
-                    'probeversion': probekey,
-                    'description': ver.description,
-                    'parent': one_value_inline(ver.parent),
-                    'probeexecutable': one_value_inline(
-                        ver.probeexecutable
-                    ),
-                    'config': two_value_inline(ver.config),
-                    'attribute': two_value_inline(ver.attribute),
-                    'dependency': two_value_inline(ver.dependency),
-                    'flags': two_value_inline(ver.flags),
-                    'files': two_value_inline(ver.files),
-                    'parameter': two_value_inline(ver.parameter),
-                    'fileparameter': two_value_inline(ver.fileparameter)
-                }
-
-            results.append(dict(
-                id=ver.id,
-                object_repr=ver.__str__(),
-                fields=fields,
-                user=ver.version_user,
-                date_created=datetime.datetime.strftime(
-                    ver.date_created, '%Y-%m-%d %H:%M:%S'
-                ),
-                comment=new_comment(ver.version_comment),
-                version=version
-            ))
+                values = vers.model.objects.values_list(
+                    'id', 'name', 'probekey__name', 'probekey__package__version'
+                )
 
-        if name:
-            results = sorted(results, key=lambda k: k['id'], reverse=True)
-        else:
-            results = sorted(results, key=lambda k: k['object_repr'])
+            ids = [
+                item[0] for item in sorted(
+                    values, key=lambda k: _object_repr(obj, k)
+                )
+            ]
 
-        return Response(results)
+        return list_response(
+            (_serialize_version(obj, ver)
+             for ver in iterate_in_order(vers, ids)),
+            len(ids)
+        )
 
 
 class ListPublicVersions(ListVersions):
@@ -0,0 +1,36 @@
+import json
+
+from Poem.api.views import NotFound
+from Poem.poem_super_admin.models import Job
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+class ListJobs(APIView):
+    authentication_classes = (SessionAuthentication,)
+
+    def get(self, request, job_id):
+        try:
+            job = Job.objects.get(
+                id=job_id, schema_name=request.tenant.schema_name
+            )
+
+        except Job.DoesNotExist:
+            raise NotFound(status=404, detail='Job not found')
+
+        if not request.user.is_superuser and \
+                job.user != request.user.username:
+            raise NotFound(status=404, detail='Job not found')
+
+        return Response({
+            'id': job.id,
+            'name': job.name,
+            'status': job.status,
+            'progress': job.progress,
+            'status_code': job.status_code,
+            'result': json.loads(job.result) if job.result else None,
+            'date_created': job.date_created,
+            'date_started': job.date_started,
+            'date_finished': job.date_finished
+        })
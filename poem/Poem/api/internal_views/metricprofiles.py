@@ -1,9 +1,11 @@
 from Poem.api import serializers
-from Poem.api.internal_views.utils import sync_webapi
 from Poem.api.views import NotFound
 from Poem.helpers.history_helpers import create_profile_history
+from Poem.helpers.metrics_helpers import get_metrics_in_profiles
+from Poem.helpers.webapi_cache import invalidate_metric_profiles
+from Poem.helpers.webapi_sync import request_sync, sync_forced, \
+    METRIC_PROFILES
 from Poem.poem import models as poem_models
-from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from rest_framework import status
 from rest_framework.authentication import SessionAuthentication
@@ -78,6 +80,7 @@ class ListMetricProfiles(APIView):
                             profile, dict(request.data)['services'],
                             request.user, request.data['description']
                         )
+                        invalidate_metric_profiles()
 
                         return Response(
                             serializer.data, status=status.HTTP_201_CREATED
@@ -108,7 +111,15 @@ class ListMetricProfiles(APIView):
                 )
 
     def get(self, request, profile_name=None):
-        sync_webapi(settings.WEBAPI_METRIC, poem_models.MetricProfiles)
+        try:
+            request_sync(METRIC_PROFILES, force=sync_forced(request))
+
+        except Exception as e:
+            return error_response(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail='Error syncing metric profiles with WEB-API: '
+                       '{}'.format(str(e))
+            )
 
         if profile_name:
             try:
@@ -202,6 +213,7 @@ class ListMetricProfiles(APIView):
                                     profile, dict(request.data)['services'],
                                     request.user, request.data['description']
                                 )
+                                invalidate_metric_profiles()
 
                                 return Response(status=status.HTTP_201_CREATED)
 
@@ -268,6 +280,7 @@ class ListMetricProfiles(APIView):
                             ).delete()
 
                             profile.delete()
+                            invalidate_metric_profiles()
 
                             return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -310,3 +323,22 @@ class ListPublicMetricProfiles(ListMetricProfiles):
 
     def delete(self, request, profile_name):
         return self._denied()
+
+
+class ListMetricsInProfiles(APIView):
+    authentication_classes = (SessionAuthentication,)
+
+    def get(self, request, metric_name=None):
+        metrics = get_metrics_in_profiles(request.tenant.schema_name)
+
+        if metric_name:
+            return Response({
+                'metric': metric_name,
+                'profiles': metrics.get(metric_name, [])
+            })
+
+        else:
+            return Response([
+                {'metric': metric, 'profiles': metrics[metric]}
+                for metric in sorted(metrics, key=str.lower)
+            ])
@@ -2,12 +2,13 @@ import json
 
 import requests
 from Poem.api.internal_views.utils import one_value_inline, two_value_inline, \
-    inline_metric_for_db
+    inline_metric_for_db, iterate_in_order, list_response
 from Poem.api.views import NotFound
 from Poem.helpers.history_helpers import create_history
+from Poem.helpers.jobs import background_job
 from Poem.helpers.metrics_helpers import import_metrics, \
-    update_metric_in_schema, get_metrics_in_profiles, \
-    delete_metrics_from_profile
+    get_metrics_in_profiles, delete_metrics_from_profile, \
+    plan_metrics_versions, update_metrics_from_history
 from Poem.poem import models as poem_models
 from Poem.poem_super_admin import models as admin_models
 from django.contrib.contenttypes.models import ContentType
@@ -37,65 +38,65 @@ class ListPublicAllMetrics(ListAllMetrics):
     permission_classes = ()
 
 
+def _serialize_metric(metric):
+    if metric.probekey:
+        probeversion = metric.probekey.__str__()
+    else:
+        probeversion = ''
+
+    if metric.group:
+        group = metric.group.name
+    else:
+        group = ''
+
+    return dict(
+        id=metric.id,
+        name=metric.name,
+        mtype=metric.mtype.name,
+        tags=[tag.name for tag in metric.tags.all()],
+        probeversion=probeversion,
+        group=group,
+        description=metric.description,
+        parent=one_value_inline(metric.parent),
+        probeexecutable=one_value_inline(metric.probeexecutable),
+        config=two_value_inline(metric.config),
+        attribute=two_value_inline(metric.attribute),
+        dependancy=two_value_inline(metric.dependancy),
+        flags=two_value_inline(metric.flags),
+        files=two_value_inline(metric.files),
+        parameter=two_value_inline(metric.parameter),
+        fileparameter=two_value_inline(metric.fileparameter)
+    )
+
+
 class ListMetric(APIView):
     authentication_classes = (SessionAuthentication,)
 
     def get(self, request, name=None):
+        metrics = poem_models.Metric.objects.select_related(
+            'mtype', 'probekey__package', 'group'
+        ).prefetch_related('tags')
+
         if name:
-            metrics = poem_models.Metric.objects.filter(name=name)
-            if metrics.count() == 0:
+            metrics = metrics.filter(name=name)
+            if len(metrics) == 0:
                 raise NotFound(status=404,
                                detail='Metric not found')
-        else:
-            metrics = poem_models.Metric.objects.all()
 
-        results = []
-        for metric in metrics:
-            config = two_value_inline(metric.config)
-            parent = one_value_inline(metric.parent)
-            probeexecutable = one_value_inline(metric.probeexecutable)
-            attribute = two_value_inline(metric.attribute)
-            dependancy = two_value_inline(metric.dependancy)
-            flags = two_value_inline(metric.flags)
-            files = two_value_inline(metric.files)
-            parameter = two_value_inline(metric.parameter)
-            fileparameter = two_value_inline(metric.fileparameter)
-
-            if metric.probekey:
-                probeversion = metric.probekey.__str__()
-            else:
-                probeversion = ''
+            return Response(_serialize_metric(metrics[0]))
 
-            if metric.group:
-                group = metric.group.name
-            else:
-                group = ''
-
-            results.append(dict(
-                id=metric.id,
-                name=metric.name,
-                mtype=metric.mtype.name,
-                tags=[tag.name for tag in metric.tags.all()],
-                probeversion=probeversion,
-                group=group,
-                description=metric.description,
-                parent=parent,
-                probeexecutable=probeexecutable,
-                config=config,
-                attribute=attribute,
-                dependancy=dependancy,
-                flags=flags,
-                files=files,
-                parameter=parameter,
-                fileparameter=fileparameter
-            ))
-
-        results = sorted(results, key=lambda k: k['name'])
+        ids = [
+            pk for pk, name in sorted(
+                poem_models.Metric.objects.values_list('id', 'name'),
+                key=lambda k: k[1]
+            )
+        ]
 
-        if name:
-            return Response(results[0])
-        else:
-            return Response(results)
+        return list_response(
+            (_serialize_metric(metric)
+             for metric in iterate_in_order(metrics, ids)),
+            len(ids)
+        )
 
     def put(self, request):
         try:
@@ -307,6 +308,9 @@ class ListPublicMetricTypes(ListMetricTypes):
 class ImportMetrics(APIView):
     authentication_classes = (SessionAuthentication,)
 
+    @background_job(
+        'import_metrics', allowed=lambda request: request.user.is_superuser
+    )
     def post(self, request):
         if request.user.is_superuser:
             imported, warn, err, unavailable = import_metrics(
@@ -418,73 +422,48 @@ class UpdateMetricsVersions(APIView):
                 name=name, version=version
             )
 
+            plan = plan_metrics_versions(package)
+
             # warning for metrics if there is no metric template history for
             # metric templates of that name
-            warning_no_tbh = []
+            warning_no_tbh = plan['no_history']
             # metrics deleted because they are not available in the given
             # package
-            deleted_not_in_package = []
+            deleted_not_in_package = plan['deleted']
             # updated metrics
-            updated = []
+            updated = [metric for metric, mt_id in plan['updated']]
             profile_warning = []
-            for metric in poem_models.Metric.objects.all():
-                if metric.probekey and \
-                        metric.probekey.package.name == package.name:
-                    mts_history = \
-                        admin_models.MetricTemplateHistory.objects.filter(
-                            name=metric.name
+            if dry_run:
+                for metric in deleted_not_in_package:
+                    value = metrics.get(metric)
+                    if not value:
+                        continue
+
+                    if len(value) == 1:
+                        profile_warning.append(
+                            'Metric {} is part of {} metric profile.'.format(
+                                metric, value[0]
+                            )
                         )
-                    if len(mts_history) > 0:
-                        mts = admin_models.MetricTemplateHistory.objects.filter(
-                            object_id=mts_history[0].object_id
+
+                    else:
+                        profile_warning.append(
+                            'Metric {} is part of {} metric profiles.'.format(
+                                metric, ', '.join(value)
+                            )
                         )
-                        metrictemplate = None
-                        for mt in mts:
-                            if mt.probekey.package == package:
-                                metrictemplate = mt
-                                break
-
-                        if metrictemplate:
-                            if not dry_run:
-                                update_metric_in_schema(
-                                    mt_id=metrictemplate.id,
-                                    name=metric.name,
-                                    pk_id=metric.probekey.id,
-                                    schema=schema,
-                                    update_from_history=True,
-                                    user=user
-                                )
-                            updated.append(metric.name)
 
-                        else:
-                            if dry_run:
-                                for key, value in metrics.items():
-                                    if metric.name == key:
-                                        if len(value) == 1:
-                                            profile_warning.append(
-                                                'Metric {} is part of {} '
-                                                'metric profile.'.format(
-                                                    metric.name, value[0]
-                                                )
-                                            )
-
-                                        else:
-                                            profile_warning.append(
-                                                'Metric {} is part of {} '
-                                                'metric profiles.'.format(
-                                                    metric.name, ', '.join(
-                                                        value
-                                                    )
-                                                )
-                                            )
-
-                            else:
-                                metric.delete()
-
-                            deleted_not_in_package.append(metric.name)
+            else:
+                if plan['updated']:
+                    update_metrics_from_history(
+                        updates=[tuple(item) for item in plan['updated']],
+                        schema=schema, user=user
+                    )
 
-                    else:
-                        warning_no_tbh.append(metric.name)
+                if deleted_not_in_package:
+                    poem_models.Metric.objects.filter(
+                        name__in=deleted_not_in_package
+                    ).delete()
 
             msg = dict()
             if deleted_not_in_package:
@@ -611,6 +590,10 @@ class UpdateMetricsVersions(APIView):
 
         return Response(msg, status=status_code)
 
+    @background_job(
+        'update_metrics_versions',
+        allowed=lambda request: request.user.is_superuser
+    )
     def put(self, request):
         if request.user.is_superuser:
             msg, status_code, deleted = self._handle_metrics(
@@ -1,16 +1,20 @@
 import json
+import threading
 
 from Poem.api.internal_views.utils import one_value_inline, two_value_inline, \
-    inline_metric_for_db
+    inline_metric_for_db, list_response
 from Poem.api.views import NotFound
 from Poem.helpers.history_helpers import create_history, update_comment
+from Poem.helpers.jobs import background_job
 from Poem.helpers.metrics_helpers import update_metrics, \
-    get_metrics_in_profiles, delete_metrics_from_profile
+    get_metrics_in_profiles, delete_metrics_from_profiles, delete_metrics
+from Poem.helpers.tenant_helpers import tenant_schemas, fan_out
 from Poem.poem.models import Metric, TenantHistory
 from Poem.poem_super_admin import models as admin_models
 from Poem.tenants.models import Tenant
 from django.contrib.contenttypes.models import ContentType
 from django.db import IntegrityError
+from django.db.models import Prefetch
 from rest_framework import status
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.response import Response
@@ -20,107 +24,118 @@ from tenant_schemas.utils import get_public_schema_name, schema_context
 from .utils import error_response
 
 
+# public listing of metric templates, with public content version it is
+# built for
+_public_listing = dict()
+_public_listing_lock = threading.Lock()
+
+
+def _serialize_metrictemplate(metrictemplate):
+    if metrictemplate.probekey:
+        ostag = [
+            repo.tag.name for repo in
+            metrictemplate.probekey.package.repos.all()
+        ]
+        probeversion = metrictemplate.probekey.__str__()
+
+    else:
+        ostag = []
+        probeversion = ''
+
+    return dict(
+        id=metrictemplate.id,
+        name=metrictemplate.name,
+        mtype=metrictemplate.mtype.name,
+        ostag=ostag,
+        tags=sorted([tag.name for tag in metrictemplate.tags.all()]),
+        probeversion=probeversion,
+        description=metrictemplate.description,
+        parent=one_value_inline(metrictemplate.parent),
+        probeexecutable=one_value_inline(metrictemplate.probeexecutable),
+        config=two_value_inline(metrictemplate.config),
+        attribute=two_value_inline(metrictemplate.attribute),
+        dependency=two_value_inline(metrictemplate.dependency),
+        flags=two_value_inline(metrictemplate.flags),
+        files=two_value_inline(metrictemplate.files),
+        parameter=two_value_inline(metrictemplate.parameter),
+        fileparameter=two_value_inline(metrictemplate.fileparameter)
+    )
+
+
+def _metrictemplates_queryset():
+    return admin_models.MetricTemplate.objects.select_related(
+        'mtype', 'probekey__package'
+    ).prefetch_related(
+        'tags',
+        Prefetch(
+            'probekey__package__repos',
+            queryset=admin_models.YumRepo.objects.select_related('tag')
+        )
+    )
+
+
+def get_public_listing():
+    """
+    Returns serialized metric templates sorted by name. Listing is built once
+    per change of public data, since it is the same for all the tenants.
+    """
+    version = admin_models.ContentVersion.objects.filter(
+        schema_name=get_public_schema_name()
+    ).values_list('version', 'date_modified').first()
+
+    with _public_listing_lock:
+        if version and _public_listing.get('version') == version:
+            return _public_listing['results']
+
+    results = sorted(
+        [_serialize_metrictemplate(mt) for mt in _metrictemplates_queryset()],
+        key=lambda k: k['name']
+    )
+
+    if version:
+        with _public_listing_lock:
+            _public_listing['version'] = version
+            _public_listing['results'] = results
+
+    return results
+
+
 class ListMetricTemplates(APIView):
     authentication_classes = (SessionAuthentication,)
 
     def get(self, request, name=None):
-        public_tenant = None
-        importable = None
         if name:
-            metrictemplates = admin_models.MetricTemplate.objects.filter(
-                name=name
-            )
-            if metrictemplates.count() == 0:
+            metrictemplates = _metrictemplates_queryset().filter(name=name)
+            if len(metrictemplates) == 0:
                 raise NotFound(status=404, detail='Metric template not found')
-        else:
-            public_tenant = Tenant.objects.get(
-                schema_name=get_public_schema_name()
-            )
-            metrictemplates = admin_models.MetricTemplate.objects.all()
-            if request.tenant != public_tenant:
-                avail_metrics = Metric.objects.all().values_list(
-                    'name', flat=True
-                )
-                importable = dict()
-                for metrictemplate in metrictemplates:
-                    if metrictemplate.name in avail_metrics:
-                        importable[metrictemplate.name] = False
-                    else:
-                        importable[metrictemplate.name] = True
 
-        results = []
-        for metrictemplate in metrictemplates:
-            config = two_value_inline(metrictemplate.config)
-            parent = one_value_inline(metrictemplate.parent)
-            probeexecutable = one_value_inline(metrictemplate.probeexecutable)
-            attribute = two_value_inline(metrictemplate.attribute)
-            dependency = two_value_inline(metrictemplate.dependency)
-            flags = two_value_inline(metrictemplate.flags)
-            files = two_value_inline(metrictemplate.files)
-            parameter = two_value_inline(metrictemplate.parameter)
-            fileparameter = two_value_inline(metrictemplate.fileparameter)
-
-            ostag = []
-            if metrictemplate.probekey:
-                for repo in metrictemplate.probekey.package.repos.all():
-                    ostag.append(repo.tag.name)
-
-            tags = []
-            for tag in metrictemplate.tags.all():
-                tags.append(tag.name)
-
-            if metrictemplate.probekey:
-                probeversion = metrictemplate.probekey.__str__()
-            else:
-                probeversion = ''
+            result = _serialize_metrictemplate(metrictemplates[0])
+            del result['ostag']
+            return Response(result)
 
-            if not name and request.tenant != public_tenant:
-                results.append(dict(
-                    id=metrictemplate.id,
-                    name=metrictemplate.name,
-                    importable=importable[metrictemplate.name],
-                    mtype=metrictemplate.mtype.name,
-                    ostag=ostag,
-                    tags=sorted(tags),
-                    probeversion=probeversion,
-                    description=metrictemplate.description,
-                    parent=parent,
-                    probeexecutable=probeexecutable,
-                    config=config,
-                    attribute=attribute,
-                    dependency=dependency,
-                    flags=flags,
-                    files=files,
-                    parameter=parameter,
-                    fileparameter=fileparameter
-                ))
-            else:
-                results.append(dict(
-                    id=metrictemplate.id,
-                    name=metrictemplate.name,
-                    mtype=metrictemplate.mtype.name,
-                    ostag=ostag,
-                    tags=sorted(tags),
-                    probeversion=probeversion,
-                    description=metrictemplate.description,
-                    parent=parent,
-                    probeexecutable=probeexecutable,
-                    config=config,
-                    attribute=attribute,
-                    dependency=dependency,
-                    flags=flags,
-                    files=files,
-                    parameter=parameter,
-                    fileparameter=fileparameter
-                ))
-
-        results = sorted(results, key=lambda k: k['name'])
+        results = get_public_listing()
 
-        if name:
-            del results[0]['ostag']
-            return Response(results[0])
-        else:
-            return Response(results)
+        if request.tenant.schema_name == get_public_schema_name():
+            return list_response(results, len(results))
+
+        avail_metrics = set(
+            Metric.objects.all().values_list('name', flat=True)
+        )
+
+        return list_response(
+            (
+                dict(
+                    id=item['id'],
+                    name=item['name'],
+                    importable=item['name'] not in avail_metrics,
+                    **dict(
+                        (key, value) for key, value in item.items()
+                        if key not in ['id', 'name']
+                    )
+                ) for item in results
+            ),
+            len(results)
+        )
 
     def post(self, request):
         if request.tenant.schema_name == get_public_schema_name() and \
@@ -394,6 +409,12 @@ class ListMetricTemplates(APIView):
                     admin_models.MetricTemplateHistory.objects.filter(
                         name=old_name, probekey=old_probekey
                     ).update(**new_data)
+                    admin_models.bump_content_version(
+                        get_public_schema_name()
+                    )
+                    admin_models.update_import_index(
+                        metrictemplates=[mt.id]
+                    )
 
                     history = admin_models.MetricTemplateHistory.objects.get(
                         name=request.data['name'], probekey=new_probekey
@@ -527,48 +548,37 @@ class ListMetricTemplatesForImport(APIView):
     authentication_classes = (SessionAuthentication,)
 
     def get(self, request):
-        metrictemplates = admin_models.MetricTemplate.objects.all().order_by(
-            'name'
-        )
+        metrictemplates = admin_models.MetricTemplate.objects.select_related(
+            'mtype', 'probekey__package'
+        ).prefetch_related('tags').order_by('name')
+
+        probeversions = dict()
+        for mt_id, ostag, probe, version in \
+                admin_models.MetricTemplateImportIndex.objects.values_list(
+                    'metrictemplate_id', 'ostag__name', 'probekey__name',
+                    'probekey__package__version'
+                ):
+            probeversions.setdefault(mt_id, dict()).update({
+                ostag: '{} ({})'.format(probe, version)
+            })
+
+        all_tags = None
 
         results = []
         for mt in metrictemplates:
-            vers = admin_models.MetricTemplateHistory.objects.filter(
-                object_id=mt
-            ).order_by('-date_created')
             if mt.probekey:
                 probeversion = mt.probekey.__str__()
-                tags = set()
-                probeversion_dict = dict()
-                for ver in vers:
-                    for repo in ver.probekey.package.repos.all():
-                        tags.add(repo.tag.name)
-                        if repo.tag.name not in probeversion_dict:
-                            probeversion_dict.update(
-                                {
-                                    repo.tag.name: ver.probekey.__str__()
-                                }
-                            )
-
-                tags = list(tags)
-
-                if 'CentOS 6' in probeversion_dict:
-                    centos6_probeversion = probeversion_dict['CentOS 6']
-                else:
-                    centos6_probeversion = ''
-
-                if 'CentOS 7' in probeversion_dict:
-                    centos7_probeversion = probeversion_dict['CentOS 7']
-                else:
-                    centos7_probeversion = ''
+                probeversion_dict = probeversions.get(mt.id, dict())
+                tags = list(probeversion_dict.keys())
 
             else:
-                tags = list(admin_models.OSTag.objects.all().values_list(
-                    'name', flat=True
-                ))
+                if all_tags is None:
+                    all_tags = list(admin_models.OSTag.objects.all(
+                    ).values_list('name', flat=True))
+
                 probeversion = ''
-                centos6_probeversion = ''
-                centos7_probeversion = ''
+                probeversion_dict = dict()
+                tags = list(all_tags)
 
             tags.sort()
             results.append(
@@ -577,8 +587,8 @@ class ListMetricTemplatesForImport(APIView):
                     mtype=mt.mtype.name,
                     tags=sorted([tag.name for tag in mt.tags.all()]),
                     probeversion=probeversion,
-                    centos6_probeversion=centos6_probeversion,
-                    centos7_probeversion=centos7_probeversion,
+                    centos6_probeversion=probeversion_dict.get('CentOS 6', ''),
+                    centos7_probeversion=probeversion_dict.get('CentOS 7', ''),
                     ostag=tags
                 )
             )
@@ -604,72 +614,75 @@ class ListMetricTemplatesForProbeVersion(APIView):
 class BulkDeleteMetricTemplates(APIView):
     authentication_classes = (SessionAuthentication,)
 
+    @background_job(
+        'delete_metric_templates',
+        allowed=lambda request:
+            request.tenant.schema_name == get_public_schema_name() and
+            request.user.is_superuser
+    )
     def post(self, request):
         if request.tenant.schema_name == get_public_schema_name() and \
                 request.user.is_superuser:
             metrictemplates = dict(request.data)['metrictemplates']
 
-            schemas = list(
-                Tenant.objects.all().values_list('schema_name', flat=True)
-            )
-            schemas.remove(get_public_schema_name())
+            schemas = tenant_schemas()
 
-            warning_message = []
-            for schema in schemas:
+            def delete(schema):
                 with schema_context(schema):
                     try:
                         mip = get_metrics_in_profiles(schema)
                     except Exception as e:
-                        warning_message.append(
-                            '{}: Metrics are not removed from metric profiles. '
-                            'Unable to get metric profiles: {}'.format(
-                                schema, str(e)
-                            )
-                        )
-                        continue
+                        return [
+                            '{}: Metrics are not removed from metric '
+                            'profiles. Unable to get metric profiles: '
+                            '{}'.format(schema, str(e))
+                        ]
+
+                    deleted = delete_metrics(metrictemplates)
 
-                    inter = set(metrictemplates).intersection(
-                        set(list(mip.keys()))
-                    )
                     profiles = dict()
                     for metric in metrictemplates:
-                        try:
-                            instance = Metric.objects.get(name=metric)
-                            TenantHistory.objects.filter(
-                                object_id=instance.id
-                            ).delete()
-                            instance.delete()
-
-                        except Metric.DoesNotExist:
+                        if metric not in deleted:
                             continue
 
-                        for key, value in mip.items():
-                            if metric in inter and key == metric:
-                                for p in value:
-                                    if p in profiles:
-                                        profiles.update(
-                                            {p: profiles[p] + [key]}
-                                        )
-                                    else:
-                                        profiles.update({p: [key]})
-
-                    if profiles:
-                        for key, value in profiles.items():
-                            try:
-                                delete_metrics_from_profile(key, value)
-
-                            except Exception as e:
-                                if len(value) > 1:
-                                    noun = 'Metrics {}'.format(', '.join(value))
-                                else:
-                                    noun = 'Metric {}'.format(value[0])
-
-                                warning_message.append(
-                                    '{}: {} not deleted from '
-                                    'profile {}: {}'.format(
-                                        schema, noun, key, str(e)
-                                    )
-                                )
+                        for p in mip.get(metric, []):
+                            profiles.setdefault(p, []).append(metric)
+
+                    if not profiles:
+                        return []
+
+                    errors = delete_metrics_from_profiles(profiles)
+
+                    warnings = []
+                    for key, value in profiles.items():
+                        if key not in errors:
+                            continue
+
+                        if len(value) > 1:
+                            noun = 'Metrics {}'.format(', '.join(value))
+                        else:
+                            noun = 'Metric {}'.format(value[0])
+
+                        warnings.append(
+                            '{}: {} not deleted from profile {}: {}'.format(
+                                schema, noun, key, str(errors[key])
+                            )
+                        )
+
+                    return warnings
+
+            results, errors = fan_out(delete, schemas)
+
+            warning_message = []
+            for schema in schemas:
+                warning_message.extend(results.get(schema, []))
+
+                if schema in errors:
+                    warning_message.append(
+                        '{}: Metrics not deleted: {}'.format(
+                            schema, str(errors[schema])
+                        )
+                    )
 
             response_message = dict()
             mt = admin_models.MetricTemplate.objects.filter(
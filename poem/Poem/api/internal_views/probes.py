@@ -1,12 +1,13 @@
 import datetime
 
 from django.db import IntegrityError
-
-import json
+from django.db.models import Count
 
 from Poem.api.views import NotFound
-from Poem.helpers.history_helpers import create_history, update_comment
-from Poem.poem import models as poem_models
+from Poem.helpers.history_helpers import create_history, \
+    create_histories, update_comment
+from Poem.helpers.jobs import background_job
+from Poem.poem.models import expire_metricconfig_snapshot
 from Poem.poem_super_admin import models as admin_models
 from Poem.tenants.models import Tenant
 
@@ -53,15 +54,13 @@ class ListProbes(APIView):
                 raise NotFound(status=404, detail='Probe not found')
 
         else:
-            probes = admin_models.Probe.objects.all()
+            # nv is number of probe revisions
+            probes = admin_models.Probe.objects.select_related(
+                'package'
+            ).annotate(nv=Count('probehistory'))
 
             results = []
             for probe in probes:
-                # number of probe revisions
-                nv = admin_models.ProbeHistory.objects.filter(
-                    object_id=probe
-                ).count()
-
                 results.append(
                     dict(
                         name=probe.name,
@@ -71,7 +70,7 @@ class ListProbes(APIView):
                         description=probe.description,
                         comment=probe.comment,
                         repository=probe.repository,
-                        nv=nv
+                        nv=probe.nv
                     )
                 )
 
@@ -79,12 +78,13 @@ class ListProbes(APIView):
 
             return Response(results)
 
+    @background_job(
+        'update_probe',
+        allowed=lambda request:
+            request.tenant.schema_name == get_public_schema_name() and
+            request.user.is_superuser
+    )
     def put(self, request):
-        schemas = list(
-            Tenant.objects.all().values_list('schema_name', flat=True)
-        )
-        schemas.remove(get_public_schema_name())
-
         if request.tenant.schema_name == get_public_schema_name() and \
                 request.user.is_superuser:
             try:
@@ -117,16 +117,18 @@ class ListProbes(APIView):
                                 probekey__package__version=old_version
                             )
 
+                        probekey = admin_models.ProbeHistory.objects.get(
+                            name=probe.name,
+                            package__version=probe.package.version
+                        )
+                        metrictemplates = list(metrictemplates)
                         for metrictemplate in metrictemplates:
-                            metrictemplate.probekey = \
-                                admin_models.ProbeHistory.objects.get(
-                                    name=probe.name,
-                                    package__version=probe.package.version
-                                )
+                            metrictemplate.probekey = probekey
                             metrictemplate.save()
-                            create_history(
-                                metrictemplate, request.user.username
-                            )
+
+                        create_histories(
+                            metrictemplates, request.user.username
+                        )
 
                 else:
                     history = admin_models.ProbeHistory.objects.filter(
@@ -155,36 +157,11 @@ class ListProbes(APIView):
                         )
                     })
                     history.update(**new_data)
-
-                    # update Metric history in case probekey name has changed:
-                    if request.data['name'] != old_name:
-                        for schema in schemas:
-                            with schema_context(schema):
-                                metrics = poem_models.Metric.objects.filter(
-                                    probekey=probekey
-                                )
-
-                                for metric in metrics:
-                                    vers = \
-                                        poem_models.TenantHistory.objects.filter(
-                                            object_id=metric.id
-                                        )
-
-                                    for ver in vers:
-                                        serialized_data = json.loads(
-                                            ver.serialized_data
-                                        )
-
-                                        serialized_data[0]['fields'][
-                                            'probekey'
-                                        ] = \
-                                            [request.data['name'],
-                                             package.version]
-
-                                        ver.serialized_data = json.dumps(
-                                            serialized_data
-                                        )
-                                        ver.save()
+                    expire_metricconfig_snapshot(all_schemas=True)
+                    admin_models.bump_content_version(
+                        get_public_schema_name()
+                    )
+                    admin_models.update_import_index(probekeys=[probekey])
 
                 return Response(status=status.HTTP_201_CREATED)
 
@@ -1,11 +1,11 @@
-from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 
 from Poem.api import serializers
-from Poem.api.internal_views.utils import sync_webapi
 from Poem.api.internal_views.users import get_all_groups, get_groups_for_user
 from Poem.api.views import NotFound
 from Poem.helpers.history_helpers import create_profile_history
+from Poem.helpers.webapi_sync import request_sync, sync_forced, \
+    REPORTS
 from Poem.poem import models as poem_models
 
 from rest_framework import status
@@ -69,7 +69,14 @@ class ListReports(APIView):
             )
 
     def get(self, request, report_name=None):
-        sync_webapi(settings.WEBAPI_REPORTS, poem_models.Reports)
+        try:
+            request_sync(REPORTS, force=sync_forced(request))
+
+        except Exception as e:
+            return error_response(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail='Error syncing reports with WEB-API: {}'.format(str(e))
+            )
 
         if report_name:
             try:
@@ -4,10 +4,12 @@ from django.contrib.contenttypes.models import ContentType
 
 import json
 
-from Poem.api.internal_views.utils import one_value_inline, two_value_inline
+from Poem.api.internal_views.utils import one_value_inline, \
+    two_value_inline, list_response, STREAMING_CHUNK_SIZE
 from Poem.api.views import NotFound
 from Poem.helpers.versioned_comments import new_comment
 from Poem.poem import models as poem_models
+from Poem.poem_super_admin import models as admin_models
 
 from rest_framework import status
 from rest_framework.authentication import SessionAuthentication
@@ -15,6 +17,153 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 
+def _probe_version(probekey, probe_versions):
+    if not probekey:
+        return ''
+
+    # versions stored before probe versions were referenced by id
+    if len(probekey) == 2:
+        return '{} ({})'.format(*probekey)
+
+    # names are resolved once per probe version, they are shared by many
+    # versions of metric; stored ones are shown if it has been deleted
+    pk, name, version = probekey
+    if pk not in probe_versions:
+        probe_versions[pk] = admin_models.ProbeHistory.objects.filter(
+            id=pk
+        ).values_list('name', 'package__version').first()
+
+    return '{} ({})'.format(*(probe_versions[pk] or (name, version)))
+
+
+def _serialize_tenant_version(obj, ver, serialized_data, probe_versions):
+    version = datetime.datetime.strftime(
+        ver.date_created, '%Y%m%d-%H%M%S'
+    )
+    fields0 = serialized_data[0]['fields']
+
+    if isinstance(obj, poem_models.Metric):
+        probeversion = _probe_version(fields0['probekey'], probe_versions)
+
+        if 'description' in fields0:
+            description = fields0['description']
+        else:
+            description = ''
+
+        if 'group' in fields0 and fields0['group']:
+            group = fields0['group'][0]
+
+        else:
+            group = ''
+
+        tags = []
+        if 'tags' in fields0:
+            tags = [tag[0] for tag in fields0['tags']]
+
+        fields = {
+            'name': fields0['name'],
+            'mtype': fields0['mtype'][0],
+            'tags': tags,
+            'group': group,
+            'probeversion': probeversion,
+            'description': description,
+            'parent': one_value_inline(fields0['parent']),
+            'probeexecutable': one_value_inline(
+                fields0['probeexecutable']
+            ),
+            'config': two_value_inline(fields0['config']),
+            'attribute': two_value_inline(
+                fields0['attribute']
+            ),
+            'dependancy': two_value_inline(
+                fields0['dependancy']
+            ),
+            'flags': two_value_inline(fields0['flags']),
+            'files': two_value_inline(fields0['files']),
+            'parameter': two_value_inline(
+                fields0['parameter']
+            ),
+            'fileparameter': two_value_inline(
+                fields0['fileparameter']
+            )
+        }
+
+    elif isinstance(obj, poem_models.MetricProfiles):
+        mi = [
+            {
+                'service': item[0], 'metric': item[1]
+            } for item in fields0['metricinstances']
+        ]
+        fields = {
+            'name': fields0['name'],
+            'groupname': fields0['groupname'],
+            'description': fields0.get('description', ''),
+            'apiid': fields0['apiid'],
+            'metricinstances': sorted(
+                mi, key=lambda k: k['service'].lower()
+            )
+        }
+
+    else:
+        fields = fields0
+
+    try:
+        comment = []
+        untracked_fields = [
+            'mtype', 'parent', 'probeexecutable',
+            'attribute', 'dependancy', 'flags', 'files',
+            'parameter', 'fileparameter'
+        ]
+        if isinstance(obj, poem_models.Metric):
+            untracked_fields.append('name')
+
+        for item in json.loads(ver.comment):
+            if 'changed' in item:
+                action = 'changed'
+
+            elif 'added' in item:
+                action = 'added'
+
+            else:
+                action = 'deleted'
+
+            if 'object' not in item[action]:
+                new_fields = []
+                for field in item[action]['fields']:
+                    if field not in untracked_fields:
+                        new_fields.append(field)
+
+                if new_fields:
+                    comment.append(
+                        {action: {'fields': new_fields}}
+                    )
+
+            else:
+                if item[action]['fields'][0] not in \
+                        untracked_fields:
+                    if item[action]['fields'][0] == 'config':
+                        if 'path' in item[action]['object']:
+                            item[action]['object'].remove('path')
+                    comment.append(item)
+
+        comment = json.dumps(comment)
+
+    except json.JSONDecodeError:
+        comment = ver.comment
+
+    return dict(
+        id=ver.id,
+        object_repr=ver.object_repr,
+        fields=fields,
+        user=ver.user,
+        date_created=datetime.datetime.strftime(
+            ver.date_created, '%Y-%m-%d %H:%M:%S'
+        ),
+        comment=new_comment(comment),
+        version=version
+    )
+
+
 class ListTenantVersions(APIView):
     authentication_classes = (SessionAuthentication,)
 
@@ -45,147 +194,21 @@ class ListTenantVersions(APIView):
             vers = poem_models.TenantHistory.objects.filter(
                 object_id=obj.id,
                 content_type=ct
-            ).order_by('date_created')
+            ).order_by('-id')
+            count = vers.count()
 
-            if vers.count() == 0:
+            if count == 0:
                 raise NotFound(status=404, detail='Version not found.')
 
             else:
-                results = []
-                for ver in vers:
-                    version = datetime.datetime.strftime(
-                        ver.date_created, '%Y%m%d-%H%M%S'
-                    )
-                    fields0 = json.loads(ver.serialized_data)[0]['fields']
-
-                    if isinstance(obj, poem_models.Metric):
-                        if fields0['probekey']:
-                            probeversion = '{} ({})'.format(
-                                fields0['probekey'][0], fields0['probekey'][1]
-                            )
-                        else:
-                            probeversion = ''
-
-                        if 'description' in fields0:
-                            description = fields0['description']
-                        else:
-                            description = ''
-
-                        if 'group' in fields0 and fields0['group']:
-                            group = fields0['group'][0]
-
-                        else:
-                            group = ''
-
-                        tags = []
-                        if 'tags' in fields0:
-                            tags = [tag[0] for tag in fields0['tags']]
-
-                        fields = {
-                            'name': fields0['name'],
-                            'mtype': fields0['mtype'][0],
-                            'tags': tags,
-                            'group': group,
-                            'probeversion': probeversion,
-                            'description': description,
-                            'parent': one_value_inline(fields0['parent']),
-                            'probeexecutable': one_value_inline(
-                                fields0['probeexecutable']
-                            ),
-                            'config': two_value_inline(fields0['config']),
-                            'attribute': two_value_inline(
-                                fields0['attribute']
-                            ),
-                            'dependancy': two_value_inline(
-                                fields0['dependancy']
-                            ),
-                            'flags': two_value_inline(fields0['flags']),
-                            'files': two_value_inline(fields0['files']),
-                            'parameter': two_value_inline(
-                                fields0['parameter']
-                            ),
-                            'fileparameter': two_value_inline(
-                                fields0['fileparameter']
-                            )
-                        }
-
-                    elif isinstance(obj, poem_models.MetricProfiles):
-                        mi = [
-                            {
-                                'service': item[0], 'metric': item[1]
-                            } for item in fields0['metricinstances']
-                        ]
-                        fields = {
-                            'name': fields0['name'],
-                            'groupname': fields0['groupname'],
-                            'description': fields0.get('description', ''),
-                            'apiid': fields0['apiid'],
-                            'metricinstances': sorted(
-                                mi, key=lambda k: k['service'].lower()
-                            )
-                        }
-
-                    else:
-                        fields = fields0
-
-                    try:
-                        comment = []
-                        untracked_fields = [
-                            'mtype', 'parent', 'probeexecutable',
-                            'attribute', 'dependancy', 'flags', 'files',
-                            'parameter', 'fileparameter'
-                        ]
-                        if isinstance(obj, poem_models.Metric):
-                            untracked_fields.append('name')
-
-                        for item in json.loads(ver.comment):
-                            if 'changed' in item:
-                                action = 'changed'
-
-                            elif 'added' in item:
-                                action = 'added'
-
-                            else:
-                                action = 'deleted'
-
-                            if 'object' not in item[action]:
-                                new_fields = []
-                                for field in item[action]['fields']:
-                                    if field not in untracked_fields:
-                                        new_fields.append(field)
-
-                                if new_fields:
-                                    comment.append(
-                                        {action: {'fields': new_fields}}
-                                    )
-
-                            else:
-                                if item[action]['fields'][0] not in \
-                                        untracked_fields:
-                                    if item[action]['fields'][0] == 'config':
-                                        if 'path' in item[action]['object']:
-                                            item[action]['object'].remove('path')
-                                    comment.append(item)
-
-                        comment = json.dumps(comment)
-
-                    except json.JSONDecodeError:
-                        comment = ver.comment
-
-                    results.append(dict(
-                        id=ver.id,
-                        object_repr=ver.object_repr,
-                        fields=fields,
-                        user=ver.user,
-                        date_created=datetime.datetime.strftime(
-                            ver.date_created, '%Y-%m-%d %H:%M:%S'
-                        ),
-                        comment=new_comment(comment),
-                        version=version
-                    ))
-
-                results = sorted(results, key=lambda k: k['id'], reverse=True)
-                return Response(results)
+                probe_versions = dict()
+                return list_response(
+                    (_serialize_tenant_version(obj, ver, data, probe_versions)
+                     for ver, data in poem_models.iterate_serialized_data(
+                        vers.iterator(chunk_size=STREAMING_CHUNK_SIZE)
+                    )),
+                    count
+                )
 
         else:
             return Response(status=status.HTTP_400_BAD_REQUEST)
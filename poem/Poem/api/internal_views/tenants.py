@@ -1,7 +1,9 @@
 import datetime
 
 from Poem.api.internal_views.utils import get_tenant_resources
+from Poem.poem_super_admin.models import TenantStatistics
 from Poem.tenants.models import Tenant
+from django.db.models import OuterRef, Subquery
 from rest_framework import status
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.response import Response
@@ -9,18 +11,30 @@ from rest_framework.views import APIView
 from tenant_schemas.utils import get_public_schema_name
 
 
+def _annotate_statistics(tenants):
+    statistics = TenantStatistics.objects.filter(
+        schema_name=OuterRef('schema_name')
+    )
+
+    return tenants.annotate(
+        nr_metrics=Subquery(statistics.values('metrics')[:1]),
+        nr_probes=Subquery(statistics.values('probes')[:1])
+    )
+
+
 class ListTenants(APIView):
     authentication_classes = (SessionAuthentication,)
 
     def get(self, request, name=None):
         results = []
+        tenants = _annotate_statistics(Tenant.objects.all())
         if name:
             if name == 'SuperPOEM_Tenant':
-                tenants = Tenant.objects.filter(
+                tenants = tenants.filter(
                     schema_name=get_public_schema_name()
                 )
             else:
-                tenants = Tenant.objects.filter(name=name)
+                tenants = tenants.filter(name=name)
 
             if len(tenants) == 0:
                 return Response(
@@ -28,9 +42,6 @@ class ListTenants(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-        else:
-            tenants = Tenant.objects.all()
-
         for tenant in tenants:
             if tenant.schema_name == get_public_schema_name():
                 tenant_name = 'SuperPOEM Tenant'
@@ -39,7 +50,16 @@ class ListTenants(APIView):
                 tenant_name = tenant.name
                 metric_key = 'metrics'
 
-            data = get_tenant_resources(tenant.schema_name)
+            if tenant.nr_metrics is None:
+                # statistics of the schema have not been counted yet
+                data = get_tenant_resources(tenant.schema_name)
+                nr_metrics = data[metric_key]
+                nr_probes = data['probes']
+
+            else:
+                nr_metrics = tenant.nr_metrics
+                nr_probes = tenant.nr_probes
+
             results.append(dict(
                 name=tenant_name,
                 schema_name=tenant.schema_name,
@@ -47,8 +67,8 @@ class ListTenants(APIView):
                 created_on=datetime.date.strftime(
                     tenant.created_on, '%Y-%m-%d'
                 ),
-                nr_metrics=data[metric_key],
-                nr_probes=data['probes']
+                nr_metrics=nr_metrics,
+                nr_probes=nr_probes
             ))
 
         if name:
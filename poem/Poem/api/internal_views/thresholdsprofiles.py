@@ -1,9 +1,9 @@
 from Poem.api import serializers
-from Poem.api.internal_views.utils import sync_webapi
 from Poem.api.views import NotFound
 from Poem.helpers.history_helpers import create_profile_history
+from Poem.helpers.webapi_sync import request_sync, sync_forced, \
+    THRESHOLDS_PROFILES
 from Poem.poem import models as poem_models
-from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from rest_framework import status
 from rest_framework.authentication import SessionAuthentication
@@ -17,7 +17,15 @@ class ListThresholdsProfiles(APIView):
     authentication_classes = (SessionAuthentication,)
 
     def get(self, request, name=None):
-        sync_webapi(settings.WEBAPI_THRESHOLDS, poem_models.ThresholdsProfiles)
+        try:
+            request_sync(THRESHOLDS_PROFILES, force=sync_forced(request))
+
+        except Exception as e:
+            return error_response(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail='Error syncing thresholds profiles with WEB-API: '
+                       '{}'.format(str(e))
+            )
 
         if name:
             try:
@@ -1,19 +1,72 @@
 import json
 
-import requests
-from Poem.api.models import MyAPIKey
-from Poem.helpers.history_helpers import create_profile_history
+from Poem.helpers import webapi_client
+from Poem.helpers.history_helpers import profile_history_entry
 from Poem.poem import models as poem_models
 from Poem.poem_super_admin import models as admin_models
+from Poem.poem_super_admin.models import bump_content_version, \
+    update_tenant_statistics
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.http import StreamingHttpResponse
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from tenant_schemas.utils import schema_context, get_public_schema_name
 
 
+# number of objects fetched at once when response is streamed
+STREAMING_CHUNK_SIZE = 500
+
+
 def error_response(status_code=None, detail=''):
     return Response({'detail': detail}, status=status_code)
 
 
+def iterate_in_order(queryset, ids, chunk_size=STREAMING_CHUNK_SIZE):
+    """
+    Yields objects of queryset in order of given ids. Objects are fetched
+    chunk_size at a time, with queryset's select_related and
+    prefetch_related applied to each chunk.
+    """
+    for i in range(0, len(ids), chunk_size):
+        chunk = ids[i:i + chunk_size]
+        objects = queryset.in_bulk(chunk)
+
+        for pk in chunk:
+            yield objects[pk]
+
+
+def _stream_json(items):
+    encode = JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    chunk = ['[']
+    for i, item in enumerate(items):
+        if i:
+            chunk.append(',')
+
+        chunk.append(encode(item))
+
+        if len(chunk) > STREAMING_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+
+    chunk.append(']')
+    yield ''.join(chunk)
+
+
+def list_response(items, count):
+    """
+    Returns response with JSON list of given items. If there are more than
+    STREAMING_THRESHOLD of them, list is encoded and sent item by item as
+    items are generated, so that the whole list is never kept in memory.
+    """
+    if count > settings.STREAMING_THRESHOLD:
+        return StreamingHttpResponse(
+            _stream_json(items), content_type='application/json'
+        )
+
+    return Response(list(items))
+
+
 def one_value_inline(input):
     if input:
         return json.loads(input)[0]
@@ -71,94 +124,122 @@ def two_value_inline_dict(input):
     return results
 
 
-def sync_webapi(api, model):
-    token = MyAPIKey.objects.get(name="WEB-API")
-
-    headers = {'Accept': 'application/json', 'x-api-key': token.token}
-    response = requests.get(api,
-                            headers=headers,
-                            timeout=180)
-    response.raise_for_status()
-    data = response.json()['data']
-
-    data_api = set([p['id'] for p in data])
-    data_db = set(model.objects.all().values_list('apiid', flat=True))
-    entries_not_indb = data_api.difference(data_db)
-    entries_indb = data_api.intersection(data_db)
-
-    new_entries = []
-    for p in data:
-        if p['id'] in entries_not_indb:
-            if p.get('info', False):
-                new_entries.append(
-                    dict(name=p['info']['name'], description=p['info'].get('description', ''),
-                        apiid=p['id'], groupname='')
-                )
-            else:
-                new_entries.append(
-                    dict(name=p['name'], description=p.get('description', ''),
-                        apiid=p['id'], groupname='')
+def _webapi_entry_fields(entry):
+    if entry.get('info', False):
+        return dict(
+            name=entry['info']['name'],
+            description=entry['info'].get('description', '')
+        )
+
+    else:
+        return dict(
+            name=entry['name'], description=entry.get('description', '')
+        )
+
+
+def _webapi_entry_history(instance, entry):
+    if isinstance(instance, poem_models.MetricProfiles):
+        services = []
+        for service in entry['services']:
+            for metric in service['metrics']:
+                services.append(
+                    dict(service=service['service'], metric=metric)
                 )
 
-    if new_entries:
-        for entry in new_entries:
-            instance = model.objects.create(**entry)
-
-            if isinstance(instance, poem_models.MetricProfiles):
-                services = []
-                for item in data:
-                    if item['id'] == instance.apiid:
-                        for service in item['services']:
-                            for metric in service['metrics']:
-                                services.append(
-                                    dict(
-                                        service=service['service'],
-                                        metric=metric
-                                    )
-                                )
-                        description = item.get('description', '')
-                create_profile_history(instance, services, 'poem', description)
-
-            if isinstance(instance, poem_models.Aggregation):
-                for item in data:
-                    if item['id'] == instance.apiid:
-                        aggr_data = {
-                            'endpoint_group': item['endpoint_group'],
-                            'metric_operation': item['metric_operation'],
-                            'profile_operation': item['profile_operation'],
-                            'metric_profile': item['metric_profile']['name'],
-                            'groups': item['groups']
-                        }
-                create_profile_history(instance, aggr_data, 'poem')
-
-            if isinstance(instance, poem_models.ThresholdsProfiles):
-                for item in data:
-                    if item['id'] == instance.apiid:
-                        tp_data = {'rules': item['rules']}
-                create_profile_history(instance, tp_data, 'poem')
-
-    entries_deleted_onapi = data_db.difference(data_api)
-    for p in entries_deleted_onapi:
-        instance = model.objects.get(apiid=p)
-        poem_models.TenantHistory.objects.filter(
-            object_id=instance.id,
+        return profile_history_entry(
+            instance, services, 'poem', entry.get('description', ''),
+            comment='Initial version.'
+        )
+
+    if isinstance(instance, poem_models.Aggregation):
+        aggr_data = {
+            'endpoint_group': entry['endpoint_group'],
+            'metric_operation': entry['metric_operation'],
+            'profile_operation': entry['profile_operation'],
+            'metric_profile': entry['metric_profile']['name'],
+            'groups': entry['groups']
+        }
+        return profile_history_entry(
+            instance, aggr_data, 'poem', comment='Initial version.'
+        )
+
+    if isinstance(instance, poem_models.ThresholdsProfiles):
+        return profile_history_entry(
+            instance, {'rules': entry['rules']}, 'poem',
+            comment='Initial version.'
+        )
+
+
+def sync_webapi(api, model):
+    response = webapi_client.get(api)
+    data = dict((p['id'], p) for p in response.json()['data'])
+
+    instances = dict((item.apiid, item) for item in model.objects.all())
+
+    new_instances = model.objects.bulk_create([
+        model(apiid=apiid, groupname='', **_webapi_entry_fields(entry))
+        for apiid, entry in data.items() if apiid not in instances
+    ])
+
+    history = []
+    for instance in new_instances:
+        entry = _webapi_entry_history(instance, data[instance.apiid])
+        if entry:
+            history.append(entry)
+
+    if history:
+        poem_models.TenantHistory.objects.bulk_create(history)
+
+    deleted = [
+        instance.id for apiid, instance in instances.items()
+        if apiid not in data
+    ]
+    if deleted:
+        deleted_history = poem_models.TenantHistory.objects.filter(
+            object_id__in=[str(pk) for pk in deleted],
             content_type=ContentType.objects.get_for_model(model)
-        ).delete()
-        instance.delete()
-
-    for p in data:
-        if p['id'] in entries_indb:
-            instance = model.objects.get(apiid=p['id'])
-            if p.get('info', False):
-                instance.name = p['info']['name']
-                instance.description = p['info'].get('description', '')
-            else:
-                instance.name = p['name']
-                instance.description = p.get('description', '')
-            instance.save()
+        )
+        deleted_history._raw_delete(deleted_history.db)
+        # profiles have no delete receivers, so their relations are deleted
+        # in one statement each
+        model.objects.filter(id__in=deleted).delete()
+
+    # bulk_create and _raw_delete do not send post_save and post_delete
+    # signals of history
+    if history or deleted:
+        bump_content_version()
+
+    changed = []
+    for apiid, instance in instances.items():
+        if apiid in data:
+            fields = _webapi_entry_fields(data[apiid])
+            if instance.name != fields['name'] or \
+                    instance.description != fields['description']:
+                instance.name = fields['name']
+                instance.description = fields['description']
+                changed.append(instance)
+
+    if changed:
+        model.objects.bulk_update(changed, ['name', 'description'])
+
+    if model is poem_models.MetricProfiles:
+        # metrics of profiles changed in WEB-API are not in history
+        ids = dict((apiid, item.id) for apiid, item in instances.items())
+        ids.update((instance.apiid, instance.id) for instance in new_instances)
+        poem_models.set_metric_profile_index(dict(
+            (ids[apiid], [
+                [service['service'], metric]
+                for service in entry['services']
+                for metric in service.get('metrics', [])
+            ]) for apiid, entry in data.items()
+        ))
 
 
 def get_tenant_resources(schema_name):
+    """
+    Recounts resources of the schema, which also rebuilds its statistics
+    shown in the list of tenants.
+    """
     with schema_context(schema_name):
         if schema_name == get_public_schema_name():
             metrics = admin_models.MetricTemplate.objects.all()
@@ -166,13 +247,7 @@ def get_tenant_resources(schema_name):
         else:
             metrics = poem_models.Metric.objects.all()
             met_key = 'metrics'
-        n_met = metrics.count()
-
-        probes = set()
-        for metric in metrics:
-            if metric.probekey:
-                probes.add(metric.probekey)
 
-        n_probe = len(probes)
+        counts = update_tenant_statistics(metrics, schema_name)
 
-        return {met_key: n_met, 'probes': n_probe}
+        return {met_key: counts['metrics'], 'probes': counts['probes']}
@@ -1,4 +1,11 @@
-from django.db import models
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 from rest_framework_api_key.crypto import KeyGenerator
 from rest_framework_api_key.models import AbstractAPIKey, BaseAPIKeyManager
@@ -18,6 +25,58 @@ class MyKeyGenerator(KeyGenerator):
         return key, prefix, hashed_key
 
 
+# (schema, digest of key): (hashed key, time of verification)
+_verified = dict()
+_verified_lock = threading.Lock()
+
+
+def _digest(key):
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _is_verified(digest, hashed_key):
+    """
+    Keys are hashed with deliberately slow hasher, so keys which have already
+    been verified against the same hashed key are accepted for
+    API_KEY_CACHE_TTL seconds without hashing them again. It saves only the
+    hashing, not the query: the key itself is still looked up in the DB on
+    every request, so that key revoked, expired or deleted by another
+    process is not accepted.
+    """
+    with _verified_lock:
+        entry = _verified.get((connection.schema_name, digest), None)
+
+    if not entry:
+        return False
+
+    verified_key, verified = entry
+    if verified_key != hashed_key or \
+            time.monotonic() - verified > settings.API_KEY_CACHE_TTL:
+        with _verified_lock:
+            _verified.pop((connection.schema_name, digest), None)
+
+        return False
+
+    return True
+
+
+def _set_verified(digest, hashed_key):
+    with _verified_lock:
+        _verified[(connection.schema_name, digest)] = (
+            hashed_key, time.monotonic()
+        )
+
+
+def clear_verified_keys(schema=None):
+    with _verified_lock:
+        if schema:
+            for entry in [e for e in _verified.keys() if e[0] == schema]:
+                del _verified[entry]
+
+        else:
+            _verified.clear()
+
+
 class MyAPIKeyManager(BaseAPIKeyManager):
     """
     Calling MyAPIKey.objects.create_key() should create a key with given token
@@ -51,12 +110,18 @@ class MyAPIKeyManager(BaseAPIKeyManager):
         except self.model.DoesNotExist:
             return False
 
-        if not api_key.is_valid(test_key):
+        if api_key.has_expired:
             return False
 
-        if api_key.has_expired:
+        digest = _digest(key)
+        if _is_verified(digest, api_key.hashed_key):
+            return True
+
+        if not api_key.is_valid(test_key):
             return False
 
+        _set_verified(digest, api_key.hashed_key)
+
         return True
 
 
@@ -64,3 +129,10 @@ class MyAPIKey(AbstractAPIKey):
     objects = MyAPIKeyManager()
 
     token = models.CharField(max_length=100)
+
+
+@receiver(post_save, sender=MyAPIKey)
+@receiver(post_delete, sender=MyAPIKey)
+def api_key_changed(sender, instance, **kwargs):
+    # key might have been revoked, expired or deleted
+    clear_verified_keys(connection.schema_name)
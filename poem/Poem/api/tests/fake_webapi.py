@@ -0,0 +1,152 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+class FakeWebApiServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class FakeWebApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8') if length else ''
+
+        with self.server.lock:
+            self.server.requests.append(
+                (method, self.path, self.headers.get('x-api-key'), body)
+            )
+            if self.server.failures:
+                self.server.failures -= 1
+                self._send(
+                    self.server.failure_status,
+                    {'status': {'message': 'Unavailable',
+                                'code': str(self.server.failure_status)}}
+                )
+                return
+
+        if self.headers.get('x-api-key') != self.server.token:
+            self._send(
+                401,
+                {'status': {'message': 'Unauthorized', 'code': '401'}}
+            )
+            return
+
+        parts = self.path.strip('/').split('/')
+        resource = self.server.resources.get(parts[2]) \
+            if len(parts) > 2 else None
+
+        if resource is None:
+            self._send(
+                404, {'status': {'message': 'Not Found', 'code': '404'}}
+            )
+            return
+
+        if len(parts) == 3 and method == 'GET':
+            self._send(
+                200, {'status': {'message': 'Success', 'code': '200'},
+                      'data': list(resource.values())}
+            )
+
+        elif len(parts) == 4 and parts[3] in resource:
+            if method == 'PUT':
+                resource[parts[3]] = json.loads(body)
+
+            self._send(
+                200, {'status': {'message': 'Success', 'code': '200'},
+                      'data': [resource[parts[3]]]}
+            )
+
+        else:
+            self._send(
+                404, {'status': {'message': 'Not Found', 'code': '404'}}
+            )
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+
+class FakeWebApi:
+    """
+    WEB-API running on localhost in separate thread, so that WEB-API client
+    can be tested and benchmarked without network. Resources are given as
+    dict of lists of entries, e.g. {'metric_profiles': [{'id': ..., ...}]}.
+
+        with FakeWebApi(token='mock_key', resources=...) as api:
+            with self.settings(WEBAPI_METRIC=api.url('metric_profiles')):
+                ...
+    """
+    def __init__(self, token='mock_key', resources=None):
+        self.server = FakeWebApiServer(('127.0.0.1', 0), FakeWebApiHandler)
+        self.server.lock = threading.Lock()
+        self.server.token = token
+        self.server.resources = dict(
+            (name, dict((item['id'], item) for item in items))
+            for name, items in (resources or {}).items()
+        )
+        self.server.requests = []
+        self.server.connections = 0
+        self.server.failures = 0
+        self.server.failure_status = 503
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def url(self, resource):
+        return 'http://127.0.0.1:{}/api/v2/{}'.format(
+            self.server.server_address[1], resource
+        )
+
+    def fail_next(self, number, status=503):
+        with self.server.lock:
+            self.server.failures = number
+            self.server.failure_status = status
+
+    @property
+    def requests(self):
+        return list(self.server.requests)
+
+    @property
+    def connections(self):
+        return self.server.connections
+
+    def entry(self, resource, apiid):
+        return self.server.resources[resource][apiid]
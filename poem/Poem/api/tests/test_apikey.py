@@ -1,7 +1,11 @@
 import datetime
+import os
+import time
+import unittest
+from unittest.mock import patch
 
 from Poem.api import views_internal as views
-from Poem.api.models import MyAPIKey
+from Poem.api.models import MyAPIKey, clear_verified_keys
 from Poem.poem import models as poem_models
 from Poem.users.models import CustUser
 from rest_framework import status
@@ -411,3 +415,104 @@ class ListAPIKeysAPIViewTests(TenantTestCase):
             response.data['detail'],
             'You do not have permission to delete API keys.'
         )
+
+
+class VerifiedAPIKeysTests(TenantTestCase):
+    def setUp(self):
+        self.factory = TenantRequestFactory(self.tenant)
+        self.view = views.ListAPIKeys.as_view()
+        self.url = '/api/v2/internal/apikeys/'
+        self.user = CustUser.objects.create_user(
+            username='testuser', is_superuser=True
+        )
+        self.key, k = MyAPIKey.objects.create_key(name='EGI')
+        clear_verified_keys()
+
+    def test_key_is_hashed_once(self):
+        with patch(
+                'Poem.api.models.MyAPIKey.is_valid', return_value=True
+        ) as mock_valid:
+            for i in range(3):
+                self.assertTrue(MyAPIKey.objects.is_valid(self.key.token))
+
+        self.assertEqual(mock_valid.call_count, 1)
+
+    def test_wrong_key_is_not_accepted(self):
+        self.assertTrue(MyAPIKey.objects.is_valid(self.key.token))
+        self.assertFalse(MyAPIKey.objects.is_valid('wrong_token'))
+
+    def test_key_is_hashed_again_after_ttl(self):
+        with self.settings(API_KEY_CACHE_TTL=-1):
+            with patch(
+                    'Poem.api.models.MyAPIKey.is_valid', return_value=True
+            ) as mock_valid:
+                for i in range(3):
+                    self.assertTrue(MyAPIKey.objects.is_valid(self.key.token))
+
+        self.assertEqual(mock_valid.call_count, 3)
+
+    def test_revoked_key_is_not_accepted(self):
+        self.assertTrue(MyAPIKey.objects.is_valid(self.key.token))
+        data = {'id': self.key.id, 'name': 'EGI', 'revoked': True}
+        content, content_type = encode_data(data)
+        request = self.factory.put(self.url, content, content_type=content_type)
+        force_authenticate(request, user=self.user)
+        response = self.view(request)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(MyAPIKey.objects.is_valid(self.key.token))
+
+    def test_deleted_key_is_not_accepted(self):
+        self.assertTrue(MyAPIKey.objects.is_valid(self.key.token))
+        request = self.factory.delete(self.url + 'EGI')
+        force_authenticate(request, user=self.user)
+        response = self.view(request, 'EGI')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(MyAPIKey.objects.is_valid(self.key.token))
+
+    def test_expired_key_is_not_accepted(self):
+        self.assertTrue(MyAPIKey.objects.is_valid(self.key.token))
+        # update() does not send signals, so it is expiry date which counts
+        MyAPIKey.objects.filter(id=self.key.id).update(
+            expiry_date=datetime.datetime.now() - datetime.timedelta(hours=1)
+        )
+        self.assertFalse(MyAPIKey.objects.is_valid(self.key.token))
+
+    def test_key_revoked_by_another_process_is_not_accepted(self):
+        self.assertTrue(MyAPIKey.objects.is_valid(self.key.token))
+        # update() does not send signals, as if key was revoked by another
+        # process with its own verified keys
+        MyAPIKey.objects.filter(id=self.key.id).update(revoked=True)
+        self.assertFalse(MyAPIKey.objects.is_valid(self.key.token))
+
+    def test_verified_key_is_looked_up_without_hashing(self):
+        self.assertTrue(MyAPIKey.objects.is_valid(self.key.token))
+        with patch('Poem.api.models.MyAPIKey.is_valid') as mock_valid:
+            with self.assertNumQueries(1):
+                self.assertTrue(MyAPIKey.objects.is_valid(self.key.token))
+
+        self.assertFalse(mock_valid.called)
+
+    @unittest.skipUnless(
+        os.environ.get('POEM_BENCHMARKS'),
+        'benchmarks are run only if POEM_BENCHMARKS is set'
+    )
+    def test_benchmark_verification(self):
+        number = 10
+
+        start = time.perf_counter()
+        for i in range(number):
+            clear_verified_keys()
+            self.assertTrue(MyAPIKey.objects.is_valid(self.key.token))
+        uncached = (time.perf_counter() - start) / number
+
+        start = time.perf_counter()
+        for i in range(number):
+            self.assertTrue(MyAPIKey.objects.is_valid(self.key.token))
+        cached = (time.perf_counter() - start) / number
+
+        # both take the same single query, only hashing is saved
+        self.assertLess(
+            cached, uncached / 10,
+            'Verification of key takes {:.3f} ms with hashing, and {:.3f} ms '
+            'once it is verified'.format(1000 * uncached, 1000 * cached)
+        )
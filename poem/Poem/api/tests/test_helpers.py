@@ -1,13 +1,21 @@
 import datetime
 import json
+import os
+import threading
+import time
+import unittest
 from unittest.mock import patch, call
 
 import requests
 from Poem.api.models import MyAPIKey
-from Poem.helpers.history_helpers import create_comment, update_comment
+from Poem.helpers.history_helpers import create_comment, update_comment, \
+    analyze_differences, create_history, create_histories, \
+    create_profile_history, serialize_metric
+from Poem.helpers.json_patch import make_patch, apply_patch
 from Poem.helpers.metrics_helpers import import_metrics, update_metrics, \
-    update_metrics_in_profiles, get_metrics_in_profiles, \
-    delete_metrics_from_profile, update_metric_in_schema
+    update_metrics_from_history, update_metrics_in_profiles, \
+    get_metrics_in_profiles, delete_metrics_from_profile, \
+    delete_metrics_from_profiles, delete_metrics, update_metric_in_schema
 from Poem.poem import models as poem_models
 from Poem.poem_super_admin import models as admin_models
 from Poem.tenants.models import Tenant
@@ -17,15 +25,26 @@ from django.contrib.contenttypes.models import ContentType
 from django.core import serializers
 from django.core.management import call_command
 from django.db import connection
-from django.test.testcases import TransactionTestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.test.testcases import TransactionTestCase, SimpleTestCase
 from tenant_schemas.test.cases import TenantTestCase
 from tenant_schemas.utils import get_tenant_model, get_public_schema_name, \
     schema_context
 
+from Poem.helpers import webapi_client
+from Poem.helpers.tenant_helpers import fan_out
+from Poem.helpers.webapi_client import clear_token_cache
+from Poem.helpers.webapi_cache import get_metric_profiles, \
+    invalidate_metric_profiles, METRIC_PROFILES
+from Poem.helpers.webapi_sync import sync_resource, sync_all, request_sync, \
+    get_last_synced
+from .fake_webapi import FakeWebApi
 from .utils_test import mocked_func, mocked_web_api_metric_profile, \
     mocked_web_api_metric_profile_put, mocked_web_api_metric_profiles, \
     mocked_web_api_metric_profiles_empty, \
-    mocked_web_api_metric_profiles_wrong_token
+    mocked_web_api_metric_profiles_wrong_token, \
+    mocked_web_api_metric_profiles_not_found, deepdiff_analyze_differences
 
 ALLOWED_TEST_DOMAIN = '.test.com'
 
@@ -881,11 +900,7 @@ def mock_db(tenant_schema, tenant2=False):
 
     poem_models.TenantHistory.objects.create(
         object_id=metric1.id,
-        serialized_data=serializers.serialize(
-            'json', [metric1],
-            use_natural_foreign_keys=True,
-            use_natural_primary_keys=True
-        ),
+        serialized_data=serialize_metric(metric1),
         object_repr=metric1.__str__(),
         content_type=ct,
         comment='Initial version.',
@@ -912,11 +927,7 @@ def mock_db(tenant_schema, tenant2=False):
     poem_models.TenantHistory.objects.create(
         object_id=metric2.id,
         object_repr=metric2.__str__(),
-        serialized_data=serializers.serialize(
-            'json', [metric2],
-            use_natural_foreign_keys=True,
-            use_natural_primary_keys=True
-        ),
+        serialized_data=serialize_metric(metric2),
         content_type=ct,
         date_created=datetime.datetime.now(),
         comment='Initial version.',
@@ -945,11 +956,7 @@ def mock_db(tenant_schema, tenant2=False):
     poem_models.TenantHistory.objects.create(
         object_id=metric3.id,
         object_repr=metric3.__str__(),
-        serialized_data=serializers.serialize(
-            'json', [metric3],
-            use_natural_foreign_keys=True,
-            use_natural_primary_keys=True
-        ),
+        serialized_data=serialize_metric(metric3),
         content_type=ct,
         date_created=datetime.datetime.now(),
         comment='Initial version.',
@@ -975,11 +982,7 @@ def mock_db(tenant_schema, tenant2=False):
     poem_models.TenantHistory.objects.create(
         object_id=metric4.id,
         object_repr=metric4.__str__(),
-        serialized_data=serializers.serialize(
-            'json', [metric4],
-            use_natural_foreign_keys=True,
-            use_natural_primary_keys=True
-        ),
+        serialized_data=serialize_metric(metric4),
         content_type=ct,
         date_created=datetime.datetime.now(),
         comment='Initial version.',
@@ -1006,11 +1009,7 @@ def mock_db(tenant_schema, tenant2=False):
     poem_models.TenantHistory.objects.create(
         object_id=metric5.id,
         object_repr=metric5.__str__(),
-        serialized_data=serializers.serialize(
-            'json', [metric5],
-            use_natural_foreign_keys=True,
-            use_natural_primary_keys=True
-        ),
+        serialized_data=serialize_metric(metric5),
         content_type=ct,
         date_created=datetime.datetime.now(),
         comment='Initial version.',
@@ -1042,11 +1041,7 @@ def mock_db(tenant_schema, tenant2=False):
 
             poem_models.TenantHistory.objects.create(
                 object_id=metric1a.id,
-                serialized_data=serializers.serialize(
-                    'json', [metric1a],
-                    use_natural_foreign_keys=True,
-                    use_natural_primary_keys=True
-                ),
+                serialized_data=serialize_metric(metric1a),
                 object_repr=metric1a.__str__(),
                 content_type=ct,
                 comment='Initial version.',
@@ -1073,11 +1068,7 @@ def mock_db(tenant_schema, tenant2=False):
             poem_models.TenantHistory.objects.create(
                 object_id=metric2a.id,
                 object_repr=metric2a.__str__(),
-                serialized_data=serializers.serialize(
-                    'json', [metric2a],
-                    use_natural_foreign_keys=True,
-                    use_natural_primary_keys=True
-                ),
+                serialized_data=serialize_metric(metric2a),
                 content_type=ct,
                 date_created=datetime.datetime.now(),
                 comment='Initial version.',
@@ -1106,11 +1097,7 @@ def mock_db(tenant_schema, tenant2=False):
             poem_models.TenantHistory.objects.create(
                 object_id=metric3a.id,
                 object_repr=metric3a.__str__(),
-                serialized_data=serializers.serialize(
-                    'json', [metric3a],
-                    use_natural_foreign_keys=True,
-                    use_natural_primary_keys=True
-                ),
+                serialized_data=serialize_metric(metric3a),
                 content_type=ct,
                 date_created=datetime.datetime.now(),
                 comment='Initial version.',
@@ -1136,11 +1123,7 @@ def mock_db(tenant_schema, tenant2=False):
             poem_models.TenantHistory.objects.create(
                 object_id=metric4a.id,
                 object_repr=metric4a.__str__(),
-                serialized_data=serializers.serialize(
-                    'json', [metric4a],
-                    use_natural_foreign_keys=True,
-                    use_natural_primary_keys=True
-                ),
+                serialized_data=serialize_metric(metric4a),
                 content_type=ct,
                 date_created=datetime.datetime.now(),
                 comment='Initial version.',
@@ -1167,11 +1150,7 @@ def mock_db(tenant_schema, tenant2=False):
             poem_models.TenantHistory.objects.create(
                 object_id=metric5a.id,
                 object_repr=metric5a.__str__(),
-                serialized_data=serializers.serialize(
-                    'json', [metric5a],
-                    use_natural_foreign_keys=True,
-                    use_natural_primary_keys=True
-                ),
+                serialized_data=serialize_metric(metric5a),
                 content_type=ct,
                 date_created=datetime.datetime.now(),
                 comment='Initial version.',
@@ -1410,11 +1389,7 @@ class HistoryHelpersTests(TenantTestCase):
 
         poem_models.TenantHistory.objects.create(
             object_id=self.metric1.id,
-            serialized_data=serializers.serialize(
-                'json', [self.metric1],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(self.metric1),
             object_repr=self.metric1.__str__(),
             comment='Initial version.',
             user='testuser',
@@ -1743,11 +1718,7 @@ class HistoryHelpersTests(TenantTestCase):
         metric.mtype = self.metric_active
         metric.parent = ''
         metric.save()
-        serialized_data = serializers.serialize(
-            'json', [metric],
-            use_natural_foreign_keys=True,
-            use_natural_primary_keys=True
-        )
+        serialized_data = serialize_metric(metric)
         comment = create_comment(self.metric1, self.ct_metric,
                                  serialized_data)
         comment_set = set()
@@ -1887,11 +1858,7 @@ class HistoryHelpersTests(TenantTestCase):
         m = self.metric1
         m.group = group
         m.save()
-        serialized_data = serializers.serialize(
-            'json', [m],
-            use_natural_foreign_keys=True,
-            use_natural_primary_keys=True
-        )
+        serialized_data = serialize_metric(m)
         comment = create_comment(m, self.ct_metric, serialized_data)
         self.assertEqual(comment, '[{"added": {"fields": ["group"]}}]')
 
@@ -2110,6 +2077,613 @@ class HistoryHelpersTests(TenantTestCase):
         comment = create_comment(tp, self.ct_tp, json.dumps(data))
         self.assertEqual(comment, 'Initial version.')
 
+    def test_create_comment_fetches_only_latest_version(self):
+        serialized_data = serialize_metric(self.metric1)
+        with self.assertNumQueries(1):
+            comment = create_comment(
+                self.metric1, self.ct_metric, serialized_data
+            )
+        self.assertEqual(comment, '[]')
+
+    def test_create_history_serializes_metric_once(self):
+        self.metric1.description = 'New description of metric-1.'
+        self.metric1.save()
+        with patch(
+                'Poem.helpers.history_helpers.serializers.serialize',
+                wraps=serializers.serialize
+        ) as mock_serialize:
+            create_history(self.metric1, 'testuser')
+        self.assertEqual(mock_serialize.call_count, 1)
+        history = poem_models.TenantHistory.objects.filter(
+            object_id=self.metric1.id, content_type=self.ct_metric
+        ).order_by('-date_created')
+        self.assertEqual(history.count(), 2)
+        self.assertEqual(
+            history[0].comment, '[{"changed": {"fields": ["description"]}}]'
+        )
+        self.assertEqual(
+            json.loads(history[0].serialized_data)[0]['fields'][
+                'description'
+            ],
+            'New description of metric-1.'
+        )
+
+    def _create_metric2(self):
+        metric2 = poem_models.Metric.objects.create(
+            name='metric-2',
+            description='Description of metric-2.',
+            config='["maxCheckAttempts 3", "timeout 60",'
+                   ' "path $USER", "interval 5", "retryInterval 3"]',
+            mtype=self.metric_active,
+            probekey=self.probe_history2
+        )
+        metric2.tags.add(self.metrictag3)
+        return metric2
+
+    def test_create_histories_for_metrics(self):
+        metric2 = self._create_metric2()
+        self.metric1.description = 'New description of metric-1.'
+        self.metric1.save()
+        entries = create_histories([self.metric1, metric2], 'testuser')
+        self.assertEqual(len(entries), 2)
+        history1 = poem_models.TenantHistory.objects.filter(
+            object_id=self.metric1.id, content_type=self.ct_metric
+        ).order_by('-date_created')
+        history2 = poem_models.TenantHistory.objects.filter(
+            object_id=metric2.id, content_type=self.ct_metric
+        )
+        self.assertEqual(history1.count(), 2)
+        self.assertEqual(history2.count(), 1)
+        self.assertEqual(
+            history1[0].comment, '[{"changed": {"fields": ["description"]}}]'
+        )
+        self.assertEqual(history1[0].user, 'testuser')
+        self.assertEqual(history2[0].comment, 'Initial version.')
+        self.assertEqual(history2[0].object_repr, 'metric-2')
+        self.assertEqual(
+            json.loads(history2[0].serialized_data)[0]['fields']['tags'],
+            [['test_tag3']]
+        )
+
+    def test_create_histories_for_metric_templates(self):
+        self.mt1.description = 'New description for metric-template-1.'
+        self.mt1.save()
+        self.mt2.probekey = self.probe_history3
+        self.mt2.save()
+        self.mt2.tags.add(self.metrictag2)
+        create_histories([self.mt1, self.mt2], 'testuser')
+        history1 = admin_models.MetricTemplateHistory.objects.filter(
+            object_id=self.mt1
+        ).order_by('-date_created')
+        history2 = admin_models.MetricTemplateHistory.objects.filter(
+            object_id=self.mt2
+        ).order_by('-date_created')
+        self.assertEqual(history1.count(), 3)
+        self.assertEqual(history2.count(), 2)
+        self.assertEqual(
+            history1[0].version_comment,
+            '[{"changed": {"fields": ["description"]}}]'
+        )
+        self.assertEqual(
+            sorted(json.dumps(item) for item in json.loads(
+                history2[0].version_comment
+            )),
+            [
+                '{"added": {"fields": ["tags"], "object": ["test_tag2"]}}',
+                '{"changed": {"fields": ["probekey"]}}'
+            ]
+        )
+        self.assertEqual(
+            set(tag.name for tag in history2[0].tags.all()),
+            {'test_tag1', 'test_tag2'}
+        )
+        self.assertEqual(history2[0].probekey, self.probe_history3)
+
+    def _profile_versions(self, count):
+        metricinstances = [
+            {'service': 'service-{}'.format(i), 'metric': 'metric-{}'.format(i)}
+            for i in range(200)
+        ]
+        for i in range(count):
+            metricinstances[i * 10] = {
+                'service': 'changed-{}'.format(i), 'metric': 'metric'
+            }
+            create_profile_history(
+                self.mp1, metricinstances, 'testuser',
+                description='Version {}.'.format(i)
+            )
+
+        return poem_models.TenantHistory.objects.filter(
+            object_id=self.mp1.id, content_type=self.ct_mp
+        ).order_by('id')
+
+    @override_settings(HISTORY_KEYFRAME_INTERVAL=3)
+    def test_create_profile_history_stores_deltas_between_keyframes(self):
+        versions = self._profile_versions(5)
+        self.assertEqual(
+            [version.delta for version in versions],
+            [False, True, True, False, True, True]
+        )
+        self.assertLess(
+            len(versions[4].serialized_data),
+            len(versions[3].serialized_data) / 10
+        )
+        latest = json.loads(versions[5].get_serialized_data())
+        self.assertEqual(latest[0]['fields']['description'], 'Version 4.')
+        self.assertEqual(
+            latest[0]['fields']['metricinstances'][40],
+            ['changed-4', 'metric']
+        )
+        self.assertEqual(
+            set(json.dumps(item) for item in json.loads(versions[5].comment)),
+            {
+                '{"changed": {"fields": ["description"]}}',
+                '{"added": {"fields": ["metricinstances"], '
+                '"object": ["changed-4", "metric"]}}',
+                '{"deleted": {"fields": ["metricinstances"], '
+                '"object": ["service-40", "metric-40"]}}'
+            }
+        )
+
+    @override_settings(HISTORY_KEYFRAME_INTERVAL=3)
+    def test_get_serialized_data_of_delta_without_keyframe(self):
+        versions = self._profile_versions(2)
+        versions[0].delete()
+        with self.assertRaises(poem_models.MissingKeyframe) as context:
+            versions[1].get_serialized_data()
+        self.assertEqual(
+            str(context.exception),
+            'Version {} of {} is stored as delta, but there is no preceding '
+            'complete version.'.format(versions[1].id, versions[1].object_repr)
+        )
+
+    @override_settings(HISTORY_KEYFRAME_INTERVAL=3)
+    def test_iterate_serialized_data_of_deltas_without_keyframe(self):
+        versions = list(self._profile_versions(5))
+        versions[0].delete()
+        iterated = []
+        with self.assertRaises(poem_models.MissingKeyframe) as context:
+            for version, data in poem_models.iterate_serialized_data(
+                    poem_models.TenantHistory.objects.filter(
+                        object_id=self.mp1.id, content_type=self.ct_mp
+                    ).order_by('-id').iterator()
+            ):
+                iterated.append(version.id)
+        self.assertEqual(
+            iterated, [versions[5].id, versions[4].id, versions[3].id]
+        )
+        self.assertEqual(
+            str(context.exception),
+            'Version {} of {} is stored as delta, but there is no preceding '
+            'complete version.'.format(versions[2].id, versions[2].object_repr)
+        )
+
+    def test_iterate_serialized_data_and_encode_history(self):
+        with self.settings(HISTORY_KEYFRAME_INTERVAL=4):
+            versions = self._profile_versions(6)
+            encoded = [
+                (version.id, data) for version, data in
+                poem_models.iterate_serialized_data(versions.reverse())
+            ]
+            self.assertEqual(
+                [version.delta for version in versions],
+                [False, True, True, True, False, True, True]
+            )
+
+        self.assertEqual(poem_models.encode_history(batch_size=2), 5)
+        self.assertFalse(any(version.delta for version in versions))
+        self.assertEqual(
+            encoded,
+            [(version.id, json.loads(version.serialized_data))
+             for version in versions.reverse()]
+        )
+
+        with self.settings(HISTORY_KEYFRAME_INTERVAL=2):
+            poem_models.encode_history()
+            self.assertEqual(
+                [version.delta for version in versions],
+                [False, True, False, True, False, True, False]
+            )
+            self.assertEqual(
+                [(version.id, data) for version, data in
+                 poem_models.iterate_serialized_data(versions.reverse())],
+                encoded
+            )
+
+    @override_settings(HISTORY_KEYFRAME_INTERVAL=3)
+    def test_set_serialized_data_of_version_followed_by_delta(self):
+        versions = self._profile_versions(2)
+        expected = versions[2].get_serialized_data()
+        data = json.loads(versions[1].get_serialized_data())
+        data[0]['fields']['name'] = 'NEW_NAME'
+        poem_models.set_serialized_data(versions[1], json.dumps(data))
+        self.assertEqual(
+            [version.delta for version in versions], [False, False, False]
+        )
+        self.assertEqual(
+            json.loads(versions[1].serialized_data)[0]['fields']['name'],
+            'NEW_NAME'
+        )
+        self.assertEqual(versions[2].serialized_data, expected)
+
+
+class JSONPatchTests(SimpleTestCase):
+    def assertPatched(self, old, new):
+        patch = make_patch(old, new)
+        patched = apply_patch(json.loads(json.dumps(old)), patch)
+        self.assertEqual(patched, new)
+        self.assertEqual(list(patched), list(new))
+        return patch
+
+    def test_scalars_and_types(self):
+        self.assertEqual(self.assertPatched(1, 1), [])
+        self.assertEqual(
+            self.assertPatched('a', ['a']),
+            [{'op': 'replace', 'path': '', 'value': ['a']}]
+        )
+        self.assertPatched({'a': 1}, {'a': None})
+
+    def test_dictionaries(self):
+        self.assertEqual(
+            self.assertPatched(
+                {'a': 1, 'b/c': 2, 'd~': 3}, {'a': 1, 'b/c': 4, 'e': 5}
+            ),
+            [
+                {'op': 'remove', 'path': '/d~0'},
+                {'op': 'replace', 'path': '/b~1c', 'value': 4},
+                {'op': 'add', 'path': '/e', 'value': 5}
+            ]
+        )
+
+    def test_dictionaries_with_reordered_keys_are_replaced(self):
+        self.assertEqual(
+            self.assertPatched({'a': 1, 'b': 2}, {'b': 2, 'a': 1}),
+            [{'op': 'replace', 'path': '', 'value': {'b': 2, 'a': 1}}]
+        )
+
+    def test_lists_are_patched_item_by_item(self):
+        old = [['service-{}'.format(i), 'metric'] for i in range(100)]
+        new = old[:10] + [['new', 'metric']] + old[11:50] + old[51:]
+        new.insert(70, ['inserted', 'metric'])
+        new.append(['appended', 'metric'])
+        self.assertEqual(
+            self.assertPatched(old, new),
+            [
+                {'op': 'replace', 'path': '/10/0', 'value': 'new'},
+                {'op': 'remove', 'path': '/50'},
+                {'op': 'add', 'path': '/70', 'value': ['inserted', 'metric']},
+                {'op': 'add', 'path': '/100', 'value': ['appended', 'metric']}
+            ]
+        )
+
+    def test_short_lists_are_replaced(self):
+        self.assertEqual(
+            self.assertPatched([1, 2], [3, 4]),
+            [{'op': 'replace', 'path': '', 'value': [3, 4]}]
+        )
+
+    def test_nested_documents(self):
+        old = [{'fields': {
+            'groups': [
+                {'name': 'Group1', 'services': [{'name': 'AMGA'}]},
+                {'name': 'Group2', 'services': [{'name': 'APEL'}]}
+            ],
+            'rules': []
+        }}]
+        new = json.loads(json.dumps(old))
+        new[0]['fields']['groups'][1]['services'].append({'name': 'ARC-CE'})
+        new[0]['fields']['rules'] = [{'host': 'hostFoo'}]
+        del new[0]['fields']['groups'][0]
+        self.assertPatched(old, new)
+        self.assertPatched(new, old)
+
+
+class AnalyzeDifferencesTests(SimpleTestCase):
+    @staticmethod
+    def sections(comment):
+        """
+        Splits comment into sections in the order they are made in. DeepDiff
+        (used for reference) reports changes of the same kind in order of a
+        set, so items are sorted only within their section.
+        """
+        sections = []
+        for item in json.loads(comment):
+            action = list(item.keys())[0]
+            if 'object' not in item[action]:
+                section = ('fields', action)
+
+            elif item[action]['fields'][0] in ['groups', 'rules']:
+                section = (
+                    item[action]['fields'][0],
+                    'deleted' if action == 'deleted' else 'added'
+                )
+
+            else:
+                section = ('items', action)
+
+            if not sections or sections[-1][0] != section:
+                sections.append((section, []))
+
+            sections[-1][1].append(json.dumps(item, sort_keys=True))
+
+        return [(section, sorted(items)) for section, items in sections]
+
+    def assertSameComment(self, old_data, new_data):
+        comment = analyze_differences(old_data, new_data)
+        reference = deepdiff_analyze_differences(old_data, new_data)
+        if reference == 'Initial version.':
+            self.assertEqual(comment, reference)
+
+        else:
+            self.assertEqual(
+                self.sections(comment), self.sections(reference)
+            )
+
+        return comment
+
+    @staticmethod
+    def metric(**kwargs):
+        data = {
+            'name': 'argo.AMS-Check',
+            'mtype': ['Active'],
+            'tags': [['test_tag1'], ['test_tag2']],
+            'probekey': ['ams-probe', '0.1.7'],
+            'group': ['EGI'],
+            'description': 'Description of argo.AMS-Check.',
+            'parent': '',
+            'probeexecutable': '["ams-probe"]',
+            'config': '["maxCheckAttempts 3", "timeout 60", '
+                      '"path /usr/libexec/argo-monitoring/probes/argo", '
+                      '"interval 5", "retryInterval 3"]',
+            'attribute': '["argo.ams_TOKEN --token"]',
+            'dependancy': '',
+            'flags': '["OBSESS 1"]',
+            'files': '',
+            'parameter': '["--project EGI"]',
+            'fileparameter': ''
+        }
+        data.update(kwargs)
+        return data
+
+    @staticmethod
+    def metric_profile(size, **kwargs):
+        data = {
+            'name': 'PROFILE',
+            'groupname': 'EGI',
+            'apiid': '00000000-oooo-kkkk-aaaa-aaeekkccnnee',
+            'description': '',
+            'metricinstances': [
+                ['service.{}'.format(i // 10), 'metric.{}'.format(i)]
+                for i in range(size)
+            ]
+        }
+        data.update(kwargs)
+        return data
+
+    @staticmethod
+    def aggregation_profile(size, **kwargs):
+        data = {
+            'name': 'PROFILE',
+            'groupname': 'EGI',
+            'apiid': '00000000-oooo-kkkk-aaaa-aaeekkccnnee',
+            'endpoint_group': 'sites',
+            'metric_operation': 'AND',
+            'profile_operation': 'AND',
+            'metric_profile': 'PROFILE',
+            'groups': [
+                {
+                    'name': 'Group{}'.format(i),
+                    'operation': 'OR',
+                    'services': [
+                        {
+                            'name': 'service.{}'.format(10 * i + j),
+                            'operation': 'OR'
+                        } for j in range(10)
+                    ]
+                } for i in range(size)
+            ]
+        }
+        data.update(kwargs)
+        return data
+
+    @staticmethod
+    def thresholds_profile(size, **kwargs):
+        data = {
+            'name': 'PROFILE',
+            'groupname': 'EGI',
+            'apiid': '00000000-oooo-kkkk-aaaa-aaeekkccnnee',
+            'rules': [
+                {
+                    'host': 'host{}'.format(i),
+                    'metric': 'metric.{}'.format(i),
+                    'thresholds': 'freshness=1s;10;9:;0;25'
+                } for i in range(size)
+            ]
+        }
+        data.update(kwargs)
+        return data
+
+    def test_initial_version(self):
+        self.assertEqual(
+            self.assertSameComment('', self.metric()), 'Initial version.'
+        )
+
+    def test_no_differences(self):
+        self.assertEqual(
+            self.assertSameComment(self.metric(), self.metric()), '[]'
+        )
+
+    def test_metric(self):
+        self.assertSameComment(
+            self.metric(),
+            self.metric(
+                name='argo.AMS-Check-new',
+                description='',
+                parent='argo.AMS-Check',
+                config='["maxCheckAttempts 4", "timeout 60", '
+                       '"path /usr/libexec/argo-monitoring/probes/argo", '
+                       '"interval 5"]',
+                attribute='["argo.ams_TOKEN --token", "X509 --cert"]',
+                dependancy='["argo.AMS-Publisher 1"]',
+                flags='',
+                tags=[['test_tag2'], ['test_tag3']],
+                mtype=['Passive']
+            )
+        )
+
+    def test_metric_with_changed_foreign_keys(self):
+        for changes in [
+            {'probekey': ['ams-probe', '0.1.8']},
+            {'probekey': None},
+            {'group': ['ARGOTEST'], 'tags': [['test_tag2'], ['test_tag1']]},
+            {'group': ['ARGOTEST'], 'config': '["maxCheckAttempts 4"]'}
+        ]:
+            self.assertSameComment(self.metric(), self.metric(**changes))
+
+        self.assertSameComment(
+            self.metric(probekey=None, group=None), self.metric()
+        )
+
+    def test_fields_added_to_and_deleted_from_model(self):
+        old = self.metric()
+        new = self.metric(description='New description.', new_field='new')
+        del new['fileparameter']
+        self.assertSameComment(old, new)
+
+    def test_type_changes(self):
+        self.assertSameComment(
+            self.metric_profile(3, description=None),
+            self.metric_profile(3, name=None, description='Description.')
+        )
+        self.assertSameComment(
+            self.thresholds_profile(3, groupname=1),
+            self.thresholds_profile(3, groupname=True)
+        )
+
+    def test_metric_profile(self):
+        old = self.metric_profile(1000)
+        new = self.metric_profile(1000, groupname='ARGOTEST')
+        new['metricinstances'].reverse()
+        new['metricinstances'][10:20] = [
+            ['service.new', 'metric.{}'.format(i)] for i in range(20)
+        ]
+        new['metricinstances'].append(new['metricinstances'][0])
+        self.assertSameComment(old, new)
+
+    def test_aggregation_profile(self):
+        old = self.aggregation_profile(100)
+        new = self.aggregation_profile(100, metric_operation='OR')
+        new['groups'].reverse()
+        new['groups'][0]['name'] = 'Group-new'
+        new['groups'][1]['operation'] = 'AND'
+        new['groups'][2]['services'].reverse()
+        new['groups'][3]['services'].pop()
+        del new['groups'][4]
+        self.assertSameComment(old, new)
+
+    def test_thresholds_profile(self):
+        old = self.thresholds_profile(100)
+        new = self.thresholds_profile(100, name='PROFILE-new')
+        new['rules'][0]['thresholds'] = 'freshness=1s;10;9:;0;30'
+        new['rules'][1]['metric'] = 'metric.new'
+        new['rules'].append({'metric': 'metric.2', 'thresholds': 'x=1s'})
+        del new['rules'][3]
+        self.assertSameComment(old, new)
+
+    def test_nested_fields(self):
+        old = {
+            'name': 'Report',
+            'profiles': [{'name': 'PROFILE', 'type': 'metric'}],
+            'thresholds': {'availability': 80, 'reliability': 85},
+            'topology': {'group': {'type': 'NGI', 'tags': ['a', 'b']}}
+        }
+        new = {
+            'name': 'Report',
+            'profiles': [{'name': 'PROFILE2', 'type': 'metric'}],
+            'thresholds': {'availability': 85, 'reliability': 85,
+                           'uptime': 0.8},
+            'topology': {'group': {'type': None, 'tags': ['b', 'c']}}
+        }
+        self.assertSameComment(old, new)
+
+    def test_removed_items_are_reported_before_added_ones(self):
+        old = {'tags': [['tag1']], 'metricinstances': [['service', 'metric1']]}
+        new = {'tags': [['tag2']], 'metricinstances': [['service', 'metric2']]}
+        self.assertEqual(
+            json.loads(self.assertSameComment(old, new)),
+            [
+                {'deleted': {'fields': ['tags'], 'object': ['tag1']}},
+                {'deleted': {
+                    'fields': ['metricinstances'],
+                    'object': ['service', 'metric1']
+                }},
+                {'added': {'fields': ['tags'], 'object': ['tag2']}},
+                {'added': {
+                    'fields': ['metricinstances'],
+                    'object': ['service', 'metric2']
+                }}
+            ]
+        )
+
+    def test_same_as_deepdiff_for_reordered_profiles(self):
+        old = self.metric_profile(20)
+        new = self.metric_profile(20)
+        new['metricinstances'].reverse()
+        new['metricinstances'][5:10] = [
+            ['service.new', 'metric.{}'.format(i)] for i in range(3)
+        ]
+        self.assertSameComment(old, new)
+
+        old = self.aggregation_profile(10)
+        new = self.aggregation_profile(10)
+        new['groups'][1]['services'].pop()
+        del new['groups'][2]
+        self.assertSameComment(old, new)
+
+    @unittest.skipUnless(
+        os.environ.get('POEM_BENCHMARKS'),
+        'benchmarks are run only if POEM_BENCHMARKS is set'
+    )
+    def test_benchmark_large_profiles(self):
+        cases = []
+        old = self.metric_profile(10000)
+        new = self.metric_profile(10000)
+        new['metricinstances'].reverse()
+        new['metricinstances'][100:200] = [
+            ['service.new', 'metric.{}'.format(i)] for i in range(50)
+        ]
+        cases.append((old, new))
+
+        old = self.aggregation_profile(1000)
+        new = self.aggregation_profile(1000)
+        new['groups'][10]['services'].pop()
+        del new['groups'][20]
+        cases.append((old, new))
+
+        old = self.thresholds_profile(5000)
+        new = self.thresholds_profile(5000)
+        new['rules'][10]['thresholds'] = 'freshness=1s;10;9:;0;30'
+        cases.append((old, new))
+
+        for old, new in cases:
+            start = time.perf_counter()
+            comment = analyze_differences(old, new)
+            fast = time.perf_counter() - start
+
+            start = time.perf_counter()
+            reference = deepdiff_analyze_differences(old, new)
+            slow = time.perf_counter() - start
+
+            self.assertEqual(
+                sorted(json.loads(comment), key=json.dumps),
+                sorted(json.loads(reference), key=json.dumps)
+            )
+            self.assertLess(
+                fast, slow / 5,
+                'Analysis of differences takes {:.1f} ms, and {:.1f} ms with '
+                'DeepDiff'.format(1000 * fast, 1000 * slow)
+            )
+
 
 class ImportMetricsTests(TransactionTestCase):
     """
@@ -2270,8 +2844,8 @@ class ImportMetricsTests(TransactionTestCase):
         self.assertEqual(serialized_data1['group'][0], metric1.group.name)
         self.assertEqual(serialized_data1['description'], metric1.description)
         self.assertEqual(
-            serialized_data1['probekey'],
-            [metric1.probekey.name, metric1.probekey.package.version]
+            serialized_data1['probekey'][0],
+            metric1.probekey.id
         )
         self.assertEqual(
             serialized_data1['probeexecutable'], metric1.probeexecutable
@@ -2314,8 +2888,8 @@ class ImportMetricsTests(TransactionTestCase):
         self.assertEqual(serialized_data2['group'][0], metric2.group.name)
         self.assertEqual(serialized_data2['description'], metric2.description)
         self.assertEqual(
-            serialized_data2['probekey'],
-            [metric2.probekey.name, metric2.probekey.package.version]
+            serialized_data2['probekey'][0],
+            metric2.probekey.id
         )
         self.assertEqual(
             serialized_data2['probeexecutable'], metric2.probeexecutable
@@ -2428,8 +3002,8 @@ class ImportMetricsTests(TransactionTestCase):
         self.assertEqual(serialized_data1['group'][0], metric1.group.name)
         self.assertEqual(serialized_data1['description'], metric1.description)
         self.assertEqual(
-            serialized_data1['probekey'],
-            [metric1.probekey.name, metric1.probekey.package.version]
+            serialized_data1['probekey'][0],
+            metric1.probekey.id
         )
         self.assertEqual(
             serialized_data1['probeexecutable'], metric1.probeexecutable
@@ -2489,8 +3063,8 @@ class ImportMetricsTests(TransactionTestCase):
         self.assertEqual(serialized_data1['group'][0], metric1.group.name)
         self.assertEqual(serialized_data1['description'], metric1.description)
         self.assertEqual(
-            serialized_data1['probekey'],
-            [metric1.probekey.name, metric1.probekey.package.version]
+            serialized_data1['probekey'][0],
+            metric1.probekey.id
         )
         self.assertEqual(
             serialized_data1['probeexecutable'], metric1.probeexecutable
@@ -2558,8 +3132,8 @@ class ImportMetricsTests(TransactionTestCase):
         self.assertEqual(serialized_data1['group'][0], metric1.group.name)
         self.assertEqual(serialized_data1['description'], metric1.description)
         self.assertEqual(
-            serialized_data1['probekey'],
-            [metric1.probekey.name, metric1.probekey.package.version]
+            serialized_data1['probekey'][0],
+            metric1.probekey.id
         )
         self.assertEqual(
             serialized_data1['probeexecutable'], metric1.probeexecutable
@@ -2605,8 +3179,8 @@ class ImportMetricsTests(TransactionTestCase):
         self.assertEqual(serialized_data2['group'][0], metric2.group.name)
         self.assertEqual(serialized_data2['description'], metric2.description)
         self.assertEqual(
-            serialized_data2['probekey'],
-            [metric2.probekey.name, metric2.probekey.package.version]
+            serialized_data2['probekey'][0],
+            metric2.probekey.id
         )
         self.assertEqual(
             serialized_data2['probeexecutable'], metric2.probeexecutable
@@ -2642,6 +3216,49 @@ class ImportMetricsTests(TransactionTestCase):
             name='argo.AMS-Check-Old'
         )
 
+    def test_import_metrics_in_constant_number_of_queries(self):
+        names = []
+        for i in range(6):
+            mt = admin_models.MetricTemplate.objects.create(
+                name='test.Imported-{}'.format(i),
+                mtype=self.mt_active,
+                probekey=self.metrictemplate3.probekey,
+                probeexecutable=self.metrictemplate3.probeexecutable,
+                config=self.metrictemplate3.config
+            )
+            mt.tags.add(self.mtag1, self.mtag2)
+            names.append(mt.name)
+
+        with CaptureQueriesContext(connection) as one:
+            import_metrics(names[:1], self.tenant, self.user)
+
+        with CaptureQueriesContext(connection) as many:
+            success, warning, error, unavailable = import_metrics(
+                names[1:], self.tenant, self.user
+            )
+
+        self.assertEqual(len(many), len(one))
+        self.assertEqual(success, names[1:])
+        self.assertEqual(warning, [])
+        self.assertEqual(error, [])
+        self.assertEqual(unavailable, [])
+        for name in names:
+            metric = poem_models.Metric.objects.get(name=name)
+            self.assertEqual(
+                sorted(tag.name for tag in metric.tags.all()),
+                ['test_tag1', 'test_tag2']
+            )
+            history = poem_models.TenantHistory.objects.get(
+                object_id=metric.id, content_type=self.ct
+            )
+            self.assertEqual(history.comment, 'Initial version.')
+            self.assertEqual(
+                sorted(
+                    json.loads(history.serialized_data)[0]['fields']['tags']
+                ),
+                [['test_tag1'], ['test_tag2']]
+            )
+
 
 class UpdateMetricsTests(TenantTestCase):
     def setUp(self):
@@ -2666,6 +3283,65 @@ class UpdateMetricsTests(TenantTestCase):
         self.probeversion1_2 = probeversion1[1]
         self.probeversion1_3 = probeversion1[0]
 
+    def test_delete_metrics(self):
+        metric = poem_models.Metric.objects.get(name='argo.AMS-Check')
+        self.assertTrue(
+            poem_models.TenantHistory.objects.filter(
+                object_id=metric.id, content_type=self.ct
+            ).exists()
+        )
+        deleted = delete_metrics(['argo.AMS-Check', 'nonexisting'])
+        self.assertEqual(deleted, ['argo.AMS-Check'])
+        self.assertFalse(
+            poem_models.Metric.objects.filter(name='argo.AMS-Check').exists()
+        )
+        self.assertFalse(
+            poem_models.TenantHistory.objects.filter(
+                object_id=metric.id, content_type=self.ct
+            ).exists()
+        )
+        self.assertFalse(
+            poem_models.Metric.tags.through.objects.filter(
+                metric_id=metric.id
+            ).exists()
+        )
+        self.assertEqual(
+            admin_models.TenantStatistics.objects.get(
+                schema_name=connection.schema_name
+            ).metrics,
+            poem_models.Metric.objects.count()
+        )
+        self.assertEqual(delete_metrics(['nonexisting']), [])
+
+    def test_delete_metrics_in_constant_number_of_queries(self):
+        metric = poem_models.Metric.objects.get(name='argo.AMS-Check')
+        names = []
+        for i in range(3):
+            copy = poem_models.Metric.objects.create(
+                name='{}-{}'.format(metric.name, i),
+                group=metric.group,
+                mtype=metric.mtype,
+                probekey=metric.probekey
+            )
+            copy.tags.add(self.mtag1)
+            create_history(copy, 'testuser')
+            names.append(copy.name)
+
+        with CaptureQueriesContext(connection) as one:
+            delete_metrics(['argo.AMS-Check'])
+
+        with CaptureQueriesContext(connection) as many:
+            delete_metrics(names)
+
+        self.assertEqual(len(many), len(one))
+        self.assertFalse(
+            poem_models.Metric.objects.filter(name__in=names).exists()
+        )
+        stats = admin_models.TenantStatistics.objects.get(
+            schema_name=connection.schema_name
+        )
+        self.assertEqual(stats.metrics, poem_models.Metric.objects.count())
+
     @patch('Poem.helpers.metrics_helpers.update_metrics_in_profiles')
     def test_update_active_metrics_from_metrictemplate_instance(
             self, mock_update
@@ -2698,7 +3374,10 @@ class UpdateMetricsTests(TenantTestCase):
         )
         mock_update.assert_called_once()
         mock_update.assert_has_calls([
-            call('argo.AMS-Check', 'argo.AMS-Check-new')
+            call(
+                'argo.AMS-Check', 'argo.AMS-Check-new',
+                schemas=[self.tenant.schema_name]
+            )
         ])
         metric = poem_models.Metric.objects.get(name='argo.AMS-Check-new')
         metric_versions = poem_models.TenantHistory.objects.filter(
@@ -2737,8 +3416,8 @@ class UpdateMetricsTests(TenantTestCase):
         )
         self.assertEqual(serialized_data['description'], metric.description)
         self.assertEqual(
-            serialized_data['probekey'],
-            [metric.probekey.name, metric.probekey.package.version]
+            serialized_data['probekey'][0],
+            metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -2797,8 +3476,8 @@ class UpdateMetricsTests(TenantTestCase):
                 serialized_data1['description'], metric1.description
             )
             self.assertEqual(
-                serialized_data1['probekey'],
-                [metric1.probekey.name, metric1.probekey.package.version]
+                serialized_data1['probekey'][0],
+                metric1.probekey.id
             )
             self.assertEqual(serialized_data1['group'], ['TEST2'])
             self.assertEqual(serialized_data1['parent'], metric1.parent)
@@ -2845,7 +3524,10 @@ class UpdateMetricsTests(TenantTestCase):
         )
         mock_update.assert_called_once()
         mock_update.assert_has_calls([
-            call('org.apel.APEL-Pub', 'org.apel.APEL-Pub-new')
+            call(
+                'org.apel.APEL-Pub', 'org.apel.APEL-Pub-new',
+                schemas=[self.tenant.schema_name]
+            )
         ])
         metric = poem_models.Metric.objects.get(name='org.apel.APEL-Pub-new')
         metric_versions = poem_models.TenantHistory.objects.filter(
@@ -2972,7 +3654,10 @@ class UpdateMetricsTests(TenantTestCase):
         )
         mock_update.assert_called_once()
         mock_update.assert_has_calls([
-            call('argo.AMS-Check', 'argo.AMS-Check-new')
+            call(
+                'argo.AMS-Check', 'argo.AMS-Check-new',
+                schemas=[self.tenant.schema_name]
+            )
         ])
         metric = poem_models.Metric.objects.get(name='argo.AMS-Check-new')
         metric_versions = poem_models.TenantHistory.objects.filter(
@@ -3006,8 +3691,8 @@ class UpdateMetricsTests(TenantTestCase):
         )
         self.assertEqual(serialized_data['description'], metric.description)
         self.assertEqual(
-            serialized_data['probekey'],
-            [metric.probekey.name, metric.probekey.package.version]
+            serialized_data['probekey'][0],
+            metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -3061,8 +3746,8 @@ class UpdateMetricsTests(TenantTestCase):
                 serialized_data1['description'], metric1.description
             )
             self.assertEqual(
-                serialized_data1['probekey'],
-                [metric1.probekey.name, metric1.probekey.package.version]
+                serialized_data1['probekey'][0],
+                metric1.probekey.id
             )
             self.assertEqual(serialized_data1['group'], ['TEST2'])
             self.assertEqual(serialized_data1['parent'], metric1.parent)
@@ -3079,6 +3764,80 @@ class UpdateMetricsTests(TenantTestCase):
                 serialized_data1['fileparameter'], metric1.fileparameter
             )
 
+    @patch('Poem.helpers.metrics_helpers.update_metrics_in_profiles')
+    def test_update_metrics_from_history(self, mock_update):
+        mock_update.return_value = []
+        metrictemplate1 = admin_models.MetricTemplate.objects.get(
+            name='argo.AMS-Check'
+        )
+        metrictemplate = admin_models.MetricTemplateHistory.objects.create(
+            object_id=metrictemplate1,
+            name='argo.AMS-Check-new',
+            mtype=self.mt_active,
+            description='New description for the metric.',
+            probekey=self.probeversion1_2,
+            parent='argo.AMS-Check',
+            probeexecutable='ams-probe',
+            config='["maxCheckAttempts 4", "timeout 70", '
+                   '"path /usr/libexec/argo-monitoring/probes/argo", '
+                   '"interval 6", "retryInterval 4"]',
+            attribute='["argo.ams_TOKEN2 --token"]',
+            dependency='["dep-key dep-val"]',
+            parameter='["par-key par-val"]',
+            flags='["flag-key flag-val"]',
+            files='["file-key file-val"]',
+            fileparameter='["fp-key fp-val"]',
+            date_created=datetime.datetime.now(),
+            version_user='testuser',
+            version_comment=create_comment(metrictemplate1)
+        )
+        metrictemplate.tags.add(self.mtag1, self.mtag2)
+        update_metrics_from_history(
+            updates=[('argo.AMS-Check', metrictemplate.id)],
+            schema=self.tenant.schema_name, user='testuser'
+        )
+        mock_update.assert_called_once_with(
+            'argo.AMS-Check', 'argo.AMS-Check-new',
+            schemas=[self.tenant.schema_name]
+        )
+        metric = poem_models.Metric.objects.get(name='argo.AMS-Check-new')
+        metric_versions = poem_models.TenantHistory.objects.filter(
+            object_id=metric.id, content_type=self.ct
+        ).order_by('-date_created')
+        serialized_data = json.loads(
+            metric_versions[0].serialized_data
+        )[0]['fields']
+        self.assertEqual(metric_versions.count(), 2)
+        self.assertEqual(metric_versions[0].user, 'testuser')
+        self.assertEqual(
+            sorted(tag.name for tag in metric.tags.all()),
+            ['test_tag1', 'test_tag2']
+        )
+        self.assertEqual(metric.probekey, metrictemplate.probekey)
+        self.assertEqual(metric.description, metrictemplate.description)
+        self.assertEqual(metric.group.name, 'TEST')
+        self.assertEqual(metric.parent, metrictemplate.parent)
+        self.assertEqual(metric.probeexecutable, metrictemplate.probeexecutable)
+        self.assertEqual(metric.config, metrictemplate.config)
+        self.assertEqual(metric.attribute, metrictemplate.attribute)
+        self.assertEqual(metric.dependancy, metrictemplate.dependency)
+        self.assertEqual(metric.flags, metrictemplate.flags)
+        self.assertEqual(metric.files, metrictemplate.files)
+        self.assertEqual(metric.parameter, metrictemplate.parameter)
+        self.assertEqual(metric.fileparameter, metrictemplate.fileparameter)
+        self.assertEqual(serialized_data['name'], metric.name)
+        self.assertEqual(
+            sorted(serialized_data['tags']), [['test_tag1'], ['test_tag2']]
+        )
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
+        with schema_context('test2'):
+            metric1 = poem_models.Metric.objects.get(name='argo.AMS-Check')
+            self.assertEqual(len(metric1.tags.all()), 3)
+            self.assertEqual(
+                metric1.description,
+                'Some description of argo.AMS-Check metric template.'
+            )
+
     @patch('Poem.helpers.metrics_helpers.update_metrics_in_profiles')
     def test_update_metrics_if_different_metrictemplate_version_from_mt_inst(
             self, mock_update
@@ -3147,8 +3906,8 @@ class UpdateMetricsTests(TenantTestCase):
         )
         self.assertEqual(serialized_data['description'], metric.description)
         self.assertEqual(
-            serialized_data['probekey'],
-            [metric.probekey.name, metric.probekey.package.version]
+            serialized_data['probekey'][0],
+            metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -3207,8 +3966,8 @@ class UpdateMetricsTests(TenantTestCase):
                 serialized_data1['description'], metric1.description
             )
             self.assertEqual(
-                serialized_data1['probekey'],
-                [metric1.probekey.name, metric1.probekey.package.version]
+                serialized_data1['probekey'][0],
+                metric1.probekey.id
             )
             self.assertEqual(serialized_data1['group'], ['TEST2'])
             self.assertEqual(serialized_data1['parent'], metric1.parent)
@@ -3248,16 +4007,33 @@ class UpdateMetricsTests(TenantTestCase):
 
 class MetricsInProfilesTests(TenantTestCase):
     def setUp(self):
+        clear_token_cache()
+
         with schema_context(get_public_schema_name()):
             Tenant.objects.create(
                 name='public', domain_url='public',
                 schema_name=get_public_schema_name()
             )
 
-    @patch('Poem.helpers.metrics_helpers.requests.put')
-    @patch('Poem.helpers.metrics_helpers.requests.get')
-    @patch('Poem.helpers.metrics_helpers.MyAPIKey.objects.get')
+    def _index_profiles(self):
+        for profile in mocked_web_api_metric_profiles().json()['data']:
+            instance = poem_models.MetricProfiles.objects.create(
+                name=profile['name'], apiid=profile['id'],
+                description=profile['description'], groupname='TEST'
+            )
+            create_profile_history(
+                instance, [
+                    {'service': service['service'], 'metric': metric}
+                    for service in profile['services']
+                    for metric in service['metrics']
+                ], 'testuser', profile['description']
+            )
+
+    @patch('Poem.helpers.webapi_client.requests.Session.put')
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    @patch('Poem.helpers.webapi_client.MyAPIKey.objects.get')
     def test_update_metrics_in_profiles(self, mock_key, mock_get, mock_put):
+        self._index_profiles()
         with self.settings(WEBAPI_METRIC='https://mock.api.url'):
             mock_key.return_value = MyAPIKey(name='WEB-API', token='mock_key')
             mock_get.side_effect = mocked_web_api_metric_profiles
@@ -3288,13 +4064,30 @@ class MetricsInProfilesTests(TenantTestCase):
                             }
                         ]
                     }
-                )
+                ),
+                timeout=180
             )
             self.assertEqual(msgs, [])
+            self.assertEqual(
+                get_metrics_in_profiles('test')['new.metric1'], ['PROFILE1']
+            )
+            self.assertFalse('metric1' in get_metrics_in_profiles('test'))
 
-    @patch('Poem.helpers.metrics_helpers.requests.get')
-    @patch('Poem.helpers.metrics_helpers.MyAPIKey.objects.get')
+    @patch('Poem.helpers.webapi_client.requests.Session.put')
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    def test_update_metrics_in_profiles_if_metric_not_in_profiles(
+            self, mock_get, mock_put
+    ):
+        self._index_profiles()
+        msgs = update_metrics_in_profiles('metric6', 'new.metric6')
+        self.assertEqual(msgs, [])
+        self.assertFalse(mock_get.called)
+        self.assertFalse(mock_put.called)
+
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    @patch('Poem.helpers.webapi_client.MyAPIKey.objects.get')
     def test_update_metrics_in_profiles_wrong_token(self, mock_key, mock_get):
+        self._index_profiles()
         with self.settings(WEBAPI_METRIC='https://mock.api.url'):
             mock_key.return_value = MyAPIKey(name='WEB-API', token='wrong_key')
             mock_get.side_effect = mocked_web_api_metric_profiles_wrong_token
@@ -3309,6 +4102,7 @@ class MetricsInProfilesTests(TenantTestCase):
             )
 
     def test_update_metrics_in_profiles_nonexisting_key(self):
+        self._index_profiles()
         with self.settings(WEBAPI_METRIC='https://mock.api.url'):
             msgs = update_metrics_in_profiles('metric1', 'new.metric1')
             self.assertEqual(
@@ -3319,12 +4113,13 @@ class MetricsInProfilesTests(TenantTestCase):
                 ]
             )
 
-    @patch('Poem.helpers.metrics_helpers.requests.put')
-    @patch('Poem.helpers.metrics_helpers.requests.get')
-    @patch('Poem.helpers.metrics_helpers.MyAPIKey.objects.get')
+    @patch('Poem.helpers.webapi_client.requests.Session.put')
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    @patch('Poem.helpers.webapi_client.MyAPIKey.objects.get')
     def test_update_metrics_in_profiles_if_response_empty(
             self, mock_key, mock_get, mock_put
     ):
+        self._index_profiles()
         with self.settings(WEBAPI_METRIC='https://mock.api.url'):
             mock_key.return_value = MyAPIKey(name='WEB-API', token='mock_key')
             mock_get.side_effect = mocked_web_api_metric_profiles_empty
@@ -3332,9 +4127,9 @@ class MetricsInProfilesTests(TenantTestCase):
             self.assertEqual(msgs, [])
             self.assertFalse(mock_put.called)
 
-    @patch('Poem.helpers.metrics_helpers.requests.put')
-    @patch('Poem.helpers.metrics_helpers.requests.get')
-    @patch('Poem.helpers.metrics_helpers.MyAPIKey.objects.get')
+    @patch('Poem.helpers.webapi_client.requests.Session.put')
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    @patch('Poem.helpers.webapi_client.MyAPIKey.objects.get')
     def test_update_metrics_in_profiles_if_same_name(
             self, mock_key, mock_get, mock_put
     ):
@@ -3345,73 +4140,71 @@ class MetricsInProfilesTests(TenantTestCase):
             self.assertEqual(msgs, [])
             self.assertFalse(mock_put.called)
 
-    @patch('Poem.helpers.metrics_helpers.requests.get')
-    @patch('Poem.helpers.metrics_helpers.MyAPIKey.objects.get')
-    def test_get_metrics_in_profiles(self, mock_key, mock_get):
-        with self.settings(WEBAPI_METRIC='https://mock.api.url'):
-            mock_key.return_value = MyAPIKey(name='WEB-API', token='mock_key')
-            mock_get.side_effect = mocked_web_api_metric_profiles
-            metrics = get_metrics_in_profiles('test')
-            mock_get.assert_called_once()
-            mock_get.assert_called_with(
-                'https://mock.api.url',
-                headers={'Accept': 'application/json', 'x-api-key': 'mock_key'},
-                timeout=180
-            )
-            self.assertEqual(
-                metrics,
-                {
-                    'metric1': ['PROFILE1'],
-                    'metric2': ['PROFILE1', 'PROFILE2'],
-                    'metric3': ['PROFILE1', 'PROFILE2'],
-                    'metric4': ['PROFILE1'],
-                    'metric5': ['PROFILE2'],
-                    'metric7': ['PROFILE2']
-                }
-            )
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    def test_get_metrics_in_profiles(self, mock_get):
+        self._index_profiles()
+        metrics = get_metrics_in_profiles('test')
+        self.assertFalse(mock_get.called)
+        self.assertEqual(
+            metrics,
+            {
+                'metric1': ['PROFILE1'],
+                'metric2': ['PROFILE1', 'PROFILE2'],
+                'metric3': ['PROFILE1', 'PROFILE2'],
+                'metric4': ['PROFILE1'],
+                'metric5': ['PROFILE2'],
+                'metric7': ['PROFILE2']
+            }
+        )
 
-    @patch('Poem.helpers.metrics_helpers.requests.get')
-    @patch('Poem.helpers.metrics_helpers.MyAPIKey.objects.get')
-    def test_get_metrics_in_profiles_wrong_token(self, mock_key, mock_get):
-        with self.settings(WEBAPI_METRIC='https://mock.api.url'):
-            mock_key.return_value = MyAPIKey(name='WEB-API', token='wrong_key')
-            mock_get.side_effect = mocked_web_api_metric_profiles_wrong_token
-            self.assertRaises(
-                requests.exceptions.HTTPError,
-                get_metrics_in_profiles,
-                'test'
-            )
+    def test_get_metrics_in_profiles_if_no_profiles(self):
+        self.assertEqual(get_metrics_in_profiles('test'), {})
 
-    def test_get_metrics_in_profiles_nonexisting_key(self):
-        with self.settings(WEBAPI_METRIC='https://mock.api.url'):
-            with self.assertRaises(Exception) as context:
-                get_metrics_in_profiles('test')
-            self.assertEqual(
-                str(context.exception),
-                'Error fetching WEB API data: API key not found.'
-            )
+    def test_metric_profile_index_follows_profile_history(self):
+        self._index_profiles()
+        profile = poem_models.MetricProfiles.objects.get(name='PROFILE2')
+        create_profile_history(
+            profile, [
+                {'service': 'service3', 'metric': 'metric3'},
+                {'service': 'service4', 'metric': 'metric8'}
+            ], 'testuser', 'Second profile'
+        )
+        self.assertEqual(
+            sorted(poem_models.MetricProfileIndex.objects.filter(
+                profile=profile
+            ).values_list('service', 'metric')),
+            [('service3', 'metric3'), ('service4', 'metric8')]
+        )
+        poem_models.TenantHistory.objects.filter(
+            object_id=profile.id,
+            content_type=ContentType.objects.get_for_model(profile)
+        ).delete()
+        profile.delete()
+        self.assertEqual(
+            get_metrics_in_profiles('test'),
+            {
+                'metric1': ['PROFILE1'],
+                'metric2': ['PROFILE1'],
+                'metric3': ['PROFILE1'],
+                'metric4': ['PROFILE1']
+            }
+        )
 
-    @patch('Poem.helpers.metrics_helpers.requests.get')
-    @patch('Poem.helpers.metrics_helpers.MyAPIKey.objects.get')
-    def test_get_metrics_in_profiles_if_response_empty(
-            self, mock_key, mock_get
-    ):
-        with self.settings(WEBAPI_METRIC='https://mock.api.url'):
-            mock_key.return_value = MyAPIKey(name='WEB-API', token='mock_key')
-            mock_get.side_effect = mocked_web_api_metric_profiles_empty
-            metrics = get_metrics_in_profiles('test')
-            mock_get.assert_called_once_with(
-                'https://mock.api.url',
-                headers={'Accept': 'application/json', 'x-api-key': 'mock_key'},
-                timeout=180
-            )
-            self.assertEqual(metrics, {})
+    def test_update_metric_profile_index_from_stored_history(self):
+        self._index_profiles()
+        poem_models.MetricProfileIndex.objects.all().delete()
+        poem_models.update_metric_profile_index()
+        self.assertEqual(
+            get_metrics_in_profiles('test')['metric2'],
+            ['PROFILE1', 'PROFILE2']
+        )
+        self.assertEqual(poem_models.MetricProfileIndex.objects.count(), 8)
 
-    @patch('Poem.helpers.metrics_helpers.requests.put')
-    @patch('Poem.helpers.metrics_helpers.requests.get')
+    @patch('Poem.helpers.webapi_client.requests.Session.put')
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
     @patch('Poem.helpers.metrics_helpers.poem_models.MetricProfiles.objects.'
            'get')
-    @patch('Poem.helpers.metrics_helpers.MyAPIKey.objects.get')
+    @patch('Poem.helpers.webapi_client.MyAPIKey.objects.get')
     def test_delete_metrics_from_profiles(
             self, mock_key, mock_profile, mock_get, mock_put
     ):
@@ -3448,13 +4241,14 @@ class MetricsInProfilesTests(TenantTestCase):
             mock_put.assert_called_once_with(
                 'https://mock.api.url/11111111-2222-3333-4444-555555555555',
                 headers={'Accept': 'application/json', 'x-api-key': 'mock_key'},
+                timeout=180,
                 data=json.dumps(data)
             )
 
-    @patch('Poem.helpers.metrics_helpers.requests.get')
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
     @patch('Poem.helpers.metrics_helpers.poem_models.MetricProfiles.objects.'
            'get')
-    @patch('Poem.helpers.metrics_helpers.MyAPIKey.objects.get')
+    @patch('Poem.helpers.webapi_client.MyAPIKey.objects.get')
     def test_delete_metrics_from_profiles_wrong_token(
             self, mock_key, mock_profile, mock_get
     ):
@@ -3503,3 +4297,429 @@ class MetricsInProfilesTests(TenantTestCase):
             str(context.exception),
             'Error deleting metric from profile: Profile not found.'
         )
+
+
+class WebApiCacheTests(TenantTestCase):
+    def setUp(self):
+        clear_token_cache()
+
+        with schema_context(get_public_schema_name()):
+            Tenant.objects.create(
+                name='public', domain_url='public',
+                schema_name=get_public_schema_name()
+            )
+
+        self.profiles = mocked_web_api_metric_profiles().json()['data']
+
+    def _age_cache(self, seconds):
+        poem_models.WebApiCache.objects.filter(
+            resource=METRIC_PROFILES
+        ).update(
+            date_fetched=datetime.datetime.now() -
+            datetime.timedelta(seconds=seconds)
+        )
+
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    @patch('Poem.helpers.webapi_client.MyAPIKey.objects.get')
+    def test_get_metric_profiles_cached(self, mock_key, mock_get):
+        with self.settings(
+                WEBAPI_METRIC='https://mock.api.url', WEBAPI_CACHE_TTL=300,
+                WEBAPI_CACHE_MAX_STALE=86400
+        ):
+            mock_key.return_value = MyAPIKey(name='WEB-API', token='mock_key')
+            mock_get.side_effect = mocked_web_api_metric_profiles
+            self.assertEqual(get_metric_profiles(), self.profiles)
+            self.assertEqual(get_metric_profiles(), self.profiles)
+            mock_get.assert_called_once_with(
+                'https://mock.api.url',
+                headers={'Accept': 'application/json', 'x-api-key': 'mock_key'},
+                timeout=180
+            )
+            self.assertEqual(poem_models.WebApiCache.objects.count(), 1)
+
+    @patch('Poem.helpers.webapi_cache._start_refresh')
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    @patch('Poem.helpers.webapi_client.MyAPIKey.objects.get')
+    def test_get_metric_profiles_expired_refreshed_in_background(
+            self, mock_key, mock_get, mock_refresh
+    ):
+        with self.settings(
+                WEBAPI_METRIC='https://mock.api.url', WEBAPI_CACHE_TTL=300,
+                WEBAPI_CACHE_MAX_STALE=86400
+        ):
+            mock_key.return_value = MyAPIKey(name='WEB-API', token='mock_key')
+            mock_get.side_effect = mocked_web_api_metric_profiles
+            get_metric_profiles()
+            self._age_cache(600)
+            mock_get.side_effect = mocked_web_api_metric_profiles_empty
+            self.assertEqual(get_metric_profiles(), self.profiles)
+            self.assertEqual(mock_get.call_count, 1)
+            mock_refresh.assert_called_once_with(connection.schema_name)
+
+    @patch('Poem.helpers.webapi_cache._start_refresh')
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    @patch('Poem.helpers.webapi_client.MyAPIKey.objects.get')
+    def test_get_metric_profiles_too_stale_refreshed(
+            self, mock_key, mock_get, mock_refresh
+    ):
+        with self.settings(
+                WEBAPI_METRIC='https://mock.api.url', WEBAPI_CACHE_TTL=300,
+                WEBAPI_CACHE_MAX_STALE=86400
+        ):
+            mock_key.return_value = MyAPIKey(name='WEB-API', token='mock_key')
+            mock_get.side_effect = mocked_web_api_metric_profiles
+            get_metric_profiles()
+            self._age_cache(90000)
+            mock_get.side_effect = mocked_web_api_metric_profiles_empty
+            self.assertEqual(get_metric_profiles(), [])
+            self.assertEqual(mock_get.call_count, 2)
+            self.assertFalse(mock_refresh.called)
+            self.assertEqual(get_metric_profiles(), [])
+            self.assertEqual(mock_get.call_count, 2)
+
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    @patch('Poem.helpers.webapi_client.MyAPIKey.objects.get')
+    def test_get_metric_profiles_too_stale_webapi_down(
+            self, mock_key, mock_get
+    ):
+        with self.settings(
+                WEBAPI_METRIC='https://mock.api.url', WEBAPI_CACHE_TTL=300,
+                WEBAPI_CACHE_MAX_STALE=86400
+        ):
+            mock_key.return_value = MyAPIKey(name='WEB-API', token='mock_key')
+            mock_get.side_effect = mocked_web_api_metric_profiles
+            get_metric_profiles()
+            self._age_cache(90000)
+            mock_get.side_effect = mocked_web_api_metric_profiles_not_found
+            self.assertEqual(get_metric_profiles(), self.profiles)
+            self.assertEqual(mock_get.call_count, 2)
+
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    @patch('Poem.helpers.webapi_client.MyAPIKey.objects.get')
+    def test_get_metric_profiles_not_cached_webapi_down(
+            self, mock_key, mock_get
+    ):
+        with self.settings(WEBAPI_METRIC='https://mock.api.url'):
+            mock_key.return_value = MyAPIKey(name='WEB-API', token='mock_key')
+            mock_get.side_effect = mocked_web_api_metric_profiles_wrong_token
+            with self.assertRaises(requests.exceptions.HTTPError):
+                get_metric_profiles()
+            self.assertFalse(poem_models.WebApiCache.objects.all().exists())
+
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    @patch('Poem.helpers.webapi_client.MyAPIKey.objects.get')
+    def test_invalidate_metric_profiles(self, mock_key, mock_get):
+        with self.settings(
+                WEBAPI_METRIC='https://mock.api.url', WEBAPI_CACHE_TTL=300,
+                WEBAPI_CACHE_MAX_STALE=86400
+        ):
+            mock_key.return_value = MyAPIKey(name='WEB-API', token='mock_key')
+            mock_get.side_effect = mocked_web_api_metric_profiles
+            get_metric_profiles()
+            invalidate_metric_profiles()
+            self.assertFalse(poem_models.WebApiCache.objects.all().exists())
+            mock_get.side_effect = mocked_web_api_metric_profiles_empty
+            self.assertEqual(get_metric_profiles(), [])
+            self.assertEqual(mock_get.call_count, 2)
+
+
+class WebApiSyncTests(TenantTestCase):
+    def setUp(self):
+        with schema_context(get_public_schema_name()):
+            Tenant.objects.create(
+                name='public', domain_url='public',
+                schema_name=get_public_schema_name()
+            )
+
+    @patch('Poem.helpers.webapi_sync.sync_webapi')
+    def test_sync_resource(self, mock_sync):
+        with self.settings(WEBAPI_METRIC='https://mock.api.url'):
+            self.assertIsNone(get_last_synced('metric_profiles'))
+            sync_resource('metric_profiles')
+            mock_sync.assert_called_once_with(
+                'https://mock.api.url', poem_models.MetricProfiles
+            )
+            self.assertIsNotNone(get_last_synced('metric_profiles'))
+            self.assertIsNone(get_last_synced('reports'))
+
+    @patch('Poem.helpers.webapi_sync.sync_webapi')
+    def test_sync_resource_with_error(self, mock_sync):
+        mock_sync.side_effect = requests.exceptions.HTTPError(
+            '401 Client Error: Unauthorized.'
+        )
+        with self.settings(WEBAPI_METRIC='https://mock.api.url'):
+            with self.assertRaises(requests.exceptions.HTTPError):
+                sync_resource('metric_profiles')
+            self.assertIsNone(get_last_synced('metric_profiles'))
+
+    @patch('Poem.helpers.webapi_sync.sync_resource')
+    def test_sync_all(self, mock_sync):
+        mock_sync.side_effect = [
+            None, Exception('API key not found'), None, None
+        ]
+        errors = sync_all()
+        self.assertEqual(mock_sync.call_count, 4)
+        self.assertEqual(
+            errors,
+            [
+                'TEST: Unable to sync {}: API key not found'.format(
+                    mock_sync.call_args_list[1][0][0]
+                )
+            ]
+        )
+
+    @patch('Poem.helpers.webapi_sync._start_sync')
+    @patch('Poem.helpers.webapi_sync.sync_resource')
+    def test_request_sync_never_synced(self, mock_sync, mock_start):
+        with self.settings(WEBAPI_SYNC_INTERVAL=600):
+            request_sync('metric_profiles')
+            mock_sync.assert_called_once_with('metric_profiles')
+            self.assertFalse(mock_start.called)
+
+    @patch('Poem.helpers.webapi_sync._start_sync')
+    @patch('Poem.helpers.webapi_sync.sync_resource')
+    def test_request_sync_recently_synced(self, mock_sync, mock_start):
+        poem_models.WebApiSync.objects.create(
+            resource='metric_profiles',
+            date_synced=datetime.datetime.now() - datetime.timedelta(
+                seconds=60
+            )
+        )
+        with self.settings(WEBAPI_SYNC_INTERVAL=600):
+            request_sync('metric_profiles')
+            self.assertFalse(mock_sync.called)
+            self.assertFalse(mock_start.called)
+
+    @patch('Poem.helpers.webapi_sync._start_sync')
+    @patch('Poem.helpers.webapi_sync.sync_resource')
+    def test_request_sync_outdated(self, mock_sync, mock_start):
+        poem_models.WebApiSync.objects.create(
+            resource='metric_profiles',
+            date_synced=datetime.datetime.now() - datetime.timedelta(
+                seconds=700
+            )
+        )
+        with self.settings(WEBAPI_SYNC_INTERVAL=600):
+            request_sync('metric_profiles')
+            self.assertFalse(mock_sync.called)
+            mock_start.assert_called_once_with(
+                connection.schema_name, 'metric_profiles'
+            )
+
+    @patch('Poem.helpers.webapi_sync._start_sync')
+    @patch('Poem.helpers.webapi_sync.sync_resource')
+    def test_request_sync_forced(self, mock_sync, mock_start):
+        poem_models.WebApiSync.objects.create(
+            resource='metric_profiles', date_synced=datetime.datetime.now()
+        )
+        request_sync('metric_profiles', force=True)
+        mock_sync.assert_called_once_with('metric_profiles')
+        self.assertFalse(mock_start.called)
+
+
+class WebApiClientTests(TenantTestCase):
+    def setUp(self):
+        clear_token_cache()
+        MyAPIKey.objects.create(name='WEB-API', token='mock_key')
+        self.profiles = mocked_web_api_metric_profiles().json()['data']
+        self.api = FakeWebApi(
+            token='mock_key', resources={'metric_profiles': self.profiles}
+        )
+        self.api.start()
+        self.url = self.api.url('metric_profiles')
+
+    def tearDown(self):
+        self.api.stop()
+
+    def test_get(self):
+        response = webapi_client.get(self.url)
+        self.assertEqual(response.json()['data'], self.profiles)
+        self.assertEqual(
+            self.api.requests,
+            [('GET', '/api/v2/metric_profiles', 'mock_key', '')]
+        )
+
+    def test_connection_is_reused(self):
+        for i in range(5):
+            webapi_client.get(self.url)
+        self.assertEqual(len(self.api.requests), 5)
+        self.assertEqual(self.api.connections, 1)
+
+    def test_token_is_cached(self):
+        webapi_client.get(self.url)
+        with self.assertNumQueries(0):
+            webapi_client.get(self.url)
+
+    def test_changed_token_is_looked_up_again(self):
+        webapi_client.get(self.url)
+        MyAPIKey.objects.filter(name='WEB-API').update(token='new_key')
+        self.api.server.token = 'new_key'
+        response = webapi_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item[2] for item in self.api.requests],
+            ['mock_key', 'mock_key', 'new_key']
+        )
+
+    def test_wrong_token(self):
+        MyAPIKey.objects.filter(name='WEB-API').update(token='wrong_key')
+        with self.assertRaises(requests.exceptions.HTTPError):
+            webapi_client.get(self.url)
+        self.assertEqual(len(self.api.requests), 1)
+
+    def test_missing_token(self):
+        MyAPIKey.objects.all().delete()
+        with self.assertRaises(MyAPIKey.DoesNotExist):
+            webapi_client.get(self.url)
+        self.assertEqual(self.api.requests, [])
+
+    def test_retry_if_unavailable(self):
+        self.api.fail_next(2)
+        response = webapi_client.get(self.url)
+        self.assertEqual(response.json()['data'], self.profiles)
+        self.assertEqual(len(self.api.requests), 3)
+
+    def test_put(self):
+        profile = dict(self.profiles[0])
+        profile['description'] = 'Changed profile'
+        webapi_client.put(
+            self.url + '/' + profile['id'], data=json.dumps(profile)
+        )
+        self.assertEqual(
+            self.api.entry('metric_profiles', profile['id'])['description'],
+            'Changed profile'
+        )
+
+    def test_stats(self):
+        before = webapi_client.get_stats().get(
+            'GET', {'count': 0, 'errors': 0}
+        )
+        webapi_client.get(self.url)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            webapi_client.get(self.url + '/nonexisting')
+        after = webapi_client.get_stats()['GET']
+        self.assertEqual(after['count'] - before['count'], 2)
+        self.assertEqual(after['errors'] - before['errors'], 1)
+
+    def test_delete_metrics_from_profile(self):
+        poem_models.MetricProfiles.objects.create(
+            name='PROFILE1', apiid=self.profiles[0]['id'],
+            description='First profile', groupname='TEST'
+        )
+        with self.settings(WEBAPI_METRIC=self.url):
+            delete_metrics_from_profile(
+                profile='PROFILE1', metrics=['metric3', 'metric4']
+            )
+        self.assertEqual(
+            self.api.entry('metric_profiles', self.profiles[0]['id'])[
+                'services'
+            ],
+            [{'service': 'service1', 'metrics': ['metric1', 'metric2']}]
+        )
+
+    def test_delete_metrics_from_profiles_with_one_put_per_profile(self):
+        with self.settings(WEBAPI_METRIC=self.url):
+            get_metric_profiles()
+            sent = len(self.api.requests)
+            errors = delete_metrics_from_profiles({
+                'PROFILE1': ['metric3', 'metric4'],
+                'PROFILE2': ['metric3'],
+                'PROFILE3': ['metric3']
+            })
+        self.assertEqual(
+            [item[0] for item in self.api.requests[sent:]],
+            ['GET', 'PUT', 'PUT']
+        )
+        self.assertEqual(list(errors.keys()), ['PROFILE3'])
+        self.assertEqual(
+            str(errors['PROFILE3']),
+            'Error deleting metric from profile: Profile not found.'
+        )
+        self.assertEqual(
+            self.api.entry('metric_profiles', self.profiles[0]['id'])[
+                'services'
+            ],
+            [{'service': 'service1', 'metrics': ['metric1', 'metric2']}]
+        )
+        self.assertEqual(
+            self.api.entry('metric_profiles', self.profiles[1]['id'])[
+                'services'
+            ],
+            [
+                {'service': 'service3', 'metrics': ['metric5', 'metric2']},
+                {'service': 'service4', 'metrics': ['metric7']}
+            ]
+        )
+
+
+    def test_delete_metrics_from_profiles_keeps_upstream_changes(self):
+        with self.settings(WEBAPI_METRIC=self.url):
+            get_metric_profiles()
+            upstream = self.api.entry(
+                'metric_profiles', self.profiles[0]['id']
+            )
+            upstream['services'] = upstream['services'] + [
+                {'service': 'service5', 'metrics': ['metric8']}
+            ]
+            errors = delete_metrics_from_profiles({'PROFILE1': ['metric3']})
+        self.assertEqual(errors, {})
+        self.assertEqual(
+            self.api.entry('metric_profiles', self.profiles[0]['id'])[
+                'services'
+            ],
+            [
+                {'service': 'service1', 'metrics': ['metric1', 'metric2']},
+                {'service': 'service2', 'metrics': ['metric4']},
+                {'service': 'service5', 'metrics': ['metric8']}
+            ]
+        )
+
+
+class FanOutTests(SimpleTestCase):
+    def test_results_and_errors_collected_per_schema(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def func(schema):
+            barrier.wait()
+            if schema == 'tenant2':
+                raise Exception('Something went wrong')
+
+            return schema.upper()
+
+        results, errors = fan_out(
+            func, ['tenant1', 'tenant2', 'tenant3'], workers=3
+        )
+        self.assertEqual(results, {'tenant1': 'TENANT1', 'tenant3': 'TENANT3'})
+        self.assertEqual(list(errors.keys()), ['tenant2'])
+        self.assertEqual(str(errors['tenant2']), 'Something went wrong')
+
+    def test_number_of_workers_is_bounded(self):
+        lock = threading.Lock()
+        running = [0]
+        max_running = [0]
+
+        def func(schema):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+
+            return schema
+
+        schemas = ['tenant{}'.format(i) for i in range(8)]
+        results, errors = fan_out(func, schemas, workers=3)
+        self.assertEqual(sorted(results.keys()), sorted(schemas))
+        self.assertEqual(errors, {})
+        self.assertEqual(max_running[0], 3)
+
+    def test_single_worker_runs_in_calling_thread(self):
+        results, errors = fan_out(
+            lambda schema: threading.current_thread(),
+            ['tenant1', 'tenant2'], workers=1
+        )
+        self.assertEqual(
+            set(results.values()), {threading.current_thread()}
+        )
+        self.assertEqual(errors, {})
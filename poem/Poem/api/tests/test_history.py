@@ -2,6 +2,7 @@ import datetime
 import json
 
 from Poem.api import views_internal as views
+from Poem.helpers.history_helpers import create_history
 from Poem.poem_super_admin import models as admin_models
 from Poem.users.models import CustUser
 from rest_framework import status
@@ -9,6 +10,8 @@ from rest_framework.test import force_authenticate
 from tenant_schemas.test.cases import TenantTestCase
 from tenant_schemas.test.client import TenantRequestFactory
 
+from .utils_test import streamed_json
+
 
 class ListVersionsAPIViewTests(TenantTestCase):
     def setUp(self):
@@ -617,6 +620,50 @@ class ListVersionsAPIViewTests(TenantTestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(response.data, {'detail': 'Version not found'})
 
+    def test_get_all_versions_streamed(self):
+        for obj in ['probe', 'metrictemplate']:
+            request = self.factory.get(self.url + obj + '/')
+            force_authenticate(request, user=self.user)
+            response = self.view(request, obj)
+            with self.settings(STREAMING_THRESHOLD=0):
+                streamed = self.view(request, obj)
+
+            self.assertTrue(streamed.streaming)
+            self.assertEqual(streamed_json(streamed), response.data)
+
+    def test_get_all_versions_in_constant_queries(self):
+        # ids in order and versions in one chunk, with tags for templates
+        queries = {'probe': 2, 'metrictemplate': 3}
+        for i in range(2):
+            for obj in ['probe', 'metrictemplate']:
+                request = self.factory.get(self.url + obj + '/')
+                force_authenticate(request, user=self.user)
+                with self.assertNumQueries(queries[obj]):
+                    response = self.view(request, obj)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            probe = admin_models.Probe.objects.create(
+                name='test-probe-{}'.format(i),
+                package=self.ver1.package,
+                description='Test probe.',
+                comment='Initial version.',
+                repository='https://github.com/ARGOeu/nagios-plugins-argo',
+                docurl='https://github.com/ARGOeu/nagios-plugins-argo/blob/'
+                       'master/README.md'
+            )
+            create_history(probe, self.user.username)
+            mt = admin_models.MetricTemplate.objects.create(
+                name='test.Metric-{}'.format(i),
+                mtype=self.mtype1,
+                probekey=admin_models.ProbeHistory.objects.get(
+                    object_id=probe
+                )
+            )
+            mt.tags.add(*admin_models.MetricTags.objects.all())
+            create_history(mt, self.user.username)
+
+        self.assertEqual(len(response.data), 5)
+
     def test_get_all_probe_versions(self):
         request = self.factory.get(self.url + 'probe/')
         force_authenticate(request, user=self.user)
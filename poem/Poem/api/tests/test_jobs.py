@@ -0,0 +1,195 @@
+import datetime
+import json
+from unittest.mock import patch, call
+
+from Poem.api import views_internal as views
+from Poem.helpers.jobs import run_pending_jobs, set_progress
+from Poem.helpers.tenant_helpers import fan_out
+from Poem.poem_super_admin.models import Job
+from Poem.users.models import CustUser
+from rest_framework import status
+from rest_framework.test import force_authenticate
+from tenant_schemas.test.cases import TenantTestCase
+from tenant_schemas.test.client import TenantRequestFactory
+
+
+class BackgroundJobsTests(TenantTestCase):
+    def setUp(self):
+        self.factory = TenantRequestFactory(self.tenant)
+        self.view = views.ImportMetrics.as_view()
+        self.url = '/api/v2/internal/importmetrics/?async=true'
+        self.user = CustUser.objects.create_user(
+            username='poem', is_superuser=True
+        )
+        self.regular_user = CustUser.objects.create_user(username='test')
+
+    def _post(self, user):
+        request = self.factory.post(
+            self.url, {'metrictemplates': ['metric1', 'metric2']},
+            format='json'
+        )
+        request.tenant = self.tenant
+        force_authenticate(request, user=user)
+        return self.view(request)
+
+    @patch('Poem.api.internal_views.metrics.import_metrics')
+    def test_job_is_queued(self, mock_import):
+        response = self._post(self.user)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job = Job.objects.get(id=response.data['id'])
+        self.assertEqual(job.name, 'import_metrics')
+        self.assertEqual(job.schema_name, self.tenant.schema_name)
+        self.assertEqual(job.user, 'poem')
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertFalse(mock_import.called)
+
+    @patch('Poem.api.internal_views.metrics.import_metrics')
+    def test_job_is_not_queued_if_not_allowed(self, mock_import):
+        response = self._post(self.regular_user)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(
+            response.data['detail'],
+            'You do not have permission to import metrics.'
+        )
+        self.assertEqual(Job.objects.count(), 0)
+        self.assertFalse(mock_import.called)
+
+    @patch('Poem.api.internal_views.metrics.import_metrics')
+    def test_run_queued_job(self, mock_import):
+        mock_import.return_value = ['metric1', 'metric2'], [], [], []
+        response = self._post(self.user)
+        self.assertEqual(run_pending_jobs(), 1)
+        mock_import.assert_has_calls([
+            call(
+                metrictemplates=['metric1', 'metric2'], tenant=self.tenant,
+                user=self.user
+            )
+        ])
+        job = Job.objects.get(id=response.data['id'])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.status_code, 200)
+        self.assertEqual(job.progress, 100)
+        self.assertNotEqual(job.date_started, None)
+        self.assertNotEqual(job.date_finished, None)
+        self.assertEqual(
+            json.loads(job.result),
+            {'imported': 'metric1, metric2 have been successfully imported.'}
+        )
+        self.assertEqual(run_pending_jobs(), 0)
+
+    @patch('Poem.api.internal_views.metrics.import_metrics')
+    def test_run_failing_job(self, mock_import):
+        mock_import.side_effect = Exception('Something went wrong')
+        response = self._post(self.user)
+        run_pending_jobs()
+        job = Job.objects.get(id=response.data['id'])
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.status_code, 500)
+        self.assertEqual(
+            json.loads(job.result), {'detail': 'Something went wrong'}
+        )
+
+    @patch('Poem.api.internal_views.metrics.import_metrics')
+    def test_run_abandoned_job_again(self, mock_import):
+        mock_import.return_value = ['metric1', 'metric2'], [], [], []
+        response = self._post(self.user)
+        Job.objects.filter(id=response.data['id']).update(
+            status=Job.RUNNING,
+            date_started=datetime.datetime.now() - datetime.timedelta(
+                seconds=7200
+            )
+        )
+        with self.settings(JOB_TIMEOUT=3600):
+            self.assertEqual(run_pending_jobs(), 1)
+        job = Job.objects.get(id=response.data['id'])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.status_code, 200)
+        self.assertEqual(mock_import.call_count, 1)
+
+    @patch('Poem.api.internal_views.metrics.import_metrics')
+    def test_running_job_is_not_claimed_again(self, mock_import):
+        response = self._post(self.user)
+        Job.objects.filter(id=response.data['id']).update(
+            status=Job.RUNNING,
+            date_started=datetime.datetime.now() - datetime.timedelta(
+                seconds=60
+            )
+        )
+        with self.settings(JOB_TIMEOUT=3600):
+            self.assertEqual(run_pending_jobs(), 0)
+        self.assertEqual(
+            Job.objects.get(id=response.data['id']).status, Job.RUNNING
+        )
+        self.assertFalse(mock_import.called)
+
+    @patch('Poem.api.internal_views.metrics.import_metrics')
+    def test_progress_is_set_per_schema(self, mock_import):
+        progress = []
+
+        def record(*args, **kwargs):
+            progress.append(Job.objects.get().progress)
+
+        def import_metrics(**kwargs):
+            fan_out(record, ['tenant1', 'tenant2'])
+            record()
+            return ['metric1', 'metric2'], [], [], []
+
+        mock_import.side_effect = import_metrics
+        self._post(self.user)
+        run_pending_jobs()
+        self.assertEqual(progress, [0, 50, 100])
+
+    def test_set_progress_outside_of_job(self):
+        set_progress(1, 2)
+        self.assertEqual(Job.objects.count(), 0)
+
+
+class ListJobsAPIViewTests(TenantTestCase):
+    def setUp(self):
+        self.factory = TenantRequestFactory(self.tenant)
+        self.view = views.ListJobs.as_view()
+        self.url = '/api/v2/internal/jobs/'
+        self.user = CustUser.objects.create_user(username='test')
+        self.superuser = CustUser.objects.create_user(
+            username='poem', is_superuser=True
+        )
+        self.other_user = CustUser.objects.create_user(username='other')
+
+        self.job = Job.objects.create(
+            name='import_metrics', schema_name=self.tenant.schema_name,
+            user='test', status=Job.DONE, progress=100, status_code=200,
+            result=json.dumps({'imported': 'metric1 has been imported.'})
+        )
+        self.other_job = Job.objects.create(
+            name='import_metrics', schema_name='other', user='test'
+        )
+
+    def _get(self, job_id, user):
+        request = self.factory.get(self.url + str(job_id))
+        request.tenant = self.tenant
+        force_authenticate(request, user=user)
+        return self.view(request, job_id)
+
+    def test_get_job(self):
+        for user in [self.user, self.superuser]:
+            response = self._get(self.job.id, user)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['id'], self.job.id)
+            self.assertEqual(response.data['name'], 'import_metrics')
+            self.assertEqual(response.data['status'], 'done')
+            self.assertEqual(response.data['progress'], 100)
+            self.assertEqual(response.data['status_code'], 200)
+            self.assertEqual(
+                response.data['result'],
+                {'imported': 'metric1 has been imported.'}
+            )
+
+    def test_get_job_of_other_user(self):
+        response = self._get(self.job.id, self.other_user)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data['detail'], 'Job not found')
+
+    def test_get_job_of_other_tenant(self):
+        response = self._get(self.other_job.id, self.superuser)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data['detail'], 'Job not found')
@@ -144,7 +144,7 @@ class ListMetricProfilesAPIViewTests(TenantTestCase):
             content_type=self.ct
         )
 
-    @patch('Poem.api.internal_views.metricprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.metricprofiles.request_sync')
     def test_get_all_metric_profiles_superuser(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url)
@@ -168,7 +168,46 @@ class ListMetricProfilesAPIViewTests(TenantTestCase):
             ]
         )
 
-    @patch('Poem.api.internal_views.metricprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.metricprofiles.request_sync')
+    def test_get_all_metric_profiles_not_forcing_sync(self, func):
+        func.side_effect = mocked_func
+        request = self.factory.get(self.url)
+        force_authenticate(request, user=self.superuser)
+        self.view(request)
+        func.assert_called_once_with('metric_profiles', force=False)
+
+    @patch('Poem.api.internal_views.metricprofiles.request_sync')
+    def test_get_all_metric_profiles_forcing_sync(self, func):
+        func.side_effect = mocked_func
+        request = self.factory.get(self.url + '?sync=true')
+        force_authenticate(request, user=self.superuser)
+        response = self.view(request)
+        func.assert_called_once_with('metric_profiles', force=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+    @patch('Poem.api.internal_views.metricprofiles.request_sync')
+    def test_get_all_metric_profiles_not_forcing_sync_if_false(self, func):
+        func.side_effect = mocked_func
+        for value in ['0', 'false']:
+            request = self.factory.get(self.url + '?sync=' + value)
+            force_authenticate(request, user=self.superuser)
+            self.view(request)
+            func.assert_called_with('metric_profiles', force=False)
+
+    @patch('Poem.api.internal_views.metricprofiles.request_sync')
+    def test_get_all_metric_profiles_forcing_sync_with_error(self, func):
+        func.side_effect = Exception('API key not found')
+        request = self.factory.get(self.url + '?sync=true')
+        force_authenticate(request, user=self.superuser)
+        response = self.view(request)
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertEqual(
+            response.data['detail'],
+            'Error syncing metric profiles with WEB-API: API key not found'
+        )
+
+    @patch('Poem.api.internal_views.metricprofiles.request_sync')
     def test_get_all_metric_profiles_regular_user(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url)
@@ -192,7 +231,7 @@ class ListMetricProfilesAPIViewTests(TenantTestCase):
             ]
         )
 
-    @patch('Poem.api.internal_views.metricprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.metricprofiles.request_sync')
     def test_get_all_metric_profiles_regular_user_limited_user(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url)
@@ -216,7 +255,7 @@ class ListMetricProfilesAPIViewTests(TenantTestCase):
             ]
         )
 
-    @patch('Poem.api.internal_views.metricprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.metricprofiles.request_sync')
     def test_get_metric_profile_by_name_superuser(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url + 'TEST_PROFILE')
@@ -232,7 +271,7 @@ class ListMetricProfilesAPIViewTests(TenantTestCase):
             ])
         )
 
-    @patch('Poem.api.internal_views.metricprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.metricprofiles.request_sync')
     def test_get_metric_profile_by_name_regular_user(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url + 'TEST_PROFILE')
@@ -248,7 +287,7 @@ class ListMetricProfilesAPIViewTests(TenantTestCase):
             ])
         )
 
-    @patch('Poem.api.internal_views.metricprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.metricprofiles.request_sync')
     def test_get_metric_profile_by_name_limited_user(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url + 'TEST_PROFILE')
@@ -264,7 +303,7 @@ class ListMetricProfilesAPIViewTests(TenantTestCase):
             ])
         )
 
-    @patch('Poem.api.internal_views.metricprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.metricprofiles.request_sync')
     def test_get_metric_profile_if_wrong_name_superuser(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url + 'nonexisting')
@@ -272,7 +311,7 @@ class ListMetricProfilesAPIViewTests(TenantTestCase):
         response = self.view(request, 'nonexisting')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
-    @patch('Poem.api.internal_views.metricprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.metricprofiles.request_sync')
     def test_get_metric_profile_if_wrong_name_regular_user(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url + 'nonexisting')
@@ -280,7 +319,7 @@ class ListMetricProfilesAPIViewTests(TenantTestCase):
         response = self.view(request, 'nonexisting')
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
-    @patch('Poem.api.internal_views.metricprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.metricprofiles.request_sync')
     def test_get_metric_profile_if_wrong_name_limited_user(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url + 'nonexisting')
@@ -1380,3 +1419,88 @@ class ListMetricProfilesAPIViewTests(TenantTestCase):
         self.assertEqual(
             response.data, {'detail': 'Metric profile not specified!'}
         )
+
+
+class ListMetricsInProfilesAPIViewTests(TenantTestCase):
+    def setUp(self):
+        self.factory = TenantRequestFactory(self.tenant)
+        self.view = views.ListMetricsInProfiles.as_view()
+        self.url = '/api/v2/internal/metricsinprofiles/'
+        self.user = CustUser.objects.create_user(username='testuser')
+
+        ct = ContentType.objects.get_for_model(poem_models.MetricProfiles)
+
+        profiles = [
+            ('TEST_PROFILE', '00000000-oooo-kkkk-aaaa-aaeekkccnnee', [
+                ['AMGA', 'org.nagios.SAML-SP'],
+                ['APEL', 'org.apel.APEL-Pub'],
+                ['APEL', 'org.apel.APEL-Sync']
+            ]),
+            ('ANOTHER-PROFILE', '12341234-oooo-kkkk-aaaa-aaeekkccnnee', [
+                ['APEL', 'org.apel.APEL-Pub']
+            ])
+        ]
+        for name, apiid, metricinstances in profiles:
+            profile = poem_models.MetricProfiles.objects.create(
+                name=name, apiid=apiid, groupname='EGI'
+            )
+            data = json.loads(
+                serializers.serialize(
+                    'json', [profile],
+                    use_natural_foreign_keys=True,
+                    use_natural_primary_keys=True
+                )
+            )
+            data[0]['fields'].update({'metricinstances': metricinstances})
+
+            poem_models.TenantHistory.objects.create(
+                object_id=profile.id,
+                serialized_data=json.dumps(data),
+                object_repr=profile.__str__(),
+                comment='Initial version.',
+                user='testuser',
+                content_type=ct
+            )
+
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    def test_get_metrics_in_profiles(self, mock_get):
+        request = self.factory.get(self.url)
+        force_authenticate(request, user=self.user)
+        response = self.view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            [
+                {
+                    'metric': 'org.apel.APEL-Pub',
+                    'profiles': ['ANOTHER-PROFILE', 'TEST_PROFILE']
+                },
+                {
+                    'metric': 'org.apel.APEL-Sync',
+                    'profiles': ['TEST_PROFILE']
+                },
+                {
+                    'metric': 'org.nagios.SAML-SP',
+                    'profiles': ['TEST_PROFILE']
+                }
+            ]
+        )
+        self.assertFalse(mock_get.called)
+
+    def test_get_profiles_of_metric(self):
+        request = self.factory.get(self.url + 'org.apel.APEL-Sync')
+        force_authenticate(request, user=self.user)
+        response = self.view(request, 'org.apel.APEL-Sync')
+        self.assertEqual(
+            response.data,
+            {'metric': 'org.apel.APEL-Sync', 'profiles': ['TEST_PROFILE']}
+        )
+
+    def test_get_profiles_of_metric_not_in_profiles(self):
+        request = self.factory.get(self.url + 'org.nagios.CertLifetime')
+        force_authenticate(request, user=self.user)
+        response = self.view(request, 'org.nagios.CertLifetime')
+        self.assertEqual(
+            response.data,
+            {'metric': 'org.nagios.CertLifetime', 'profiles': []}
+        )
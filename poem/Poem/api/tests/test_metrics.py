@@ -4,13 +4,14 @@ from unittest.mock import patch, call
 
 import requests
 from Poem.api import views_internal as views
+from Poem.helpers.history_helpers import serialize_metric
 from Poem.api.internal_views.utils import inline_metric_for_db
+from Poem.helpers import metrics_helpers
 from Poem.poem import models as poem_models
 from Poem.poem_super_admin import models as admin_models
 from Poem.tenants.models import Tenant
 from Poem.users.models import CustUser
 from django.contrib.contenttypes.models import ContentType
-from django.core import serializers
 from rest_framework import status
 from rest_framework.test import force_authenticate
 from tenant_schemas.test.cases import TenantTestCase
@@ -18,7 +19,7 @@ from tenant_schemas.test.client import TenantRequestFactory
 from tenant_schemas.utils import get_public_schema_name, schema_context
 
 from .utils_test import mocked_func, encode_data, mocked_inline_metric_for_db, \
-    MockResponse
+    MockResponse, streamed_json
 
 
 class ListAllMetricsAPIViewTests(TenantTestCase):
@@ -258,11 +259,7 @@ class ListMetricAPIViewTests(TenantTestCase):
         poem_models.TenantHistory.objects.create(
             object_id=self.metric1.id,
             object_repr=self.metric1.__str__(),
-            serialized_data=serializers.serialize(
-                'json', [self.metric1],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(self.metric1),
             date_created=datetime.datetime.now(),
             user=self.user.username,
             comment='Initial version.',
@@ -272,11 +269,7 @@ class ListMetricAPIViewTests(TenantTestCase):
         poem_models.TenantHistory.objects.create(
             object_id=self.metric2.id,
             object_repr=self.metric2.__str__(),
-            serialized_data=serializers.serialize(
-                'json', [self.metric2],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(self.metric2),
             date_created=datetime.datetime.now(),
             user=self.user.username,
             comment='Initial version.',
@@ -286,17 +279,24 @@ class ListMetricAPIViewTests(TenantTestCase):
         poem_models.TenantHistory.objects.create(
             object_id=self.metric3.id,
             object_repr=self.metric3.__str__(),
-            serialized_data=serializers.serialize(
-                'json', [self.metric3],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(self.metric3),
             date_created=datetime.datetime.now(),
             user=self.user.username,
             comment='Initial version.',
             content_type=self.ct
         )
 
+    def test_get_metric_list_streamed(self):
+        request = self.factory.get(self.url)
+        force_authenticate(request, user=self.user)
+        response = self.view(request)
+        with self.settings(STREAMING_THRESHOLD=0):
+            streamed = self.view(request)
+
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(streamed['Content-Type'], 'application/json')
+        self.assertEqual(streamed_json(streamed), response.data)
+
     def test_get_metric_list(self):
         request = self.factory.get(self.url)
         force_authenticate(request, user=self.user)
@@ -599,8 +599,8 @@ class ListMetricAPIViewTests(TenantTestCase):
         )
         self.assertEqual(serialized_data['description'], metric.description)
         self.assertEqual(
-            serialized_data['probekey'],
-            [metric.probekey.name, metric.probekey.package.version]
+            serialized_data['probekey'][0],
+            metric.probekey.id
         )
         self.assertEqual(serialized_data['parent'], metric.parent)
         self.assertEqual(
@@ -691,8 +691,8 @@ class ListMetricAPIViewTests(TenantTestCase):
         )
         self.assertEqual(serialized_data['description'], metric.description)
         self.assertEqual(
-            serialized_data['probekey'],
-            [metric.probekey.name, metric.probekey.package.version]
+            serialized_data['probekey'][0],
+            metric.probekey.id
         )
         self.assertEqual(serialized_data['parent'], metric.parent)
         self.assertEqual(
@@ -787,8 +787,8 @@ class ListMetricAPIViewTests(TenantTestCase):
         )
         self.assertEqual(serialized_data['description'], metric.description)
         self.assertEqual(
-            serialized_data['probekey'],
-            [metric.probekey.name, metric.probekey.package.version]
+            serialized_data['probekey'][0],
+            metric.probekey.id
         )
         self.assertEqual(serialized_data['parent'], metric.parent)
         self.assertEqual(
@@ -876,8 +876,8 @@ class ListMetricAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['tags'], [['test_tag1']])
         self.assertEqual(serialized_data['description'], metric.description)
         self.assertEqual(
-            serialized_data['probekey'],
-            [metric.probekey.name, metric.probekey.package.version]
+            serialized_data['probekey'][0],
+            metric.probekey.id
         )
         self.assertEqual(serialized_data['parent'], metric.parent)
         self.assertEqual(
@@ -972,8 +972,8 @@ class ListMetricAPIViewTests(TenantTestCase):
         )
         self.assertEqual(serialized_data['description'], metric.description)
         self.assertEqual(
-            serialized_data['probekey'],
-            [metric.probekey.name, metric.probekey.package.version]
+            serialized_data['probekey'][0],
+            metric.probekey.id
         )
         self.assertEqual(serialized_data['parent'], metric.parent)
         self.assertEqual(
@@ -2508,11 +2508,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
 
         poem_models.TenantHistory.objects.create(
             object_id=metric1.id,
-            serialized_data=serializers.serialize(
-                'json', [metric1],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(metric1),
             object_repr=metric1.__str__(),
             content_type=ct,
             date_created=datetime.datetime.now(),
@@ -2522,11 +2518,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
 
         poem_models.TenantHistory.objects.create(
             object_id=metric1.id,
-            serialized_data=serializers.serialize(
-                'json', [metric1],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(metric1),
             object_repr=metric1.__str__(),
             content_type=ct,
             date_created=datetime.datetime.now(),
@@ -2536,11 +2528,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
 
         poem_models.TenantHistory.objects.create(
             object_id=metric2.id,
-            serialized_data=serializers.serialize(
-                'json', [metric2],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(metric2),
             object_repr=metric2.__str__(),
             content_type=ct,
             date_created=datetime.datetime.now(),
@@ -2550,11 +2538,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
 
         poem_models.TenantHistory.objects.create(
             object_id=metric3.id,
-            serialized_data=serializers.serialize(
-                'json', [metric3],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(metric3),
             object_repr=metric3.__str__(),
             content_type=ct,
             date_created=datetime.datetime.now(),
@@ -2564,11 +2548,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
 
         poem_models.TenantHistory.objects.create(
             object_id=metric4.id,
-            serialized_data=serializers.serialize(
-                'json', [metric4],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(metric4),
             object_repr=metric4.__str__(),
             content_type=ct,
             date_created=datetime.datetime.now(),
@@ -2588,7 +2568,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
     @patch('Poem.api.internal_views.metrics.delete_metrics_from_profile')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_update_metrics_versions_when_not_superuser(
             self, mock_update, mock_delete
     ):
@@ -2610,7 +2590,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
         self.assertFalse(mock_delete.called)
 
     @patch('Poem.api.internal_views.metrics.delete_metrics_from_profile')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_update_metrics_versions(self, mock_update, mock_delete):
         mock_update.side_effect = mocked_func
         mock_delete.side_effect = mocked_func
@@ -2625,19 +2605,13 @@ class UpdateMetricsVersionsTests(TenantTestCase):
         response = self.view(request)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertFalse(mock_delete.called)
-        self.assertEqual(mock_update.call_count, 2)
-        mock_update.assert_has_calls([
-            call(
-                mt_id=self.mt1_history2.id, name='argo.AMS-Check',
-                pk_id=self.probehistory1.id, schema='test',
-                update_from_history=True, user='testuser'
-            ),
-            call(
-                mt_id=self.mt2_history2.id, name='argo.AMSPublisher-Check',
-                pk_id=self.probehistory3.id, schema='test',
-                update_from_history=True, user='testuser'
-            )
-        ], any_order=True)
+        mock_update.assert_called_once_with(
+            updates=[
+                ('argo.AMS-Check', self.mt1_history2.id),
+                ('argo.AMSPublisher-Check', self.mt2_history2.id)
+            ],
+            schema='test', user='testuser'
+        )
         self.assertEqual(
             response.data,
             {
@@ -2648,7 +2622,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
 
     @patch('Poem.api.internal_views.metrics.delete_metrics_from_profile')
     @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_update_metrics_version_if_metric_template_was_renamed(
             self, mock_update, mock_get, mock_delete
     ):
@@ -2710,14 +2684,10 @@ class UpdateMetricsVersionsTests(TenantTestCase):
         response = self.view(request)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertFalse(mock_delete.called)
-        self.assertEqual(mock_update.call_count, 1)
-        mock_update.assert_has_calls([
-            call(
-                mt_id=mt1_history3.id, name='argo.AMS-Check',
-                pk_id=self.probehistory1.id, schema='test',
-                update_from_history=True, user='testuser'
-            )
-        ])
+        mock_update.assert_called_once_with(
+            updates=[('argo.AMS-Check', mt1_history3.id)],
+            schema='test', user='testuser'
+        )
         self.assertEqual(
             response.data,
             {
@@ -2730,7 +2700,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
 
     @patch('Poem.api.internal_views.metrics.delete_metrics_from_profile')
     @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_metrics_deleted_if_their_probes_do_not_exist_in_new_package(
             self, mock_update, mock_get, mock_delete
     ):
@@ -2797,16 +2767,12 @@ class UpdateMetricsVersionsTests(TenantTestCase):
         mock_delete.assert_called_once_with(
             'PROFILE1', ['argo.AMSPublisher-Check']
         )
-        self.assertEqual(mock_update.call_count, 1)
-        mock_update.assert_has_calls([
-            call(
-                mt_id=mt1_history3.id, name='argo.AMS-Check',
-                pk_id=self.probehistory1.id, schema='test',
-                update_from_history=True, user='testuser'
-            )
-        ])
+        mock_update.assert_called_once_with(
+            updates=[('argo.AMS-Check', mt1_history3.id)],
+            schema='test', user='testuser'
+        )
 
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_metrics_warning_if_metric_template_history_do_not_exist(
             self, mock_update
     ):
@@ -2833,7 +2799,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
 
     @patch('Poem.api.internal_views.metrics.delete_metrics_from_profile')
     @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_metrics_with_update_warning_and_deletion(
             self,  mock_update, mock_get, mock_delete
     ):
@@ -2920,14 +2886,10 @@ class UpdateMetricsVersionsTests(TenantTestCase):
                            'Please contact Administrator.'
             }
         )
-        self.assertEqual(mock_update.call_count, 1)
-        mock_update.assert_has_calls([
-            call(
-                mt_id=mt1_history3.id, name='argo.AMS-Check',
-                pk_id=self.probehistory1.id, schema='test',
-                update_from_history=True, user='testuser'
-            )
-        ])
+        mock_update.assert_called_once_with(
+            updates=[('argo.AMS-Check', mt1_history3.id)],
+            schema='test', user='testuser'
+        )
         self.assertEqual(mock_delete.call_count, 2)
         mock_delete.assert_has_calls([
             call('PROFILE1', ['argo.AMSPublisher-Check']),
@@ -2936,7 +2898,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
 
     @patch('Poem.api.internal_views.metrics.delete_metrics_from_profile')
     @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_metrics_with_update_warning_and_deletion_if_api_get_exception(
             self,  mock_update, mock_get, mock_delete
     ):
@@ -3023,20 +2985,16 @@ class UpdateMetricsVersionsTests(TenantTestCase):
                            'Please contact Administrator.'
             }
         )
-        self.assertEqual(mock_update.call_count, 1)
-        mock_update.assert_has_calls([
-            call(
-                mt_id=mt1_history3.id, name='argo.AMS-Check',
-                pk_id=self.probehistory1.id, schema='test',
-                update_from_history=True, user='testuser'
-            )
-        ])
+        mock_update.assert_called_once_with(
+            updates=[('argo.AMS-Check', mt1_history3.id)],
+            schema='test', user='testuser'
+        )
         mock_get.assert_called_once_with(self.tenant.schema_name)
         self.assertFalse(mock_delete.called)
 
     @patch('Poem.api.internal_views.metrics.delete_metrics_from_profile')
     @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_metrics_with_update_warning_and_deletion_if_api_put_exception(
             self,  mock_update, mock_get, mock_delete
     ):
@@ -3126,20 +3084,16 @@ class UpdateMetricsVersionsTests(TenantTestCase):
                            'Please contact Administrator.'
             }
         )
-        self.assertEqual(mock_update.call_count, 1)
-        mock_update.assert_has_calls([
-            call(
-                mt_id=mt1_history3.id, name='argo.AMS-Check',
-                pk_id=self.probehistory1.id, schema='test',
-                update_from_history=True, user='testuser'
-            )
-        ])
+        mock_update.assert_called_once_with(
+            updates=[('argo.AMS-Check', mt1_history3.id)],
+            schema='test', user='testuser'
+        )
         mock_get.assert_called_once_with(self.tenant.schema_name)
         mock_delete.assert_called_once_with(
             'PROFILE1', ['argo.AMSPublisher-Check']
         )
 
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_update_metrics_if_package_not_found(self, mock_update):
         mock_update.side_effect = mocked_func
         data = {
@@ -3156,7 +3110,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
         self.assertFalse(mock_update.called)
 
     @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_update_metrics_versions_dry_run(self, mock_update, mock_get):
         mock_update.side_effect = mocked_func
         mock_get.return_value = {
@@ -3179,7 +3133,50 @@ class UpdateMetricsVersionsTests(TenantTestCase):
         )
 
     @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
+    def test_update_metrics_versions_applies_dry_run_plan(
+            self, mock_update, mock_get
+    ):
+        mock_get.return_value = {}
+        content, content_type = encode_data({
+            'name': self.package2.name, 'version': self.package2.version
+        })
+        with patch(
+            'Poem.helpers.metrics_helpers._make_metrics_versions_plan',
+            wraps=metrics_helpers._make_metrics_versions_plan
+        ) as mock_plan:
+            request = self.factory.get(self.url + 'nagios-plugins-argo-0.1.8')
+            request.tenant = self.tenant
+            force_authenticate(request, user=self.user)
+            response = self.view(request, 'nagios-plugins-argo-0.1.8')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            request = self.factory.put(
+                self.url, content, content_type=content_type
+            )
+            request.tenant = self.tenant
+            force_authenticate(request, user=self.user)
+            response = self.view(request)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(mock_plan.call_count, 1)
+            mock_update.assert_called_once_with(
+                updates=[
+                    ('argo.AMS-Check', self.mt1_history2.id),
+                    ('argo.AMSPublisher-Check', self.mt2_history2.id)
+                ],
+                schema='test', user='testuser'
+            )
+            poem_models.Metric.objects.get(name='argo.AMS-Check').save()
+            request = self.factory.put(
+                self.url, content, content_type=content_type
+            )
+            request.tenant = self.tenant
+            force_authenticate(request, user=self.user)
+            response = self.view(request)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(mock_plan.call_count, 2)
+
+    @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_update_metrics_version_if_metric_template_was_renamed_dry_run(
             self, mock_update, mock_get
     ):
@@ -3254,7 +3251,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
         )
 
     @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_metrics_deleted_if_their_probes_do_not_exist_in_new_package_dry(
             self, mock_update, mock_get
     ):
@@ -3316,7 +3313,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
         mock_get.assert_called_once()
 
     @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_metrics_warning_if_metric_template_history_do_not_exist_dry_run(
             self, mock_update, mock_get
     ):
@@ -3342,7 +3339,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
         )
 
     @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_metrics_with_update_warning_and_deletion_dry(
             self,  mock_update, mock_get
     ):
@@ -3426,7 +3423,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
         mock_get.assert_called_once()
 
     @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_update_metrics_if_metrics_in_profiles_wrong_token_dry_run(
             self, mock_update, mock_get
     ):
@@ -3459,7 +3456,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
         self.assertFalse(mock_update.called)
 
     @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_update_metrics_if_metrics_in_profiles_page_not_found_dry_run(
             self, mock_update, mock_get
     ):
@@ -3481,7 +3478,7 @@ class UpdateMetricsVersionsTests(TenantTestCase):
         self.assertFalse(mock_update.called)
 
     @patch('Poem.api.internal_views.metrics.get_metrics_in_profiles')
-    @patch('Poem.api.internal_views.metrics.update_metric_in_schema')
+    @patch('Poem.api.internal_views.metrics.update_metrics_from_history')
     def test_update_metrics_if_metrics_in_profiles_api_key_not_found_dry_run(
             self, mock_update, mock_get
     ):
@@ -1,24 +1,26 @@
 import datetime
 import json
-from unittest.mock import patch, call
+from unittest.mock import patch
 
 import requests
 from Poem.api import views_internal as views
-from Poem.helpers.history_helpers import create_comment
+from Poem.helpers.history_helpers import create_comment, serialize_metric
 from Poem.helpers.versioned_comments import new_comment
 from Poem.poem import models as poem_models
 from Poem.poem_super_admin import models as admin_models
 from Poem.tenants.models import Tenant
 from Poem.users.models import CustUser
 from django.contrib.contenttypes.models import ContentType
-from django.core import serializers
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import force_authenticate
 from tenant_schemas.test.cases import TenantTestCase
 from tenant_schemas.test.client import TenantRequestFactory
 from tenant_schemas.utils import get_public_schema_name, schema_context
 
-from .utils_test import mocked_inline_metric_for_db, mocked_func, encode_data
+from .utils_test import mocked_inline_metric_for_db, mocked_func, encode_data, \
+    streamed_json
 
 
 class ListMetricTemplatesAPIViewTests(TenantTestCase):
@@ -306,11 +308,7 @@ class ListMetricTemplatesAPIViewTests(TenantTestCase):
         poem_models.TenantHistory.objects.create(
             object_id=self.metric1.id,
             object_repr=self.metric1.__str__(),
-            serialized_data=serializers.serialize(
-                'json', [self.metric1],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(self.metric1),
             content_type=self.ct,
             date_created=datetime.datetime.now(),
             comment='Initial version.',
@@ -336,11 +334,7 @@ class ListMetricTemplatesAPIViewTests(TenantTestCase):
         poem_models.TenantHistory.objects.create(
             object_id=self.metric2.id,
             object_repr=self.metric2.__str__(),
-            serialized_data=serializers.serialize(
-                'json', [self.metric2],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(self.metric2),
             content_type=self.ct,
             date_created=datetime.datetime.now(),
             comment='Initial version.',
@@ -650,6 +644,79 @@ class ListMetricTemplatesAPIViewTests(TenantTestCase):
             ]
         )
 
+    def _get_list(self, tenant, user):
+        request = self.factory.get(self.url)
+        request.tenant = tenant
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.view(request)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(queries)
+
+    def test_get_metric_template_list_in_constant_queries(self):
+        response1, queries1 = self._get_list(self.public_tenant, self.user)
+        mt = admin_models.MetricTemplate.objects.create(
+            name='argo.AMS-Check-Old',
+            mtype=self.template_active,
+            probekey=self.probeversion1,
+            probeexecutable='["ams-probe"]'
+        )
+        mt.tags.add(self.tag1, self.tag2)
+        response2, queries2 = self._get_list(self.public_tenant, self.user)
+        self.assertEqual(len(response2.data), len(response1.data) + 1)
+        self.assertEqual(queries1, queries2)
+        mt = [
+            item for item in response2.data
+            if item['name'] == 'argo.AMS-Check-Old'
+        ][0]
+        self.assertEqual(mt['ostag'], ['CentOS 6'])
+        self.assertEqual(mt['tags'], ['deprecated', 'internal'])
+        self.assertEqual(mt['probeversion'], 'ams-probe (0.1.7)')
+
+    def test_get_metric_template_list_streamed(self):
+        for tenant, user in [
+            (self.public_tenant, self.user), (self.tenant, self.tenant_user)
+        ]:
+            response, queries = self._get_list(tenant, user)
+            with self.settings(STREAMING_THRESHOLD=0):
+                streamed, queries = self._get_list(tenant, user)
+
+            self.assertTrue(streamed.streaming)
+            self.assertEqual(streamed_json(streamed), response.data)
+
+    def test_get_metric_template_list_cached(self):
+        response1, queries1 = self._get_list(self.public_tenant, self.user)
+        response2, queries2 = self._get_list(self.public_tenant, self.user)
+        self.assertEqual(response1.data, response2.data)
+        # only public content version is looked up
+        self.assertEqual(queries2, 1)
+        response3, queries3 = self._get_list(self.tenant, self.tenant_user)
+        # and names of tenant's metrics
+        self.assertEqual(queries3, 2)
+        self.assertEqual(
+            [item['name'] for item in response3.data],
+            [item['name'] for item in response1.data]
+        )
+
+    def test_get_metric_template_list_cache_invalidated(self):
+        self._get_list(self.public_tenant, self.user)
+        self.metrictemplate1.description = 'Changed description.'
+        self.metrictemplate1.save()
+        response, queries = self._get_list(self.public_tenant, self.user)
+        mt = [
+            item for item in response.data
+            if item['id'] == self.metrictemplate1.id
+        ][0]
+        self.assertEqual(mt['description'], 'Changed description.')
+        self.metrictemplate1.tags.remove(self.tag3)
+        response, queries = self._get_list(self.public_tenant, self.user)
+        mt = [
+            item for item in response.data
+            if item['id'] == self.metrictemplate1.id
+        ][0]
+        self.assertEqual(mt['tags'], ['test_tag2'])
+
     def test_get_metrictemplate_by_name_super_tenant(self):
         request = self.factory.get(self.url + 'argo.AMS-Check')
         request.tenant = self.public_tenant
@@ -7348,6 +7415,41 @@ class ListMetricTemplatesForImportTests(TenantTestCase):
         )
 
 
+    def test_get_metrictemplates_for_import_in_constant_queries(self):
+        request = self.factory.get(self.url)
+        force_authenticate(request, user=self.user)
+        # templates, their tags, import index and OS tags
+        with self.assertNumQueries(4):
+            response = self.view(request)
+
+        self.assertEqual(len(response.data), 4)
+
+    def test_get_metrictemplates_for_import_after_repos_change(self):
+        package = admin_models.Package.objects.get(
+            name='sdc-nerc-sparql', version='1.0.1'
+        )
+        package.repos.add(admin_models.YumRepo.objects.get(name='repo-1'))
+        request = self.factory.get(self.url)
+        force_authenticate(request, user=self.user)
+        response = self.view(request)
+        self.assertEqual(
+            response.data[2],
+            {
+                'name': 'eu.seadatanet.org.nerc-sparql-check',
+                'mtype': 'Active',
+                'tags': [],
+                'ostag': ['CentOS 6', 'CentOS 7'],
+                'probeversion': 'sdc-nerq-sparq (1.0.1)',
+                'centos6_probeversion': 'sdc-nerq-sparq (1.0.1)',
+                'centos7_probeversion': 'sdc-nerq-sparq (1.0.1)'
+            }
+        )
+        package.repos.clear()
+        response = self.view(request)
+        self.assertEqual(response.data[2]['ostag'], [])
+        self.assertEqual(response.data[2]['centos7_probeversion'], '')
+
+
 class CommentsTests(TenantTestCase):
     def test_new_comment_with_objects_change(self):
         comment = '[{"changed": {"fields": ["config"], ' \
@@ -7659,11 +7761,7 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
 
         poem_models.TenantHistory.objects.create(
             object_id=self.metric.id,
-            serialized_data=serializers.serialize(
-                'json', [self.metric],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(self.metric),
             object_repr='argo.AMS-Check',
             content_type=ContentType.objects.get_for_model(self.metric),
             date_created=datetime.datetime.now(),
@@ -7672,13 +7770,13 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         )
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_sp_superuser(
             self, mock_get, mock_delete
     ):
         mock_get.return_value = {'test.AMS-Check': ['PROFILE1', 'PROFILE2']}
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -7717,18 +7815,17 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
             len(poem_models.TenantHistory.objects.filter(object_id=metric_id)),
             0
         )
-        self.assertEqual(mock_delete.call_count, 2)
-        mock_delete.assert_has_calls([
-            call('PROFILE1', ['test.AMS-Check']),
-            call('PROFILE2', ['test.AMS-Check'])
-        ])
+        mock_delete.assert_called_once_with({
+            'PROFILE1': ['test.AMS-Check'],
+            'PROFILE2': ['test.AMS-Check']
+        })
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_sp_user(self, mock_get, mock_delete):
         mock_get.return_value = {'test.AMS-Check': ['PROFILE1', 'PROFILE2']}
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -7752,13 +7849,13 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         self.assertFalse(mock_delete.called)
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_tenant_superuser(
             self, mock_get, mock_delete
     ):
         mock_get.return_value = {'test.AMS-Check': ['PROFILE1', 'PROFILE2']}
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -7782,13 +7879,13 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         self.assertFalse(mock_delete.called)
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_tenant_user(
             self, mock_get, mock_delete
     ):
         mock_get.return_value = {'test.AMS-Check': ['PROFILE1', 'PROFILE2']}
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -7812,13 +7909,13 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         self.assertFalse(mock_delete.called)
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_one_metric_templates_sp_superuser(
             self, mock_get, mock_delete
     ):
         mock_get.return_value = {'test.AMS-Check': ['PROFILE1', 'PROFILE2']}
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {'metrictemplates': ['test.AMS-Check']}
         assert self.metric
         metric_id = self.metric.id
@@ -7847,20 +7944,19 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
             len(poem_models.TenantHistory.objects.filter(object_id=metric_id)),
             0
         )
-        self.assertEqual(mock_delete.call_count, 2)
-        mock_delete.assert_has_calls([
-            call('PROFILE1', ['test.AMS-Check']),
-            call('PROFILE2', ['test.AMS-Check'])
-        ])
+        mock_delete.assert_called_once_with({
+            'PROFILE1': ['test.AMS-Check'],
+            'PROFILE2': ['test.AMS-Check']
+        })
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_one_metric_templates_sp_user(
             self, mock_get, mock_delete
     ):
         mock_get.return_value = {'test.AMS-Check': ['PROFILE1', 'PROFILE2']}
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {'metrictemplates': ['test.AMS-Check']}
         assert self.metric
         metric_id = self.metric.id
@@ -7882,13 +7978,13 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         self.assertFalse(mock_delete.called)
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_one_metric_templates_tenant_superuser(
             self, mock_get, mock_delete
     ):
         mock_get.return_value = {'test.AMS-Check': ['PROFILE1', 'PROFILE2']}
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {'metrictemplates': ['test.AMS-Check']}
         assert self.metric
         metric_id = self.metric.id
@@ -7910,13 +8006,13 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         self.assertFalse(mock_delete.called)
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_one_metric_templates_tenant_user(
             self, mock_get, mock_delete
     ):
         mock_get.return_value = {'test.AMS-Check': ['PROFILE1', 'PROFILE2']}
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {'metrictemplates': ['test.AMS-Check']}
         assert self.metric
         metric_id = self.metric.id
@@ -7938,7 +8034,7 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         self.assertFalse(mock_delete.called)
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_if_get_exception_sp_superuser(
             self, mock_get, mock_delete
@@ -7946,7 +8042,7 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         mock_get.side_effect = Exception(
             'Error fetching WEB API data: API key not found'
         )
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -7972,7 +8068,7 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         assert self.metric, metric_history
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_if_get_exception_sp_user(
             self, mock_get, mock_delete
@@ -7980,7 +8076,7 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         mock_get.side_effect = Exception(
             'Error fetching WEB API data: API key not found'
         )
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -8000,7 +8096,7 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         assert self.metric, metric_history
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_if_get_exception_tenant_superuser(
             self, mock_get, mock_delete
@@ -8008,7 +8104,7 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         mock_get.side_effect = Exception(
             'Error fetching WEB API data: API key not found'
         )
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -8028,7 +8124,7 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         assert self.metric, metric_history
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_if_get_exception_tenant_user(
             self, mock_get, mock_delete
@@ -8036,7 +8132,7 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         mock_get.side_effect = Exception(
             'Error fetching WEB API data: API key not found'
         )
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -8056,13 +8152,13 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         assert self.metric, metric_history
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_if_get_requests_exception_sp_sprusr(
             self, mock_get, mock_delete
     ):
         mock_get.side_effect = requests.exceptions.HTTPError('Exception')
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -8086,13 +8182,13 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         assert self.metric, metric_history
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_if_get_requests_exception_sp_user(
             self, mock_get, mock_delete
     ):
         mock_get.side_effect = requests.exceptions.HTTPError('Exception')
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -8111,13 +8207,13 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         assert self.metric, metric_history
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_if_get_requests_exception_tenant_susr(
             self, mock_get, mock_delete
     ):
         mock_get.side_effect = requests.exceptions.HTTPError('Exception')
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -8136,13 +8232,13 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         assert self.metric, metric_history
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_if_get_requests_exception_tenant_user(
             self, mock_get, mock_delete
     ):
         mock_get.side_effect = requests.exceptions.HTTPError('Exception')
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -8161,15 +8257,20 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         assert self.metric, metric_history
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_if_delete_profile_exception_sp_spusr(
             self, mock_get, mock_delete
     ):
         mock_get.return_value = {'test.AMS-Check': ['PROFILE1', 'PROFILE2']}
-        mock_delete.side_effect = Exception(
-            'Error deleting metric from profile: Something went wrong'
-        )
+        mock_delete.return_value = {
+            'PROFILE1': Exception(
+                'Error deleting metric from profile: Something went wrong'
+            ),
+            'PROFILE2': Exception(
+                'Error deleting metric from profile: Something went wrong'
+            )
+        }
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -8211,20 +8312,19 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
             len(poem_models.TenantHistory.objects.filter(object_id=metric_id)),
             0
         )
-        self.assertEqual(mock_delete.call_count, 2)
-        mock_delete.assert_has_calls([
-            call('PROFILE1', ['test.AMS-Check']),
-            call('PROFILE2', ['test.AMS-Check'])
-        ])
+        mock_delete.assert_called_once_with({
+            'PROFILE1': ['test.AMS-Check'],
+            'PROFILE2': ['test.AMS-Check']
+        })
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_if_metric_not_in_profile(
             self, mock_get, mock_delete
     ):
         mock_get.return_value = {}
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -8263,13 +8363,13 @@ class BulkDeleteMetricTemplatesTests(TenantTestCase):
         self.assertFalse(mock_delete.called)
 
     @patch(
-        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profile')
+        'Poem.api.internal_views.metrictemplates.delete_metrics_from_profiles')
     @patch('Poem.api.internal_views.metrictemplates.get_metrics_in_profiles')
     def test_bulk_delete_metric_templates_if_metric_not_in_profile(
             self, mock_get, mock_delete
     ):
         mock_get.return_value = {}
-        mock_delete.side_effect = mocked_func
+        mock_delete.return_value = {}
         data = {
             'metrictemplates': ['argo.AMS-Check', 'test.AMS-Check']
         }
@@ -2,12 +2,12 @@ import datetime
 import json
 
 from Poem.api import views_internal as views
+from Poem.helpers.history_helpers import create_history, serialize_metric
 from Poem.poem import models as poem_models
 from Poem.poem_super_admin import models as admin_models
 from Poem.tenants.models import Tenant
 from Poem.users.models import CustUser
 from django.contrib.contenttypes.models import ContentType
-from django.core import serializers
 from rest_framework import status
 from rest_framework.test import force_authenticate
 from tenant_schemas.test.cases import TenantTestCase
@@ -155,11 +155,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
 
         poem_models.TenantHistory.objects.create(
             object_id=metric1.id,
-            serialized_data=serializers.serialize(
-                'json', [metric1],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(metric1),
             object_repr=metric1.__str__(),
             content_type=ct,
             date_created=datetime.datetime.now(),
@@ -956,7 +952,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.7'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_sp_user(self):
         data = {
@@ -1004,7 +1000,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_tenant_superuser(self):
         data = {
@@ -1052,7 +1048,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_tenant_user(self):
         data = {
@@ -1100,7 +1096,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_present_version_sp_superuser(self):
         data = {
@@ -1143,7 +1139,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', 'present'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_present_version_sp_user(self):
         data = {
@@ -1191,7 +1187,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_present_version_tenant_superuser(self):
         data = {
@@ -1239,7 +1235,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_present_version_tenant_user(self):
         data = {
@@ -1287,7 +1283,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_new_repo_sp_superuser(self):
         repo = admin_models.YumRepo.objects.create(name='repo-3', tag=self.tag1)
@@ -1332,7 +1328,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.7'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_new_repo_sp_user(self):
         data = {
@@ -1380,7 +1376,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_new_repo_tenant_superuser(self):
         data = {
@@ -1428,7 +1424,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_new_repo_tenant_user(self):
         data = {
@@ -1476,7 +1472,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_already_existing_name_and_version_sp_sprusr(self):
         data = {
@@ -1614,7 +1610,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_repo_without_tag_sp_user(self):
         data = {
@@ -1662,7 +1658,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_repo_without_tag_tenant_superuser(self):
         data = {
@@ -1710,7 +1706,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_repo_without_tag_tenant_user(self):
         data = {
@@ -1758,7 +1754,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_nonexisting_repo_sp_superuser(self):
         data = {
@@ -1803,7 +1799,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_packageh_with_nonexisting_repo_sp_user(self):
         data = {
@@ -1851,7 +1847,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_nonexisting_repo_tenant_superuser(self):
         data = {
@@ -1899,7 +1895,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_nonexisting_repo_tenant_user(self):
         data = {
@@ -1947,7 +1943,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_nonexisting_tag_sp_superuser(self):
         data = {
@@ -1992,7 +1988,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_nonexisting_tag_sp_user(self):
         data = {
@@ -2040,7 +2036,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_nonexisting_tag_tenant_superuser(self):
         data = {
@@ -2088,7 +2084,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_nonexisting_tag_tenant_user(self):
         data = {
@@ -2136,7 +2132,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_missing_data_key_sp_superuser(self):
         data = {
@@ -2180,7 +2176,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_missing_data_key_sp_user(self):
         data = {
@@ -2227,7 +2223,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_missing_data_key_tenant_superuser(self):
         data = {
@@ -2274,7 +2270,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_missing_data_key_tenant_user(self):
         data = {
@@ -2321,7 +2317,7 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(metric_history.count(), 1)
         serialized_data = \
             json.loads(metric_history[0].serialized_data)[0]['fields']
-        self.assertEqual(serialized_data['probekey'], ['ams-probe', '0.1.11'])
+        self.assertEqual(serialized_data['probekey'][0], metric.probekey.id)
 
     def test_put_package_with_nonexisting_package_sp_superuser(self):
         data = {
@@ -2557,6 +2553,36 @@ class ListPackagesAPIViewTests(TenantTestCase):
         self.assertEqual(admin_models.Package.objects.all().count(), 4)
 
 
+    def test_package_change_does_not_rewrite_metric_history(self):
+        metric = poem_models.Metric.objects.get(name='argo.AMS-Check')
+        with self.settings(HISTORY_KEYFRAME_INTERVAL=3):
+            for i in range(3):
+                metric.description = 'Version {}.'.format(i)
+                metric.save()
+                create_history(metric, self.user.username)
+
+        history = poem_models.TenantHistory.objects.filter(
+            object_id=metric.id,
+            content_type=ContentType.objects.get_for_model(metric)
+        ).order_by('id')
+        stored = [ver.serialized_data for ver in history]
+
+        with schema_context(get_public_schema_name()):
+            self.package1.version = '0.1.12'
+            self.package1.save()
+
+        self.assertEqual([ver.serialized_data for ver in history], stored)
+        for ver in history:
+            fields = json.loads(ver.get_serialized_data())[0]['fields']
+            self.assertEqual(fields['probekey'][0], metric.probekey_id)
+        self.assertEqual(
+            admin_models.ProbeHistory.objects.get(
+                id=metric.probekey_id
+            ).package.version,
+            '0.1.12'
+        )
+
+
 class ListPackagesVersionsTests(TenantTestCase):
     def setUp(self):
         self.factory = TenantRequestFactory(self.tenant)
@@ -2,12 +2,12 @@ import datetime
 import json
 
 from Poem.api import views_internal as views
+from Poem.helpers.history_helpers import serialize_metric
 from Poem.poem import models as poem_models
 from Poem.poem_super_admin import models as admin_models
 from Poem.tenants.models import Tenant
 from Poem.users.models import CustUser
 from django.contrib.contenttypes.models import ContentType
-from django.core import serializers
 from rest_framework import status
 from rest_framework.test import force_authenticate
 from tenant_schemas.test.cases import TenantTestCase
@@ -209,11 +209,7 @@ class ListProbesAPIViewTests(TenantTestCase):
 
         poem_models.TenantHistory.objects.create(
             object_id=metric1.id,
-            serialized_data=serializers.serialize(
-                'json', [metric1],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(metric1),
             object_repr=metric1.__str__(),
             content_type=ct,
             date_created=datetime.datetime.now(),
@@ -223,11 +219,7 @@ class ListProbesAPIViewTests(TenantTestCase):
 
         poem_models.TenantHistory.objects.create(
             object_id=metric2.id,
-            serialized_data=serializers.serialize(
-                'json', [metric2],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(metric2),
             object_repr=metric2.__str__(),
             content_type=ct,
             date_created=datetime.datetime.now(),
@@ -447,6 +439,48 @@ class ListProbesAPIViewTests(TenantTestCase):
             ]
         )
 
+    def test_get_list_of_all_probes_in_constant_queries(self):
+        packages = [
+            admin_models.Package.objects.create(
+                name='nagios-plugins-test', version='1.0.{}'.format(i)
+            ) for i in range(4)
+        ]
+        for i in range(5):
+            probe = admin_models.Probe.objects.create(
+                name='probe-{}'.format(i),
+                package=self.package2,
+                description='Description of probe-{}.'.format(i),
+                comment='Initial version.',
+                repository='https://github.com/ARGOeu/nagios-plugins-argo',
+                docurl='https://github.com/ARGOeu/nagios-plugins-argo/blob/'
+                       'master/README.md'
+            )
+            for j in range(i):
+                admin_models.ProbeHistory.objects.create(
+                    object_id=probe,
+                    name=probe.name,
+                    package=packages[j],
+                    description=probe.description,
+                    comment=probe.comment,
+                    repository=probe.repository,
+                    docurl=probe.docurl,
+                    version_comment='Initial version.',
+                    version_user=self.superuser.username
+                )
+        request = self.factory.get(self.url)
+        request.tenant = self.super_tenant
+        force_authenticate(request, user=self.superuser)
+        with self.assertNumQueries(1):
+            response = self.view(request)
+        self.assertEqual(
+            [(probe['name'], probe['nv']) for probe in response.data],
+            [
+                ('ams-probe', 2), ('ams-publisher-probe', 1),
+                ('argo-web-api', 1), ('probe-0', 0), ('probe-1', 1),
+                ('probe-2', 2), ('probe-3', 3), ('probe-4', 4)
+            ]
+        )
+
     def test_get_probe_by_name_sp_superuser(self):
         request = self.factory.get(self.url + 'ams-probe')
         request.tenant = self.super_tenant
@@ -1480,7 +1514,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['ams-probe-new', '0.1.11']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -1579,7 +1613,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['ams-probe', '0.1.11']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -1678,7 +1712,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['ams-probe', '0.1.11']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -1777,7 +1811,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['ams-probe', '0.1.11']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -1875,7 +1909,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['ams-probe', '0.1.11']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -1976,7 +2010,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['ams-probe', '0.1.11']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -2077,7 +2111,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['ams-probe', '0.1.11']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -2178,7 +2212,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['ams-probe', '0.1.11']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -2289,7 +2323,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['argo-web-api', '0.1.7']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -2390,7 +2424,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['argo-web-api', '0.1.7']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -2491,7 +2525,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['argo-web-api', '0.1.7']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -2592,7 +2626,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['argo-web-api', '0.1.7']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -2688,7 +2722,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['argo-web-api', '0.1.7']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -2789,7 +2823,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['argo-web-api', '0.1.7']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -2890,7 +2924,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['argo-web-api', '0.1.7']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -2991,7 +3025,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['argo-web-api', '0.1.7']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -3184,7 +3218,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['ams-probe', '0.1.11']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -3281,7 +3315,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['ams-probe', '0.1.11']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -3378,7 +3412,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['ams-probe', '0.1.11']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
@@ -3475,7 +3509,7 @@ class ListProbesAPIViewTests(TenantTestCase):
         self.assertEqual(serialized_data['name'], metric.name)
         self.assertEqual(serialized_data['mtype'], ['Active'])
         self.assertEqual(
-            serialized_data['probekey'], ['ams-probe', '0.1.11']
+            serialized_data['probekey'][0], metric.probekey.id
         )
         self.assertEqual(serialized_data['group'], ['TEST'])
         self.assertEqual(serialized_data['parent'], metric.parent)
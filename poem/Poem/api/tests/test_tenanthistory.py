@@ -2,7 +2,7 @@ import datetime
 import json
 
 from Poem.api import views_internal as views
-from Poem.helpers.history_helpers import create_comment
+from Poem.helpers.history_helpers import create_comment, serialize_metric
 from Poem.poem import models as poem_models
 from Poem.poem_super_admin import models as admin_models
 from Poem.users.models import CustUser
@@ -13,6 +13,8 @@ from rest_framework.test import force_authenticate
 from tenant_schemas.test.cases import TenantTestCase
 from tenant_schemas.test.client import TenantRequestFactory
 
+from .utils_test import streamed_json
+
 
 class ListTenantVersionsAPIViewTests(TenantTestCase):
     def setUp(self):
@@ -126,11 +128,7 @@ class ListTenantVersionsAPIViewTests(TenantTestCase):
 
         self.ver1 = poem_models.TenantHistory.objects.create(
             object_id=self.metric1.id,
-            serialized_data=serializers.serialize(
-                'json', [self.metric1],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(self.metric1),
             object_repr='argo.AMS-Check',
             content_type=ct_m,
             date_created=datetime.datetime.now(),
@@ -156,19 +154,11 @@ class ListTenantVersionsAPIViewTests(TenantTestCase):
         self.metric1.tags.add(self.mtag3)
 
         comment = create_comment(
-            self.metric1, ct=ct_m, new_serialized_data=serializers.serialize(
-                'json', [self.metric1],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            )
+            self.metric1, ct=ct_m, new_serialized_data=serialize_metric(self.metric1)
         )
         self.ver2 = poem_models.TenantHistory.objects.create(
             object_id=self.metric1.id,
-            serialized_data=serializers.serialize(
-                'json', [self.metric1],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(self.metric1),
             object_repr=self.metric1.__str__(),
             content_type=ct_m,
             date_created=datetime.datetime.now(),
@@ -186,11 +176,7 @@ class ListTenantVersionsAPIViewTests(TenantTestCase):
 
         self.ver3 = poem_models.TenantHistory.objects.create(
             object_id=self.metric2.id,
-            serialized_data=serializers.serialize(
-                'json', [self.metric2],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(self.metric2),
             object_repr=self.metric2.__str__(),
             content_type=ct_m,
             date_created=datetime.datetime.now(),
@@ -443,6 +429,41 @@ class ListTenantVersionsAPIViewTests(TenantTestCase):
             content_type=ct_tp
         )
 
+    def test_get_versions_of_metrics_streamed(self):
+        request = self.factory.get(self.url + 'metric/argo.AMS-Check-new')
+        force_authenticate(request, user=self.user)
+        response = self.view(request, 'metric', 'argo.AMS-Check-new')
+        with self.settings(STREAMING_THRESHOLD=0):
+            streamed = self.view(request, 'metric', 'argo.AMS-Check-new')
+
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(streamed_json(streamed), response.data)
+
+    def test_get_versions_of_metrics_with_renamed_probe(self):
+        admin_models.ProbeHistory.objects.filter(
+            id=self.probever1.id
+        ).update(name='ams-probe-new')
+        request = self.factory.get(self.url + 'metric/argo.AMS-Check-new')
+        force_authenticate(request, user=self.user)
+        response = self.view(request, 'metric', 'argo.AMS-Check-new')
+        self.assertEqual(
+            [ver['fields']['probeversion'] for ver in response.data],
+            ['ams-probe (0.1.11)', 'ams-probe-new (0.1.7)']
+        )
+
+    def test_get_versions_of_metrics_with_deleted_probe(self):
+        # the way ListProbes.delete() removes versions of deleted probe
+        admin_models.ProbeHistory.objects.filter(
+            id__in=[self.probever1.id, self.probever2.id]
+        ).delete()
+        request = self.factory.get(self.url + 'metric/argo.AMS-Check-new')
+        force_authenticate(request, user=self.user)
+        response = self.view(request, 'metric', 'argo.AMS-Check-new')
+        self.assertEqual(
+            [ver['fields']['probeversion'] for ver in response.data],
+            ['ams-probe (0.1.11)', 'ams-probe (0.1.7)']
+        )
+
     def test_get_versions_of_metrics(self):
         request = self.factory.get(self.url + 'metric/argo.AMS-Check-new')
         force_authenticate(request, user=self.user)
@@ -1,9 +1,12 @@
 import datetime
+from io import StringIO
 from unittest.mock import patch
 
 from Poem.api import views_internal as views
+from Poem.poem_super_admin.models import TenantStatistics
 from Poem.tenants.models import Tenant
 from Poem.users.models import CustUser
+from django.core.management import call_command
 from rest_framework import status
 from rest_framework.test import force_authenticate
 from tenant_schemas.test.cases import TenantTestCase
@@ -113,6 +116,53 @@ class ListTenantsTests(TenantTestCase):
             ]
         )
 
+    @patch('Poem.api.internal_views.tenants.get_tenant_resources')
+    def test_get_all_tenants_from_statistics(self, mock_resources):
+        now = datetime.datetime.now()
+        for schema, metrics, probes in [
+            (self.tenant.schema_name, 24, 15),
+            (get_public_schema_name(), 354, 111),
+            ('test1', 30, 10),
+            ('test2', 50, 30)
+        ]:
+            TenantStatistics.objects.update_or_create(
+                schema_name=schema,
+                defaults={
+                    'metrics': metrics, 'probes': probes,
+                    'date_modified': now
+                }
+            )
+
+        request = self.factory.get(self.url)
+        force_authenticate(request, user=self.user)
+        with self.assertNumQueries(1):
+            response = self.view(request)
+        self.assertFalse(mock_resources.called)
+        self.assertEqual(
+            [
+                (item['schema_name'], item['nr_metrics'], item['nr_probes'])
+                for item in response.data
+            ],
+            [
+                (self.tenant.schema_name, 24, 15),
+                (get_public_schema_name(), 354, 111),
+                ('test1', 30, 10),
+                ('test2', 50, 30)
+            ]
+        )
+
+    @patch('Poem.poem.management.commands.rebuild_tenant_statistics.'
+           'get_tenant_resources')
+    def test_rebuild_tenant_statistics(self, mock_resources):
+        call_command('rebuild_tenant_statistics', stdout=StringIO())
+        self.assertEqual(
+            sorted(call[0][0] for call in mock_resources.call_args_list),
+            sorted([
+                self.tenant.schema_name, get_public_schema_name(), 'test1',
+                'test2'
+            ])
+        )
+
     @patch('Poem.api.internal_views.tenants.get_tenant_resources')
     def test_get_tenant_by_name(self, mock_resources):
         mock_resources.return_value = {'metrics': 24, 'probes': 15}
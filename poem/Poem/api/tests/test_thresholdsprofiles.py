@@ -142,7 +142,7 @@ class ListThresholdsProfilesAPIViewTests(TenantTestCase):
             content_type=self.ct
         )
 
-    @patch('Poem.api.internal_views.thresholdsprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.thresholdsprofiles.request_sync')
     def test_get_all_thresholds_profiles_superuser(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url)
@@ -172,7 +172,7 @@ class ListThresholdsProfilesAPIViewTests(TenantTestCase):
             ]
         )
 
-    @patch('Poem.api.internal_views.thresholdsprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.thresholdsprofiles.request_sync')
     def test_get_all_thresholds_profiles_user(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url)
@@ -202,7 +202,7 @@ class ListThresholdsProfilesAPIViewTests(TenantTestCase):
             ]
         )
 
-    @patch('Poem.api.internal_views.thresholdsprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.thresholdsprofiles.request_sync')
     def test_get_all_thresholds_profiles_limited_user(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url)
@@ -232,14 +232,14 @@ class ListThresholdsProfilesAPIViewTests(TenantTestCase):
             ]
         )
 
-    @patch('Poem.api.internal_views.thresholdsprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.thresholdsprofiles.request_sync')
     def test_get_thresholds_profiles_if_no_authentication(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url)
         response = self.view(request)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
 
-    @patch('Poem.api.internal_views.thresholdsprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.thresholdsprofiles.request_sync')
     def test_get_thresholds_profile_by_name_superuser(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url + 'TEST_PROFILE')
@@ -255,7 +255,7 @@ class ListThresholdsProfilesAPIViewTests(TenantTestCase):
             ])
         )
 
-    @patch('Poem.api.internal_views.thresholdsprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.thresholdsprofiles.request_sync')
     def test_get_thresholds_profile_by_name_user(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url + 'TEST_PROFILE')
@@ -271,7 +271,7 @@ class ListThresholdsProfilesAPIViewTests(TenantTestCase):
             ])
         )
 
-    @patch('Poem.api.internal_views.thresholdsprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.thresholdsprofiles.request_sync')
     def test_get_thresholds_profile_by_name_limited_user(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url + 'TEST_PROFILE')
@@ -287,7 +287,7 @@ class ListThresholdsProfilesAPIViewTests(TenantTestCase):
             ])
         )
 
-    @patch('Poem.api.internal_views.thresholdsprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.thresholdsprofiles.request_sync')
     def test_get_thresholds_profile_by_nonexisting_name_superuser(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url + 'nonexisting')
@@ -298,7 +298,7 @@ class ListThresholdsProfilesAPIViewTests(TenantTestCase):
             response.data['detail'], 'Thresholds profile does not exist.'
         )
 
-    @patch('Poem.api.internal_views.thresholdsprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.thresholdsprofiles.request_sync')
     def test_get_thresholds_profile_by_nonexisting_name_user(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url + 'nonexisting')
@@ -309,7 +309,7 @@ class ListThresholdsProfilesAPIViewTests(TenantTestCase):
             response.data['detail'], 'Thresholds profile does not exist.'
         )
 
-    @patch('Poem.api.internal_views.thresholdsprofiles.sync_webapi')
+    @patch('Poem.api.internal_views.thresholdsprofiles.request_sync')
     def test_get_thresholds_profile_by_nonexisting_name_limited_usr(self, func):
         func.side_effect = mocked_func
         request = self.factory.get(self.url + 'nonexisting')
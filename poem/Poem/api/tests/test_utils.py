@@ -3,22 +3,27 @@ import json
 from unittest.mock import patch
 
 from Poem.api.internal_views.utils import sync_webapi, \
-    get_tenant_resources
+    get_tenant_resources, list_response
 from Poem.api.models import MyAPIKey
-from Poem.helpers.history_helpers import create_comment
+from Poem.helpers.webapi_client import clear_token_cache
+from Poem.helpers.history_helpers import create_comment, serialize_metric
 from Poem.poem import models as poem_models
 from Poem.poem_super_admin import models as admin_models
 from Poem.users.models import CustUser
 from django.contrib.contenttypes.models import ContentType
 from django.core import serializers
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
 from tenant_schemas.test.cases import TenantTestCase
 from tenant_schemas.utils import get_public_schema_name
 
-from .utils_test import mocked_web_api_request
+from .utils_test import mocked_web_api_request, MockResponse, streamed_json
 
 
 class SyncWebApiTests(TenantTestCase):
     def setUp(self):
+        clear_token_cache()
         ct_mp = ContentType.objects.get_for_model(poem_models.MetricProfiles)
         MyAPIKey.objects.create(
             name='WEB-API',
@@ -109,7 +114,7 @@ class SyncWebApiTests(TenantTestCase):
             groupname='EGI'
         )
 
-    @patch('requests.get')
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
     def test_sync_webapi_metricprofiles(self, func):
         func.side_effect = mocked_web_api_request
         self.assertEqual(poem_models.MetricProfiles.objects.all().count(), 2)
@@ -146,8 +151,30 @@ class SyncWebApiTests(TenantTestCase):
             serialized_data['metricinstances'],
             [['dg.3GBridge', 'eu.egi.cloud.Swift-CRUD']]
         )
+        self.assertEqual(
+            list(poem_models.MetricProfileIndex.objects.filter(
+                profile__name='NEW_PROFILE'
+            ).values_list('service', 'metric')),
+            [('dg.3GBridge', 'eu.egi.cloud.Swift-CRUD')]
+        )
 
-    @patch('requests.get')
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    def test_sync_webapi_metricprofiles_index_follows_webapi(self, func):
+        func.side_effect = mocked_web_api_request
+        self.assertEqual(
+            poem_models.MetricProfileIndex.objects.filter(
+                profile=self.mp1
+            ).count(), 3
+        )
+        sync_webapi('metric_profiles', poem_models.MetricProfiles)
+        self.assertEqual(
+            list(poem_models.MetricProfileIndex.objects.filter(
+                profile=self.mp1
+            ).values_list('service', 'metric')),
+            [('dg.3GBridge', 'eu.egi.cloud.Swift-CRUD')]
+        )
+
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
     def test_sync_webapi_aggregationprofiles(self, func):
         func.side_effect = mocked_web_api_request
         self.assertEqual(poem_models.Aggregation.objects.all().count(), 2)
@@ -163,7 +190,7 @@ class SyncWebApiTests(TenantTestCase):
         )
         self.assertTrue(poem_models.Aggregation.objects.get(name='NEW_PROFILE'))
 
-    @patch('requests.get')
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
     def test_sync_webapi_thresholdsprofile(self, func):
         func.side_effect = mocked_web_api_request
         self.assertEqual(
@@ -184,6 +211,71 @@ class SyncWebApiTests(TenantTestCase):
         )
 
 
+    @staticmethod
+    def _mocked_metric_profiles(number):
+        def mocked(*args, **kwargs):
+            return MockResponse(
+                {
+                    'data': [
+                        {
+                            'id': '{:08d}-aaaa-kkkk-aaaa-aaeekkccnnee'.format(
+                                i
+                            ),
+                            'name': 'PROFILE{}'.format(i),
+                            'description': 'Profile {}'.format(i),
+                            'services': [
+                                {
+                                    'service': 'dg.3GBridge',
+                                    'metrics': ['eu.egi.cloud.Swift-CRUD']
+                                }
+                            ]
+                        } for i in range(number)
+                    ]
+                }, 200
+            )
+        return mocked
+
+    @patch('Poem.helpers.webapi_client.requests.Session.get')
+    def test_sync_webapi_number_of_queries_independent_of_profiles(
+            self, func
+    ):
+        counts = []
+        for number in [5, 50]:
+            poem_models.MetricProfiles.objects.all().delete()
+            poem_models.TenantHistory.objects.all().delete()
+            func.side_effect = self._mocked_metric_profiles(number)
+            with CaptureQueriesContext(connection) as created:
+                sync_webapi('metric_profiles', poem_models.MetricProfiles)
+            self.assertEqual(
+                poem_models.MetricProfiles.objects.all().count(), number
+            )
+            self.assertEqual(
+                poem_models.TenantHistory.objects.filter(
+                    comment='Initial version.'
+                ).count(), number
+            )
+
+            poem_models.MetricProfiles.objects.all().update(description='')
+            with CaptureQueriesContext(connection) as updated:
+                sync_webapi('metric_profiles', poem_models.MetricProfiles)
+            self.assertEqual(
+                poem_models.MetricProfiles.objects.get(
+                    name='PROFILE1'
+                ).description, 'Profile 1'
+            )
+
+            func.side_effect = self._mocked_metric_profiles(0)
+            with CaptureQueriesContext(connection) as deleted:
+                sync_webapi('metric_profiles', poem_models.MetricProfiles)
+            self.assertEqual(
+                poem_models.MetricProfiles.objects.all().count(), 0
+            )
+
+            counts.append((len(created), len(updated), len(deleted)))
+
+        self.assertEqual(counts[0], counts[1])
+
+
 class BasicResourceInfoTests(TenantTestCase):
     def setUp(self) -> None:
         user = CustUser.objects.create_user(username='testuser')
@@ -436,11 +528,7 @@ class BasicResourceInfoTests(TenantTestCase):
         poem_models.TenantHistory.objects.create(
             object_id=metric1.id,
             object_repr=metric1.__str__(),
-            serialized_data=serializers.serialize(
-                'json', [metric1],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(metric1),
             content_type=ct,
             date_created=datetime.datetime.now(),
             comment='Initial version.',
@@ -466,11 +554,7 @@ class BasicResourceInfoTests(TenantTestCase):
         poem_models.TenantHistory.objects.create(
             object_id=metric2.id,
             object_repr=metric2.__str__(),
-            serialized_data=serializers.serialize(
-                'json', [metric2],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialize_metric(metric2),
             content_type=ct,
             date_created=datetime.datetime.now(),
             comment='Initial version.',
@@ -484,3 +568,80 @@ class BasicResourceInfoTests(TenantTestCase):
     def test_get_resourece_info_for_super_poem_tenant(self):
         data = get_tenant_resources(get_public_schema_name())
         self.assertEqual(data, {'metric_templates': 3, 'probes': 2})
+
+    def test_metric_changes_update_tenant_statistics(self):
+        stats = admin_models.TenantStatistics.objects.get(schema_name='test')
+        self.assertEqual((stats.metrics, stats.probes), (2, 1))
+        active = poem_models.Metric.objects.get(name='argo.AMS-Check')
+        metric = poem_models.Metric.objects.get(name='org.apel.APEL-Pub')
+        metric.probekey = admin_models.ProbeHistory.objects.exclude(
+            id=active.probekey.id
+        ).first()
+        metric.save()
+        stats = admin_models.TenantStatistics.objects.get(schema_name='test')
+        self.assertEqual((stats.metrics, stats.probes), (2, 2))
+        metric.delete()
+        stats = admin_models.TenantStatistics.objects.get(schema_name='test')
+        self.assertEqual((stats.metrics, stats.probes), (1, 1))
+
+    def test_metric_changes_adjust_tenant_statistics_without_recount(self):
+        active = poem_models.Metric.objects.get(name='argo.AMS-Check')
+        with CaptureQueriesContext(connection) as captured:
+            active.description = 'Changed description.'
+            active.save()
+            metric = poem_models.Metric.objects.create(
+                name='argo.AMS-Check-Copy',
+                group=active.group,
+                mtype=active.mtype,
+                probekey=active.probekey
+            )
+        self.assertFalse(
+            [q for q in captured.captured_queries if 'COUNT(' in q['sql']]
+        )
+        stats = admin_models.TenantStatistics.objects.get(schema_name='test')
+        self.assertEqual((stats.metrics, stats.probes), (3, 1))
+        active.delete()
+        stats = admin_models.TenantStatistics.objects.get(schema_name='test')
+        self.assertEqual((stats.metrics, stats.probes), (2, 1))
+        metric.delete()
+        stats = admin_models.TenantStatistics.objects.get(schema_name='test')
+        self.assertEqual((stats.metrics, stats.probes), (1, 0))
+
+    def test_metric_template_changes_update_tenant_statistics(self):
+        stats = admin_models.TenantStatistics.objects.get(
+            schema_name=get_public_schema_name()
+        )
+        self.assertEqual((stats.metrics, stats.probes), (3, 2))
+        admin_models.MetricTemplate.objects.get(
+            name='argo.AMSPublisher-Check'
+        ).delete()
+        stats = admin_models.TenantStatistics.objects.get(
+            schema_name=get_public_schema_name()
+        )
+        self.assertEqual((stats.metrics, stats.probes), (2, 1))
+
+
+class ListResponseTests(SimpleTestCase):
+    def test_small_list_not_streamed(self):
+        response = list_response(iter([{'a': 1}]), 1)
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.data, [{'a': 1}])
+
+    def test_large_list_streamed_in_chunks(self):
+        items = [{'name': 'metric{}'.format(i), 'tags': ['čćž']}
+                 for i in range(1200)]
+        with self.settings(STREAMING_THRESHOLD=1000):
+            response = list_response(iter(items), len(items))
+
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(
+            json.loads(b''.join(chunks).decode('utf-8')), items
+        )
+
+    def test_empty_list_streamed(self):
+        with self.settings(STREAMING_THRESHOLD=-1):
+            response = list_response(iter([]), 0)
+
+        self.assertEqual(streamed_json(response), [])
@@ -1,4 +1,5 @@
 import datetime
+import json
 from unittest.mock import patch, call
 
 import factory
@@ -6,7 +7,9 @@ from Poem.api import views
 from Poem.api.models import MyAPIKey
 from Poem.poem import models as poem_models
 from Poem.poem_super_admin import models as admin_models
+from django.db import connection
 from django.db.models.signals import post_save
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from tenant_schemas.test.cases import TenantTestCase
 from tenant_schemas.test.client import TenantRequestFactory
@@ -676,8 +679,10 @@ class ListMetricsAPIViewTests(TenantTestCase):
     def test_list_metrics(self):
         request = self.factory.get(self.url, **{'HTTP_X_API_KEY': self.token})
         response = self.view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.has_header('ETag'))
         self.assertEqual(
-            response.data,
+            json.loads(response.content.decode('utf-8')),
             [
                 {
                     'argo.AMSPublisher-Check': {
@@ -808,6 +813,109 @@ class ListMetricsAPIViewTests(TenantTestCase):
             ]
         )
 
+    def test_list_metrics_snapshot_reused(self):
+        request = self.factory.get(self.url, **{'HTTP_X_API_KEY': self.token})
+        response1 = self.view(request)
+        snapshot = poem_models.MetricConfigSnapshot.objects.get()
+        self.assertEqual(snapshot.etag, response1['ETag'].strip('"'))
+        with patch('Poem.api.views.build_metricconfigs') as mock_build:
+            response2 = self.view(request)
+            self.assertFalse(mock_build.called)
+        self.assertEqual(response1['ETag'], response2['ETag'])
+        self.assertEqual(response1.content, response2.content)
+
+    def test_list_metrics_snapshot_expired_on_metric_change(self):
+        request = self.factory.get(self.url, **{'HTTP_X_API_KEY': self.token})
+        response1 = self.view(request)
+        metric = poem_models.Metric.objects.get(name='org.apel.APEL-Pub')
+        metric.tags.add(admin_models.MetricTags.objects.get(name='test_tag1'))
+        snapshot = poem_models.MetricConfigSnapshot.objects.get()
+        self.assertEqual(snapshot.etag, '')
+        self.assertEqual(snapshot.generation, 1)
+        response2 = self.view(request)
+        self.assertNotEqual(response1['ETag'], response2['ETag'])
+        data = json.loads(response2.content.decode('utf-8'))
+        self.assertEqual(
+            [item for item in data if 'org.apel.APEL-Pub' in item][0][
+                'org.apel.APEL-Pub']['tags'],
+            ['test_tag1']
+        )
+
+    def test_list_metrics_snapshot_expired_on_probe_change(self):
+        request = self.factory.get(self.url, **{'HTTP_X_API_KEY': self.token})
+        response1 = self.view(request)
+        probekey = admin_models.ProbeHistory.objects.get(name='ams-probe')
+        probekey.docurl = 'https://new.docurl.com'
+        probekey.save()
+        response2 = self.view(request)
+        self.assertNotEqual(response1['ETag'], response2['ETag'])
+        data = json.loads(response2.content.decode('utf-8'))
+        self.assertEqual(
+            [item for item in data if 'test.AMS-Check' in item][0][
+                'test.AMS-Check']['docurl'],
+            'https://new.docurl.com'
+        )
+
+    def test_list_metrics_not_modified(self):
+        request = self.factory.get(self.url, **{'HTTP_X_API_KEY': self.token})
+        response = self.view(request)
+        request = self.factory.get(
+            self.url, **{'HTTP_X_API_KEY': self.token,
+                         'HTTP_IF_NONE_MATCH': response['ETag']}
+        )
+        with patch('Poem.api.views.get_metricconfigs_snapshot') as mock_snap:
+            response = self.view(request)
+            self.assertFalse(mock_snap.called)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_list_metrics_modified_after_change(self):
+        request = self.factory.get(self.url, **{'HTTP_X_API_KEY': self.token})
+        response = self.view(request)
+        etag = response['ETag']
+        metric = poem_models.Metric.objects.get(name='org.apel.APEL-Pub')
+        metric.description = 'New description.'
+        metric.save()
+        request = self.factory.get(
+            self.url, **{'HTTP_X_API_KEY': self.token,
+                         'HTTP_IF_NONE_MATCH': etag}
+        )
+        response = self.view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_list_metrics_modified_after_public_change(self):
+        request = self.factory.get(self.url, **{'HTTP_X_API_KEY': self.token})
+        response = self.view(request)
+        etag = response['ETag']
+        admin_models.MetricTags.objects.create(name='new_tag')
+        request = self.factory.get(
+            self.url, **{'HTTP_X_API_KEY': self.token,
+                         'HTTP_IF_NONE_MATCH': etag}
+        )
+        response = self.view(request)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_get_tagged_metrics_not_modified(self):
+        request = self.factory.get(
+            self.url + '/internal', **{'HTTP_X_API_KEY': self.token}
+        )
+        response = self.view(request, 'internal')
+        request = self.factory.get(
+            self.url + '/internal', **{'HTTP_X_API_KEY': self.token,
+                                       'HTTP_IF_NONE_MATCH': response['ETag']}
+        )
+        response = self.view(request, 'internal')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        request = self.factory.get(
+            self.url + '/test_tag1', **{'HTTP_X_API_KEY': self.token,
+                                        'HTTP_IF_NONE_MATCH': response['ETag']}
+        )
+        response = self.view(request, 'test_tag1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_get_internal_metrics(self):
         request = self.factory.get(
             self.url + '/internal', **{'HTTP_X_API_KEY': self.token}
@@ -902,6 +1010,92 @@ class ListReposAPIViewTests(TenantTestCase):
             }
         )
 
+    @patch('Poem.api.views.get_metrics_from_profile')
+    def test_list_repos_not_modified(self, mock_get_metrics):
+        mock_get_metrics.side_effect = mock_function
+        request = self.factory.get(
+            self.url + '/centos7',
+            **{'HTTP_X_API_KEY': self.token,
+               'HTTP_PROFILES': '[ARGO-MON, MON-TEST]'}
+        )
+        response = self.view(request, 'centos7')
+        etag = response['ETag']
+        request = self.factory.get(
+            self.url + '/centos7',
+            **{'HTTP_X_API_KEY': self.token,
+               'HTTP_PROFILES': '[ARGO-MON, MON-TEST]',
+               'HTTP_IF_NONE_MATCH': etag}
+        )
+        response = self.view(request, 'centos7')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(response.has_header('Last-Modified'))
+        request = self.factory.get(
+            self.url + '/centos7',
+            **{'HTTP_X_API_KEY': self.token,
+               'HTTP_PROFILES': '[ARGO-MON]',
+               'HTTP_IF_NONE_MATCH': etag}
+        )
+        response = self.view(request, 'centos7')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @factory.django.mute_signals(post_save)
+    def _create_metrics(self, prefix, number):
+        metric_type = poem_models.MetricType.objects.get(name='Active')
+        repo = admin_models.YumRepo.objects.get(
+            name='repo-1', tag__name='CentOS 7'
+        )
+        names = set()
+        for i in range(number):
+            package = admin_models.Package.objects.create(
+                name='nagios-plugins-{}-{}'.format(prefix, i), version='1.0.0'
+            )
+            package.repos.add(repo)
+            probe = admin_models.Probe.objects.create(
+                name='{}-probe-{}'.format(prefix, i), package=package,
+                repository='https://probe.repo', docurl='https://probe.doc',
+                description='Probe.', comment='Initial version.',
+                user='testuser', datetime=datetime.datetime.now()
+            )
+            probekey = admin_models.ProbeHistory.objects.create(
+                object_id=probe, name=probe.name, package=package,
+                repository=probe.repository, docurl=probe.docurl,
+                description=probe.description, comment=probe.comment,
+                version_comment='Initial version.', version_user='testuser'
+            )
+            metric = poem_models.Metric.objects.create(
+                name='{}.metric-{}'.format(prefix, i), mtype=metric_type,
+                probekey=probekey
+            )
+            names.add(metric.name)
+
+        return names
+
+    @patch('Poem.api.views.get_metrics_from_profile')
+    def test_list_repos_number_of_queries_independent_of_profile_size(
+            self, mock_get_metrics
+    ):
+        small = self._create_metrics('small', 5)
+        big = self._create_metrics('big', 50)
+
+        def count_queries(metrics):
+            mock_get_metrics.return_value = metrics
+            request = self.factory.get(
+                self.url + '/centos7',
+                **{'HTTP_X_API_KEY': self.token,
+                   'HTTP_PROFILES': '[ARGO-MON]'}
+            )
+            with CaptureQueriesContext(connection) as queries:
+                response = self.view(request, 'centos7')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries), response.data
+
+        n_small, data_small = count_queries(small)
+        n_big, data_big = count_queries(big)
+        self.assertEqual(n_small, n_big)
+        self.assertEqual(len(data_small['data']['repo-1']['packages']), 7)
+        self.assertEqual(len(data_big['data']['repo-1']['packages']), 52)
+
     def test_list_repos_if_no_profile_or_tag(self):
         request = self.factory.get(
             self.url,
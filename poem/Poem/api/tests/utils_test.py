@@ -1,6 +1,8 @@
 import json
 
 import requests
+from Poem.helpers.history_helpers import inline_models_to_dicts
+from deepdiff import DeepDiff
 from django.test.client import encode_multipart
 
 
@@ -316,3 +318,229 @@ def mocked_web_api_metric_profile_put(*args, **kwargs):
             }
         }, 200
     )
+
+
+def streamed_json(response):
+    return json.loads(
+        b''.join(response.streaming_content).decode('utf-8')
+    )
+
+
+def deepdiff_analyze_differences(old_data, new_data):
+    """
+    DeepDiff based comparison used by history helpers before, kept as
+    reference for the comments they create now.
+    """
+    inlines = ['config', 'attribute', 'dependency', 'flags', 'files',
+               'parameter', 'fileparameter', 'dependancy']
+
+    foreignkeys = ['probekey', 'package', 'group']
+
+    changed = []
+    added = []
+    deleted = []
+    msg = []
+    if old_data:
+        res = DeepDiff(old_data, new_data, ignore_order=True)
+
+        # I'm numbering how many times the for loop has passed because foreign
+        # keys are serialized in lists
+        passed = 0
+        added_groups = list()
+        deleted_groups = list()
+        added_rules = list()
+        deleted_rules = list()
+        if 'iterable_item_removed' in res:
+            for key, value in res['iterable_item_removed'].items():
+                field = key.split('[')[1][0:-1].strip('\'')
+                if field in foreignkeys:
+                    passed += 1
+                    pass
+                elif field == 'groups':
+                    deleted_groups.append(value['name'])
+                elif field == 'rules':
+                    deleted_rules.append(value['metric'])
+                else:
+                    msg.append(
+                        {
+                            'deleted': {
+                                'fields': [field], 'object': value
+                            }
+                        }
+                    )
+
+        if 'iterable_item_added' in res:
+            for key, value in res['iterable_item_added'].items():
+                field = key.split('[')[1][0:-1].strip('\'')
+                if field in foreignkeys:
+                    passed += 1
+                    pass
+                elif field == 'groups':
+                    added_groups.append(value['name'])
+                elif field == 'rules':
+                    added_rules.append(value['metric'])
+                else:
+                    msg.append(
+                        {
+                            'added': {
+                                'fields': [field], 'object': value
+                            }
+                        }
+                    )
+
+        if added_groups or deleted_groups:
+            for item in added_groups:
+                if item in deleted_groups:
+                    deleted_groups.remove(item)
+                    msg.append(
+                        {
+                            'changed': {
+                                'fields': ['groups'], 'object': [item]
+                            }
+                        }
+                    )
+
+                else:
+                    msg.append(
+                        {
+                            'added': {
+                                'fields': ['groups'], 'object': [item]
+                            }
+                        }
+                    )
+
+            for item in deleted_groups:
+                msg.append(
+                    {
+                        'deleted': {
+                            'fields': ['groups'], 'object': [item]
+                        }
+                    }
+                )
+
+        if added_rules or deleted_rules:
+            for item in added_rules:
+                if item in deleted_rules:
+                    deleted_rules.remove(item)
+                    msg.append(
+                        {
+                            'changed': {
+                                'fields': ['rules'], 'object': [item]
+                            }
+                        }
+                    )
+
+                else:
+                    msg.append(
+                        {
+                            'added': {
+                                'fields': ['rules'], 'object': [item]
+                            }
+                        }
+                    )
+
+            for item in deleted_rules:
+                msg.append(
+                    {
+                        'deleted': {
+                            'fields': ['rules'], 'object': [item]
+                        }
+                    }
+                )
+
+        if passed > 0:
+            res = DeepDiff(old_data, new_data)
+
+        if 'dictionary_item_added' in res:
+            for item in res['dictionary_item_added']:
+                added.append(item.split('[')[1][0:-1].strip('\''))
+
+        if 'type_changes' in res:
+            for key, value in res['type_changes'].items():
+                field = key.split('[')[1][0:-1].strip('\'')
+
+                if value['new_value'] is None:
+                    deleted.append(field)
+
+                if value['old_value'] is None:
+                    added.append(field)
+
+                if not value['new_value'] is None and \
+                        not value['old_value'] is None:
+                    changed.append(field)
+
+        if 'values_changed' in res:
+            for key, value in res['values_changed'].items():
+                field = key.split('[')[1][1:-2]
+                try:
+                    if field in inlines:
+                        old = inline_models_to_dicts(value['old_value'])
+                        new = inline_models_to_dicts(value['new_value'])
+                        deleted_fields = []
+                        changed_fields = []
+                        added_fields = []
+                        res = DeepDiff(old, new, ignore_order=True)
+                        if 'values_changed' in res:
+                            for k, v in res['values_changed'].items():
+                                changed_fields.append(
+                                    k.split('[')[1][0:-1].strip('\'')
+                                )
+
+                        if 'dictionary_item_added' in res:
+                            for item in res['dictionary_item_added']:
+                                added_fields.append(
+                                    item.split('[')[1][0:-1].strip('\'')
+                                )
+
+                        if 'dictionary_item_removed' in res:
+                            for item in res['dictionary_item_removed']:
+                                deleted_fields.append(
+                                    item.split('[')[1][0:-1].strip('\'')
+                                )
+
+                        if deleted_fields:
+                            msg.append(
+                                {'deleted': {
+                                    'fields': [field],
+                                    'object': sorted(deleted_fields)
+                                }}
+                            )
+
+                        if changed_fields:
+                            msg.append(
+                                {'changed': {
+                                    'fields': [field],
+                                    'object': sorted(changed_fields)
+                                }}
+                            )
+
+                        if added_fields:
+                            msg.append(
+                                {'added': {'fields': [field],
+                                           'object': sorted(added_fields)}}
+                            )
+
+                    else:
+                        if not value['new_value']:
+                            deleted.append(field)
+
+                        elif not value['old_value']:
+                            added.append(field)
+
+                        else:
+                            if field != 'tags':
+                                changed.append(field)
+
+                except KeyError:
+                    pass
+
+        if added:
+            msg.append({'added': {'fields': sorted(list(set(added)))}})
+        if changed:
+            msg.append({'changed': {'fields': sorted(list(set(changed)))}})
+        if deleted:
+            msg.append({'deleted': {'fields': sorted(list(set(deleted)))}})
+
+        return json.dumps(msg)
+    else:
+        return 'Initial version.'
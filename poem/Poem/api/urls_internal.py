@@ -22,6 +22,7 @@ urlpatterns = [
     path('updatemetricsversions/', views_internal.UpdateMetricsVersions.as_view(), name='updatemetricsversions'),
     path('updatemetricsversions/<str:pkg>', views_internal.UpdateMetricsVersions.as_view(), name='updatemetricsversions'),
     path('istenantschema/', views_internal.GetIsTenantSchema.as_view(), name='istenantschema'),
+    path('jobs/<int:job_id>', views_internal.ListJobs.as_view(), name='jobs'),
     path('metric/', views_internal.ListMetric.as_view(), name='metric'),
     path('public_metric/', views_internal.ListPublicMetric.as_view(), name='metric'),
     path('metric/<str:name>', views_internal.ListMetric.as_view(), name='metric'),
@@ -32,6 +33,8 @@ urlpatterns = [
     path('public_metricprofiles/<str:profile_name>', views_internal.ListPublicMetricProfiles.as_view(), name='metricprofiles'),
     path('metricprofilesgroup/', views_internal.ListMetricProfilesInGroup.as_view(), name='metricprofilesgroup'),
     path('metricprofilesgroup/<str:group>', views_internal.ListMetricProfilesInGroup.as_view(), name='metricprofilesgroup'),
+    path('metricsinprofiles/', views_internal.ListMetricsInProfiles.as_view(), name='metricsinprofiles'),
+    path('metricsinprofiles/<str:metric_name>', views_internal.ListMetricsInProfiles.as_view(), name='metricsinprofiles'),
     path('metricsall/', views_internal.ListAllMetrics.as_view(), name='metricsall'),
     path('public_metricsall/', views_internal.ListPublicAllMetrics.as_view(), name='metricsall'),
     path('metricsforprobes/<str:probeversion>', views_internal.ListMetricTemplatesForProbeVersion.as_view(), name='metricsforprobes'),
@@ -1,13 +1,18 @@
-import requests
+import hashlib
+
 from Poem.api.internal_views.utils import one_value_inline, \
     two_value_inline_dict
-from Poem.api.models import MyAPIKey
 from Poem.api.permissions import MyHasAPIKey
+from Poem.helpers.webapi_cache import get_metric_profiles
 from Poem.poem import models
 from Poem.poem_super_admin import models as admin_models
-from django.conf import settings
+from django.db.models import Prefetch, Q
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag, http_date
 from rest_framework import status
 from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
@@ -19,6 +24,36 @@ class NotFound(APIException):
         self.code = code if code else detail
 
 
+def conditional_get(request, parts, use_last_modified=True):
+    """
+    Computes ETag (and Last-Modified) of a public API resource from the
+    tenant's content version and the given request specific parts. Returns
+    the headers which should be set on the response, and 304 response if the
+    client already has the current version of the resource.
+    """
+    version, last_modified = admin_models.get_content_version(
+        request.tenant.schema_name
+    )
+    etag = quote_etag(hashlib.md5(
+        '|'.join([version] + [str(part) for part in parts]).encode('utf-8')
+    ).hexdigest())
+
+    headers = {'ETag': etag}
+    timestamp = None
+    if use_last_modified and last_modified:
+        timestamp = int(last_modified.timestamp())
+        headers.update({'Last-Modified': http_date(timestamp)})
+
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if not_modified:
+        for key, value in headers.items():
+            not_modified[key] = value
+
+    return headers, not_modified
+
+
 def build_metricconfigs():
     ret = []
 
@@ -100,15 +135,28 @@ def build_metricconfigs():
     return ret
 
 
-def get_metrics_from_profile(profile):
-    token = MyAPIKey.objects.get(name='WEB-API')
+def get_metricconfigs_snapshot():
+    """
+    Returns ETag and pre-serialized metric configuration document of the
+    current tenant. Document is rebuilt only if it has been expired since the
+    last request; it is stored only if no change happened while it was built.
+    """
+    snapshot, _ = models.MetricConfigSnapshot.objects.get_or_create(pk=1)
 
-    headers = {'Accept': 'application/json', 'x-api-key': token.token}
-    response = requests.get(
-        settings.WEBAPI_METRIC, headers=headers, timeout=180
-    )
-    response.raise_for_status()
-    data = response.json()['data']
+    if snapshot.etag:
+        return snapshot.etag, snapshot.data.encode('utf-8')
+
+    data = JSONRenderer().render(build_metricconfigs())
+    etag = hashlib.md5(data).hexdigest()
+    models.MetricConfigSnapshot.objects.filter(
+        pk=snapshot.pk, generation=snapshot.generation
+    ).update(etag=etag, data=data.decode('utf-8'))
+
+    return etag, data
+
+
+def get_metrics_from_profile(profile):
+    data = get_metric_profiles()
 
     metrics = set()
     if data:
@@ -127,16 +175,53 @@ def get_metrics_from_profile(profile):
     return metrics
 
 
+def get_packages_repos(metrics, ostag):
+    """
+    Resolves packages of probes used by given metrics (and internal metrics)
+    together with their YUM repo for the given OS tag in constant number of
+    queries. Packages without repo for the OS tag are mapped to None.
+    """
+    metricsobjs = models.Metric.objects.filter(
+        Q(name__in=metrics) | Q(tags__name='internal'),
+        probekey__isnull=False
+    ).select_related('probekey__package').prefetch_related(
+        Prefetch(
+            'probekey__package__repos',
+            queryset=admin_models.YumRepo.objects.filter(tag=ostag),
+            to_attr='ostag_repos'
+        )
+    ).distinct()
+
+    packagedict = dict()
+    for metric in metricsobjs:
+        package = metric.probekey.package
+        if package not in packagedict:
+            if package.ostag_repos:
+                packagedict.update({package: package.ostag_repos[0]})
+
+            else:
+                packagedict.update({package: None})
+
+    return packagedict
+
+
 class ListMetrics(APIView):
     permission_classes = (MyHasAPIKey,)
 
     def get(self, request, tag=None):
+        headers, not_modified = conditional_get(request, ['metrics', tag])
+        if not_modified:
+            return not_modified
+
         if tag:
             try:
                 admin_models.MetricTags.objects.get(name=tag)
                 metrics = models.Metric.objects.filter(tags__name=tag)
 
-                return Response(sorted([metric.name for metric in metrics]))
+                return Response(
+                    sorted([metric.name for metric in metrics]),
+                    headers=headers
+                )
 
             except admin_models.MetricTags.DoesNotExist:
                 return Response(
@@ -145,7 +230,12 @@ class ListMetrics(APIView):
                 )
 
         else:
-            return Response(build_metricconfigs())
+            _, data = get_metricconfigs_snapshot()
+            response = HttpResponse(data, content_type='application/json')
+            for key, value in headers.items():
+                response[key] = value
+
+            return response
 
 
 class ListRepos(APIView):
@@ -170,12 +260,14 @@ class ListRepos(APIView):
             for profile in profiles:
                 metrics = metrics.union(get_metrics_from_profile(profile))
 
-            internal_metrics = set([
-                metric.name for metric in models.Metric.objects.filter(
-                    tags__name='internal'
-                )
-            ])
-            metrics = metrics.union(internal_metrics)
+            # repos depend on metric profiles stored in WEB-API, so they are
+            # part of the ETag, and Last-Modified is not used
+            headers, not_modified = conditional_get(
+                request, ['repos', tag] + sorted(metrics),
+                use_last_modified=False
+            )
+            if not_modified:
+                return not_modified
 
             if tag == 'centos7':
                 ostag = admin_models.OSTag.objects.get(name='CentOS 7')
@@ -184,31 +276,13 @@ class ListRepos(APIView):
             else:
                 raise NotFound(status=404, detail='YUM repo tag not found.')
 
-            packages = set()
-            for metric in metrics:
-                try:
-                    m = models.Metric.objects.get(name=metric)
-                    if m.probekey:
-                        packages.add(m.probekey.package)
-
-                except models.Metric.DoesNotExist:
-                    pass
-
             data = dict()
-            packagedict = dict()
             missing_packages = []
-            for package in packages:
-                try:
-                    repo = package.repos.get(tag=ostag)
-
-                except admin_models.YumRepo.DoesNotExist:
-                    missing_packages.append(package.__str__())
+            for key, value in get_packages_repos(metrics, ostag).items():
+                if not value:
+                    missing_packages.append(key.__str__())
                     continue
 
-                else:
-                    packagedict.update({package: repo})
-
-            for key, value in packagedict.items():
                 if value.name not in data:
                     if key.use_present_version:
                         version = 'present'
@@ -240,7 +314,10 @@ class ListRepos(APIView):
                     data[value.name]['packages'], key=lambda i: i['name']
                 )
 
-        return Response({
-            'data': data,
-            'missing_packages': sorted(missing_packages)
-        })
+        return Response(
+            {
+                'data': data,
+                'missing_packages': sorted(missing_packages)
+            },
+            headers=headers
+        )
@@ -3,6 +3,7 @@ from Poem.api.internal_views.apikey import *
 from Poem.api.internal_views.app import *
 from Poem.api.internal_views.groupelements import *
 from Poem.api.internal_views.history import *
+from Poem.api.internal_views.jobs import *
 from Poem.api.internal_views.login import *
 from Poem.api.internal_views.metricprofiles import *
 from Poem.api.internal_views.metrics import *
@@ -134,7 +134,7 @@ export class Backend {
   }
 
   importMetrics(data) {
-    return this.send(
+    return this.runJob(
       '/api/v2/internal/importmetrics/',
       'POST',
       data
@@ -142,13 +142,77 @@ export class Backend {
   }
 
   bulkDeleteMetrics(data) {
-    return this.send(
+    return this.runJob(
       '/api/v2/internal/deletetemplates/',
       'POST',
       data
     );
   }
 
+  changeProbe(data) {
+    return this.runJob(
+      '/api/v2/internal/probes/',
+      'PUT',
+      data
+    );
+  }
+
+  updateMetricsVersions(data) {
+    return this.runJob(
+      '/api/v2/internal/updatemetricsversions/',
+      'PUT',
+      data
+    );
+  }
+
+  async runJob(url, method, values=undefined, interval=1000, timeout=7200000, retries=5) {
+    // request is queued as background job, and job status is polled until
+    // it is finished; returned object is used the same way as fetch response
+    let response = await this.send(`${url}?async=true`, method, values);
+
+    if (response.status !== 202)
+      return response;
+
+    let json = await response.json();
+    let deadline = Date.now() + timeout;
+    let failures = 0;
+    let error_msg = '';
+    while (Date.now() < deadline) {
+      await new Promise(resolve => setTimeout(resolve, interval));
+
+      let job = undefined;
+      try {
+        job = await this.fetchData(`/api/v2/internal/jobs/${json.id}`);
+      } catch(err) {
+        // fetchData throws both on failed fetch and on error status
+        error_msg = `${err}`;
+        if (++failures > retries)
+          break;
+
+        continue;
+      }
+
+      failures = 0;
+      if (job.status !== 'pending' && job.status !== 'running')
+        return {
+          ok: job.status === 'done',
+          status: job.status_code,
+          statusText: job.status === 'done' ? 'OK' : 'Job failed',
+          json: async () => job.result
+        };
+    }
+
+    if (!error_msg)
+      error_msg = `Job ${json.id} is not finished after ${timeout / 1000} seconds`;
+
+    return {
+      ok: false,
+      status: 504,
+      statusText: 'Job status unknown',
+      json: async () => ({detail: error_msg})
+    };
+  }
+
   send(url, method, values=undefined) {
     const cookies = new Cookies();
 
@@ -315,8 +315,7 @@ export const PackageComponent = (props) => {
   }
 
   async function updateMetrics() {
-    let response = await backend.changeObject(
-      '/api/v2/internal/updatemetricsversions/',
+    let response = await backend.updateMetricsVersions(
       {
         name: formValues.name,
         version: formValues.version
@@ -499,8 +499,7 @@ export const ProbeComponent = (props) => {
         });
       }
     } else {
-      let response = await backend.changeObject(
-        '/api/v2/internal/probes/',
+      let response = await backend.changeProbe(
         {
           id: formValues.id,
           name: formValues.name,
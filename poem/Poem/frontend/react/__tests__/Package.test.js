@@ -31,6 +31,7 @@ beforeEach(() => {
 })
 
 const mockChangeObject = jest.fn();
+const mockUpdateMetricsVersions = jest.fn();
 const mockDeleteObject = jest.fn();
 const mockAddObject = jest.fn();
 
@@ -855,7 +856,7 @@ describe('Tests for package changeview on tenant POEM', () => {
               return Promise.resolve(mockPackageVersions)
           }
         },
-        changeObject: mockChangeObject
+        updateMetricsVersions: mockUpdateMetricsVersions
       }
     })
   })
@@ -900,7 +901,7 @@ describe('Tests for package changeview on tenant POEM', () => {
   })
 
   test('Test changing package version', async () => {
-    mockChangeObject.mockReturnValueOnce(
+    mockUpdateMetricsVersions.mockReturnValueOnce(
       Promise.resolve({
         ok: true,
         status: 200,
@@ -965,8 +966,7 @@ describe('Tests for package changeview on tenant POEM', () => {
     fireEvent.click(screen.getByRole('button', { name: /yes/i }));
 
     await waitFor(() => {
-      expect(mockChangeObject).toHaveBeenCalledWith(
-        '/api/v2/internal/updatemetricsversions/',
+      expect(mockUpdateMetricsVersions).toHaveBeenCalledWith(
         {
           name: 'nagios-plugins-argo-new',
           version: '0.1.12'
@@ -994,7 +994,7 @@ describe('Tests for package changeview on tenant POEM', () => {
       })
     })
 
-    mockChangeObject.mockReturnValueOnce(
+    mockUpdateMetricsVersions.mockReturnValueOnce(
       Promise.resolve({
         ok: true,
         status: 200,
@@ -1063,8 +1063,7 @@ describe('Tests for package changeview on tenant POEM', () => {
     fireEvent.click(screen.getByRole('button', { name: /yes/i }));
 
     await waitFor(() => {
-      expect(mockChangeObject).toHaveBeenCalledWith(
-        '/api/v2/internal/updatemetricsversions/',
+      expect(mockUpdateMetricsVersions).toHaveBeenCalledWith(
         {
           name: 'nagios-plugins-argo-new',
           version: '0.1.12'
@@ -1166,7 +1165,7 @@ describe('Tests for package changeview on tenant POEM', () => {
       )
     })
 
-    expect(mockChangeObject).not.toHaveBeenCalled();
+    expect(mockUpdateMetricsVersions).not.toHaveBeenCalled();
   })
 })
 
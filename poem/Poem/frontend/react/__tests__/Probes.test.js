@@ -15,7 +15,7 @@ jest.mock('../DataManager', () => {
   }
 })
 
-const mockChangeObject = jest.fn();
+const mockChangeProbe = jest.fn();
 const mockAddObject = jest.fn();
 
 
@@ -559,7 +559,7 @@ describe('Test probe changeview on SuperAdmin POEM', () => {
           }
         },
         isTenantSchema: () => Promise.resolve(false),
-        changeObject: mockChangeObject
+        changeProbe: mockChangeProbe
       }
     })
   })
@@ -651,7 +651,7 @@ describe('Test probe changeview on SuperAdmin POEM', () => {
   })
 
   test('Test change probe and save', async () => {
-    mockChangeObject.mockReturnValueOnce(
+    mockChangeProbe.mockReturnValueOnce(
       Promise.resolve({ ok: true, status: 200, statusText: 'OK' })
     )
 
@@ -682,8 +682,7 @@ describe('Test probe changeview on SuperAdmin POEM', () => {
     fireEvent.click(screen.getByRole('button', { name: /yes/i }));
 
     await waitFor(() => {
-      expect(mockChangeObject).toHaveBeenCalledWith(
-        '/api/v2/internal/probes/',
+      expect(mockChangeProbe).toHaveBeenCalledWith(
         {
           id: '1',
           name: 'new-ams-probe',
@@ -703,7 +702,7 @@ describe('Test probe changeview on SuperAdmin POEM', () => {
   })
 
   test('Test change probe without metric template update and save', async () => {
-    mockChangeObject.mockReturnValueOnce(
+    mockChangeProbe.mockReturnValueOnce(
       Promise.resolve({ ok: true, status: 200, statusText: 'OK' })
     )
 
@@ -732,8 +731,7 @@ describe('Test probe changeview on SuperAdmin POEM', () => {
     fireEvent.click(screen.getByRole('button', { name: /yes/i }));
 
     await waitFor(() => {
-      expect(mockChangeObject).toHaveBeenCalledWith(
-        '/api/v2/internal/probes/',
+      expect(mockChangeProbe).toHaveBeenCalledWith(
         {
           id: '1',
           name: 'new-ams-probe',
@@ -753,7 +751,7 @@ describe('Test probe changeview on SuperAdmin POEM', () => {
   })
 
   test('Test error in saving probe with error message', async () => {
-    mockChangeObject.mockReturnValueOnce(
+    mockChangeProbe.mockReturnValueOnce(
       Promise.resolve({
         json: () => Promise.resolve({ detail: 'Probe with this name already exists.' }),
         status: 400,
@@ -786,8 +784,7 @@ describe('Test probe changeview on SuperAdmin POEM', () => {
     fireEvent.click(screen.getByRole('button', { name: /yes/i }));
 
     await waitFor(() => {
-      expect(mockChangeObject).toHaveBeenCalledWith(
-        '/api/v2/internal/probes/',
+      expect(mockChangeProbe).toHaveBeenCalledWith(
         {
           id: '1',
           name: 'test-ams-probe',
@@ -813,7 +810,7 @@ describe('Test probe changeview on SuperAdmin POEM', () => {
   })
 
   test('Test error in saving probe without error message', async () => {
-    mockChangeObject.mockReturnValueOnce(
+    mockChangeProbe.mockReturnValueOnce(
       Promise.resolve({ status: 500, statusText: 'SERVER ERROR' })
     )
 
@@ -842,8 +839,7 @@ describe('Test probe changeview on SuperAdmin POEM', () => {
     fireEvent.click(screen.getByRole('button', { name: /yes/i }));
 
     await waitFor(() => {
-      expect(mockChangeObject).toHaveBeenCalledWith(
-        '/api/v2/internal/probes/',
+      expect(mockChangeProbe).toHaveBeenCalledWith(
         {
           id: '1',
           name: 'test-ams-probe',
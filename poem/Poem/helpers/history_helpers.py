@@ -3,9 +3,9 @@ import json
 from Poem.poem import models as poem_models
 from Poem.poem_super_admin import models as admin_models
 from Poem.users.models import CustUser
-from deepdiff import DeepDiff
 from django.contrib.contenttypes.models import ContentType
 from django.core import serializers
+from tenant_schemas.utils import get_public_schema_name
 
 
 def to_dict(instance):
@@ -40,15 +40,82 @@ def inline_one_to_dict(data):
         return ''
 
 
-def create_history_entry(instance, user, comment):
+def serialize_metric(metric):
+    """
+    Serializes metric for its history. Probe version is stored as its id
+    followed by its name and package version, so that stored versions need
+    no changes when probe or package is renamed. Name and version are shown
+    if the probe version no longer exists.
+    """
+    data = json.loads(serializers.serialize(
+        'json', [metric],
+        use_natural_foreign_keys=True,
+        use_natural_primary_keys=True
+    ))
+    fields = data[0]['fields']
+    if fields['probekey']:
+        fields['probekey'] = [metric.probekey_id] + fields['probekey']
+
+    return json.dumps(data)
+
+
+def _history_model(instance):
+    if isinstance(instance, admin_models.Probe):
+        return admin_models.ProbeHistory
+
+    elif isinstance(instance, admin_models.MetricTemplate):
+        return admin_models.MetricTemplateHistory
+
+    else:
+        return poem_models.TenantHistory
+
+
+def _instance_data(instance):
+    data = to_dict(instance)
+    if isinstance(instance, admin_models.Probe):
+        del data['user'], data['datetime']
+
+    return data
+
+
+def _history_data(history):
+    if isinstance(history, poem_models.TenantHistory):
+        return serialized_data_to_dict(history.get_serialized_data())
+
+    else:
+        data = to_dict(history)
+        del data['object_id'], data['version_comment'], \
+            data['version_user'], data['date_created']
+
+        return data
+
+
+def _latest_history(instance):
+    return _history_model(instance).objects.filter(object_id=instance)\
+        .order_by('-date_created').first()
+
+
+def _tenant_comment(versions, serialized_data):
+    old_data = poem_models.latest_serialized_data(versions)
+
+    return analyze_differences(
+        serialized_data_to_dict(old_data) if old_data else '',
+        serialized_data_to_dict(serialized_data)
+    )
+
+
+def history_entry(instance, user, comment, serialized_data=None):
+    """
+    Returns unsaved history entry of metric, probe or metric template. Tags of
+    metric template's entry can only be added once it is saved.
+    """
     if isinstance(instance, poem_models.Metric):
-        poem_models.TenantHistory.objects.create(
+        if serialized_data is None:
+            serialized_data = serialize_metric(instance)
+
+        return poem_models.TenantHistory(
             object_id=instance.id,
-            serialized_data=serializers.serialize(
-                'json', [instance],
-                use_natural_foreign_keys=True,
-                use_natural_primary_keys=True
-            ),
+            serialized_data=serialized_data,
             object_repr=instance.__str__(),
             content_type=ContentType.objects.get_for_model(instance),
             comment=comment,
@@ -56,7 +123,7 @@ def create_history_entry(instance, user, comment):
         )
 
     elif isinstance(instance, admin_models.Probe):
-        admin_models.ProbeHistory.objects.create(
+        return admin_models.ProbeHistory(
             object_id=instance,
             name=instance.name,
             package=instance.package,
@@ -69,7 +136,7 @@ def create_history_entry(instance, user, comment):
         )
 
     else:
-        history = admin_models.MetricTemplateHistory.objects.create(
+        return admin_models.MetricTemplateHistory(
             object_id=instance,
             name=instance.name,
             mtype=instance.mtype,
@@ -87,29 +154,234 @@ def create_history_entry(instance, user, comment):
             version_comment=comment,
             version_user=user
         )
-        for tag in instance.tags.all():
-            history.tags.add(tag)
+
+
+def create_history_entry(
+        instance, user, comment, serialized_data=None, versions=None
+):
+    """
+    Creates history entry of metric, probe or metric template. Metric's entry
+    is stored as delta if the latest versions of metric (as returned by
+    latest_versions()) are given.
+    """
+    history = history_entry(instance, user, comment, serialized_data)
+    if versions is not None:
+        poem_models.encode_version(history, versions)
+
+    history.save()
+
+    if isinstance(history, admin_models.MetricTemplateHistory):
+        history.tags.add(*instance.tags.all())
+
+    return history
 
 
 def create_history(instance, user, comment=None):
+    serialized_data = None
+    versions = None
     if isinstance(instance, poem_models.Metric):
-        serialized_data = serializers.serialize(
-            'json', [instance],
-            use_natural_foreign_keys=True,
-            use_natural_primary_keys=True
+        serialized_data = serialize_metric(instance)
+        if comment is None:
+            versions = poem_models.latest_versions(
+                instance.id, ContentType.objects.get_for_model(instance)
+            )
+            comment = _tenant_comment(versions, serialized_data)
+
+    elif comment is None:
+        comment = create_comment(instance)
+
+    create_history_entry(instance, user, comment, serialized_data, versions)
+
+
+def create_histories(instances, user, comment=None):
+    """
+    Creates history entries of metrics or metric templates changed by the
+    same operation at once. Comments are created by comparing with the latest
+    stored versions, which are fetched for all objects together, and metrics'
+    entries are stored as deltas against them unless keyframe is due. If
+    comment is given, it is used for all the entries, which are stored
+    complete, as for newly created objects.
+    """
+    instances = list(instances)
+    if not instances:
+        return []
+
+    history_model = _history_model(instances[0])
+    serialized_data = dict()
+    if history_model is poem_models.TenantHistory:
+        for instance in instances:
+            serialized_data[instance.id] = serialize_metric(instance)
+
+    comments = dict()
+    versions = dict()
+    if comment is not None:
+        # comment is given, so versions are stored complete
+        pass
+
+    elif history_model is poem_models.TenantHistory:
+        versions = poem_models.latest_versions_of(
+            [instance.id for instance in instances],
+            ContentType.objects.get_for_model(instances[0])
         )
-        content_type = ContentType.objects.get_for_model(instance)
+        for instance in instances:
+            comments[instance.id] = _tenant_comment(
+                versions.get(str(instance.id), []),
+                serialized_data[instance.id]
+            )
 
-        if not comment:
-            comment = create_comment(
-                instance, ct=content_type, new_serialized_data=serialized_data
+    else:
+        latest = _latest_histories(instances)
+        for instance in instances:
+            history = latest.get(instance.id)
+            comments[instance.id] = analyze_differences(
+                _history_data(history) if history else '',
+                _instance_data(instance)
             )
 
+    entries = []
+    for instance in instances:
+        entry = history_entry(
+            instance, user, comments.get(instance.id, comment or ''),
+            serialized_data.get(instance.id)
+        )
+        if str(instance.id) in versions:
+            poem_models.encode_version(entry, versions[str(instance.id)])
+
+        entries.append(entry)
+
+    entries = history_model.objects.bulk_create(entries)
+
+    # bulk_create does not send post_save signal
+    if history_model is poem_models.TenantHistory:
+        admin_models.bump_content_version()
+
     else:
-        if not comment:
-            comment = create_comment(instance)
+        through = history_model.tags.through
+        through.objects.bulk_create([
+            through(metrictemplatehistory_id=entry.id, metrictags_id=tag.id)
+            for entry, instance in zip(entries, instances)
+            for tag in instance.tags.all()
+        ])
+        admin_models.bump_content_version(get_public_schema_name())
+        admin_models.update_import_index(
+            metrictemplates=[instance.id for instance in instances]
+        )
+
+    return entries
+
+
+def _latest_histories(instances):
+    history = _history_model(instances[0]).objects.filter(
+        object_id__in=instances
+    ).order_by('object_id_id', '-date_created').distinct('object_id_id')
+
+    return dict((item.object_id_id, item) for item in history)
+
+
+def _hashable(value):
+    """
+    Returns hashable representation of serialized value. Lists are
+    represented as sets, so that items are matched regardless of their order
+    and repetition, and type is kept so that e.g. 1 and True do not match.
+    """
+    if isinstance(value, dict):
+        return dict, frozenset(
+            (key, _hashable(item)) for key, item in value.items()
+        )
+
+    elif isinstance(value, list):
+        return list, frozenset(_hashable(item) for item in value)
+
+    else:
+        return type(value), value
+
+
+def _unique_items(items):
+    unique = dict()
+    for item in items:
+        unique.setdefault(_hashable(item), item)
+
+    return unique
+
+
+def _differences(old, new, ordered=False):
+    """
+    Yields (kind, old value, new value) for each difference between two
+    serialized values. Kind is one of 'added' (dictionary key added),
+    'type', 'value', 'item_added' and 'item_removed'. Lists are compared as
+    sets of items, unless ordered is True, in which case they are compared
+    item by item.
+    """
+    if old is new:
+        return
+
+    if type(old) != type(new):
+        yield 'type', old, new
+
+    elif isinstance(old, dict):
+        for key, value in new.items():
+            if key in old:
+                yield from _differences(old[key], value, ordered)
+
+            else:
+                yield 'added', None, value
+
+    elif isinstance(old, list):
+        if ordered:
+            for old_item, new_item in zip(old, new):
+                yield from _differences(old_item, new_item, ordered)
+
+            for item in old[len(new):]:
+                yield 'item_removed', item, None
+
+            for item in new[len(old):]:
+                yield 'item_added', None, item
+
+        else:
+            old_items = _unique_items(old)
+            new_items = _unique_items(new)
+
+            for key, item in old_items.items():
+                if key not in new_items:
+                    yield 'item_removed', item, None
+
+            for key, item in new_items.items():
+                if key not in old_items:
+                    yield 'item_added', None, item
+
+    elif old != new:
+        yield 'value', old, new
+
+
+def _field_differences(old_data, new_data, ordered=False):
+    """
+    Returns (field, kind, old value, new value) for differences of
+    serialized objects, where nested differences are reported for the field
+    they belong to. Fields missing from new data are not reported.
+    """
+    differences = []
+    for field, value in new_data.items():
+        if field in old_data:
+            differences.extend(
+                (field,) + difference for difference in
+                _differences(old_data[field], value, ordered)
+            )
+
+        else:
+            differences.append((field, 'added', None, value))
+
+    return differences
 
-    create_history_entry(instance, user, comment)
+
+def _inline_differences(old_value, new_value):
+    old = inline_models_to_dicts(old_value)
+    new = inline_models_to_dicts(new_value)
+
+    deleted = sorted(key for key in old if key not in new)
+    changed = sorted(key for key in old if key in new and old[key] != new[key])
+    added = sorted(key for key in new if key not in old)
+
+    return deleted, changed, added
 
 
 def analyze_differences(old_data, new_data):
@@ -123,91 +395,56 @@ def analyze_differences(old_data, new_data):
     deleted = []
     msg = []
     if old_data:
-        res = DeepDiff(old_data, new_data, ignore_order=True)
+        differences = _field_differences(old_data, new_data)
 
-        # I'm numbering how many times the for loop has passed because foreign
-        # keys are serialized in lists
-        passed = 0
+        # foreign keys are serialized as lists of natural key values, they
+        # are compared item by item if changed
+        fk_changed = False
         added_groups = list()
         deleted_groups = list()
         added_rules = list()
         deleted_rules = list()
-        if 'iterable_item_removed' in res:
-            for key, value in res['iterable_item_removed'].items():
-                field = key.split('[')[1][0:-1].strip('\'')
-                if field in foreignkeys:
-                    passed += 1
-                    pass
-                elif field == 'groups':
-                    deleted_groups.append(value['name'])
-                elif field == 'rules':
-                    deleted_rules.append(value['metric'])
-                else:
-                    msg.append(
-                        {
-                            'deleted': {
-                                'fields': [field], 'object': value
-                            }
-                        }
-                    )
-
-        if 'iterable_item_added' in res:
-            for key, value in res['iterable_item_added'].items():
-                field = key.split('[')[1][0:-1].strip('\'')
-                if field in foreignkeys:
-                    passed += 1
-                    pass
-                elif field == 'groups':
-                    added_groups.append(value['name'])
-                elif field == 'rules':
-                    added_rules.append(value['metric'])
-                else:
-                    msg.append(
-                        {
-                            'added': {
-                                'fields': [field], 'object': value
-                            }
-                        }
-                    )
-
-        if added_groups or deleted_groups:
-            for item in added_groups:
-                if item in deleted_groups:
-                    deleted_groups.remove(item)
-                    msg.append(
-                        {
-                            'changed': {
-                                'fields': ['groups'], 'object': [item]
-                            }
-                        }
-                    )
-
-                else:
-                    msg.append(
-                        {
-                            'added': {
-                                'fields': ['groups'], 'object': [item]
-                            }
-                        }
-                    )
-
-            for item in deleted_groups:
+        # removed items of all the fields are reported before added ones
+        for field, kind, old, new in sorted(
+                differences, key=lambda item: item[1] != 'item_removed'
+        ):
+            if kind == 'item_removed':
+                groups, rules, value, action = \
+                    deleted_groups, deleted_rules, old, 'deleted'
+
+            elif kind == 'item_added':
+                groups, rules, value, action = \
+                    added_groups, added_rules, new, 'added'
+
+            else:
+                continue
+
+            if field in foreignkeys:
+                fk_changed = True
+            elif field == 'groups':
+                groups.append(value['name'])
+            elif field == 'rules':
+                rules.append(value['metric'])
+            else:
                 msg.append(
                     {
-                        'deleted': {
-                            'fields': ['groups'], 'object': [item]
+                        action: {
+                            'fields': [field], 'object': value
                         }
                     }
                 )
 
-        if added_rules or deleted_rules:
-            for item in added_rules:
-                if item in deleted_rules:
-                    deleted_rules.remove(item)
+        for field, added_items, deleted_items in [
+            ('groups', added_groups, deleted_groups),
+            ('rules', added_rules, deleted_rules)
+        ]:
+            for item in added_items:
+                if item in deleted_items:
+                    deleted_items.remove(item)
                     msg.append(
                         {
                             'changed': {
-                                'fields': ['rules'], 'object': [item]
+                                'fields': [field], 'object': [item]
                             }
                         }
                     )
@@ -216,105 +453,76 @@ def analyze_differences(old_data, new_data):
                     msg.append(
                         {
                             'added': {
-                                'fields': ['rules'], 'object': [item]
+                                'fields': [field], 'object': [item]
                             }
                         }
                     )
 
-            for item in deleted_rules:
+            for item in deleted_items:
                 msg.append(
                     {
                         'deleted': {
-                            'fields': ['rules'], 'object': [item]
+                            'fields': [field], 'object': [item]
                         }
                     }
                 )
 
-        if passed > 0:
-            res = DeepDiff(old_data, new_data)
-
-        if 'dictionary_item_added' in res:
-            for item in res['dictionary_item_added']:
-                added.append(item.split('[')[1][0:-1].strip('\''))
+        if fk_changed:
+            differences = _field_differences(
+                old_data, new_data, ordered=True
+            )
 
-        if 'type_changes' in res:
-            for key, value in res['type_changes'].items():
-                field = key.split('[')[1][0:-1].strip('\'')
+        for field, kind, old, new in differences:
+            if kind == 'added':
+                added.append(field)
 
-                if value['new_value'] is None:
+            elif kind == 'type':
+                if new is None:
                     deleted.append(field)
 
-                if value['old_value'] is None:
+                elif old is None:
                     added.append(field)
 
-                if not value['new_value'] is None and \
-                        not value['old_value'] is None:
+                else:
                     changed.append(field)
 
-        if 'values_changed' in res:
-            for key, value in res['values_changed'].items():
-                field = key.split('[')[1][1:-2]
-                try:
-                    if field in inlines:
-                        old = inline_models_to_dicts(value['old_value'])
-                        new = inline_models_to_dicts(value['new_value'])
-                        deleted_fields = []
-                        changed_fields = []
-                        added_fields = []
-                        res = DeepDiff(old, new, ignore_order=True)
-                        if 'values_changed' in res:
-                            for k, v in res['values_changed'].items():
-                                changed_fields.append(
-                                    k.split('[')[1][0:-1].strip('\'')
-                                )
-
-                        if 'dictionary_item_added' in res:
-                            for item in res['dictionary_item_added']:
-                                added_fields.append(
-                                    item.split('[')[1][0:-1].strip('\'')
-                                )
-
-                        if 'dictionary_item_removed' in res:
-                            for item in res['dictionary_item_removed']:
-                                deleted_fields.append(
-                                    item.split('[')[1][0:-1].strip('\'')
-                                )
-
-                        if deleted_fields:
-                            msg.append(
-                                {'deleted': {
-                                    'fields': [field],
-                                    'object': sorted(deleted_fields)
-                                }}
-                            )
-
-                        if changed_fields:
-                            msg.append(
-                                {'changed': {
-                                    'fields': [field],
-                                    'object': sorted(changed_fields)
-                                }}
-                            )
-
-                        if added_fields:
-                            msg.append(
-                                {'added': {'fields': [field],
-                                           'object': sorted(added_fields)}}
-                            )
-
-                    else:
-                        if not value['new_value']:
-                            deleted.append(field)
+            elif kind == 'value':
+                if field in inlines:
+                    deleted_fields, changed_fields, added_fields = \
+                        _inline_differences(old, new)
+
+                    if deleted_fields:
+                        msg.append(
+                            {'deleted': {
+                                'fields': [field],
+                                'object': deleted_fields
+                            }}
+                        )
+
+                    if changed_fields:
+                        msg.append(
+                            {'changed': {
+                                'fields': [field],
+                                'object': changed_fields
+                            }}
+                        )
+
+                    if added_fields:
+                        msg.append(
+                            {'added': {'fields': [field],
+                                       'object': added_fields}}
+                        )
 
-                        elif not value['old_value']:
-                            added.append(field)
+                else:
+                    if not new:
+                        deleted.append(field)
 
-                        else:
-                            if field != 'tags':
-                                changed.append(field)
+                    elif not old:
+                        added.append(field)
 
-                except KeyError:
-                    pass
+                    else:
+                        if field != 'tags':
+                            changed.append(field)
 
         if added:
             msg.append({'added': {'fields': sorted(list(set(added)))}})
@@ -329,69 +537,44 @@ def analyze_differences(old_data, new_data):
 
 
 def create_comment(instance, ct=None, new_serialized_data=None):
-    if isinstance(instance, (admin_models.Probe, admin_models.MetricTemplate)):
-        if isinstance(instance, admin_models.Probe):
-            history_model = admin_models.ProbeHistory
-        else:
-            history_model = admin_models.MetricTemplateHistory
+    if _history_model(instance) is poem_models.TenantHistory:
+        return _tenant_comment(
+            poem_models.latest_versions(instance.id, ct), new_serialized_data
+        )
 
-        history = history_model.objects.filter(object_id=instance) \
-            .order_by('-date_created')
+    history = _latest_history(instance)
 
-        new_data = to_dict(instance)
-        if isinstance(instance, admin_models.Probe):
-            del new_data['user'], new_data['datetime']
+    if history:
+        old_data = _history_data(history)
 
-    else:
-        history = poem_models.TenantHistory.objects.filter(
-            object_id=instance.id,
-            content_type=ct
-        ).order_by('-date_created')
-        new_data = serialized_data_to_dict(new_serialized_data)
-
-    if len(history) > 0:
-        if isinstance(
-                instance,
-                (poem_models.Metric, poem_models.MetricProfiles,
-                 poem_models.Aggregation, poem_models.ThresholdsProfiles)
-        ):
-            old_data = serialized_data_to_dict(history[0].serialized_data)
-        else:
-            old_data = to_dict(history[0])
-            del old_data['object_id'], old_data['version_comment'], \
-                old_data['version_user'], old_data['date_created']
     else:
         old_data = ''
 
-    return analyze_differences(old_data, new_data)
+    return analyze_differences(old_data, _instance_data(instance))
 
 
 def update_comment(instance):
-    if isinstance(instance, admin_models.Probe):
-        history_model = admin_models.ProbeHistory
-
-    else:
-        history_model = admin_models.MetricTemplateHistory
-
-    history = history_model.objects.filter(object_id=instance)\
-        .order_by('-date_created')
-
-    new_data = to_dict(instance)
-    if isinstance(instance, admin_models.Probe):
-        del new_data['user'], new_data['datetime']
+    history = _history_model(instance).objects.filter(object_id=instance)\
+        .order_by('-date_created')[1:2]
 
-    if len(history) > 1:
-        old_data = to_dict(history[1])
-        del old_data['object_id'], old_data['version_comment'], \
-            old_data['version_user'], old_data['date_created']
+    if history:
+        old_data = _history_data(history[0])
 
     else:
         old_data = ''
 
-    return analyze_differences(old_data, new_data)
+    return analyze_differences(old_data, _instance_data(instance))
 
 
-def create_profile_history(instance, data, user, description=None):
+def profile_history_entry(
+        instance, data, user, description=None, comment=None
+):
+    """
+    Returns unsaved TenantHistory entry for profile, so that entries of many
+    profiles can be stored at once. If comment is not given, it is created by
+    comparing with the latest stored version, and the entry holds only the
+    delta against it unless keyframe is due.
+    """
     ct = ContentType.objects.get_for_model(instance)
 
     if isinstance(user, CustUser):
@@ -428,13 +611,27 @@ def create_profile_history(instance, data, user, description=None):
     ):
         serialized_data[0]['fields'].update(**data)
 
-    comment = create_comment(instance, ct, json.dumps(serialized_data))
+    serialized_data = json.dumps(serialized_data)
 
-    poem_models.TenantHistory.objects.create(
+    versions = None
+    if comment is None:
+        versions = poem_models.latest_versions(instance.id, ct)
+        comment = _tenant_comment(versions, serialized_data)
+
+    history = poem_models.TenantHistory(
         object_id=instance.id,
-        serialized_data=json.dumps(serialized_data),
+        serialized_data=serialized_data,
         object_repr=instance.__str__(),
         comment=comment,
         user=username,
         content_type=ct
     )
+
+    if versions is not None:
+        poem_models.encode_version(history, versions)
+
+    return history
+
+
+def create_profile_history(instance, data, user, description=None):
+    profile_history_entry(instance, data, user, description).save()
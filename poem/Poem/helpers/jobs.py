@@ -0,0 +1,202 @@
+import datetime
+import functools
+import importlib
+import json
+import logging
+import threading
+
+from Poem.poem_super_admin.models import Job
+from Poem.tenants.models import Tenant
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Q
+from django.http import QueryDict
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from tenant_schemas.utils import schema_context, get_public_schema_name
+
+logger = logging.getLogger('POEM')
+
+# job name: (module, qualified name of view method)
+_registry = dict()
+
+_local = threading.local()
+
+
+class JobRequest:
+    """
+    Stands in for DRF request when view method is run by the worker. View
+    methods run as jobs use only data, user and tenant of the request.
+    """
+    def __init__(self, data, user, tenant):
+        self.data = data
+        self.user = user
+        self.tenant = tenant
+        self.query_params = dict()
+
+
+def background_job(name, allowed=None):
+    """
+    Decorator for view methods which may take too long to be done within the
+    request. If the method is called with ?async=true, and allowed(request)
+    is true, job is queued and its id is returned with 202 status code.
+    Otherwise, the method is run right away, as before.
+    """
+    def decorator(method):
+        _registry[name] = (method.__module__, method.__qualname__)
+
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.query_params.get('async') in ['true', 'True', '1'] \
+                    and (allowed is None or allowed(request)):
+                job = enqueue(name, request.user.username, request.data)
+                return Response(
+                    {'id': job.id}, status=status.HTTP_202_ACCEPTED
+                )
+
+            return method(self, request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def enqueue(name, username, data):
+    # form data is kept encoded, so that the view gets the same QueryDict
+    if isinstance(data, QueryDict):
+        args = {'query': data.urlencode()}
+
+    else:
+        args = {'data': data}
+
+    return Job.objects.create(
+        name=name, schema_name=connection.schema_name, user=username,
+        args=json.dumps(args)
+    )
+
+
+def _job_data(job):
+    args = json.loads(job.args)
+
+    if 'query' in args:
+        return QueryDict(args['query'])
+
+    return args['data']
+
+
+def claim_next_job():
+    """
+    Marks the oldest pending job as running and returns it. Jobs locked by
+    other workers are skipped, so that workers can run concurrently. Jobs
+    which are running for longer than JOB_TIMEOUT seconds are considered
+    abandoned by worker which died, and are claimed again.
+    """
+    abandoned = datetime.datetime.now() - datetime.timedelta(
+        seconds=settings.JOB_TIMEOUT
+    )
+
+    with schema_context(get_public_schema_name()), transaction.atomic():
+        job = Job.objects.select_for_update(skip_locked=True).filter(
+            Q(status=Job.PENDING) |
+            Q(status=Job.RUNNING, date_started__lt=abandoned)
+        ).order_by('id').first()
+
+        if job:
+            if job.status == Job.RUNNING:
+                logger.warning(
+                    '%s: Job %s (%s) abandoned, running it again' % (
+                        job.schema_name.upper(), job.id, job.name
+                    )
+                )
+
+            job.status = Job.RUNNING
+            job.date_started = datetime.datetime.now()
+            job.save()
+
+    return job
+
+
+def current_job():
+    """
+    Returns id of the job run in this thread, or None if there is none.
+    """
+    return getattr(_local, 'job_id', None)
+
+
+def set_progress(done, total, job_id=None):
+    """
+    Sets progress of the job in percents. Called from view methods, so it
+    does nothing if they are not run as a job. Threads started by the job
+    have to pass its id, taken from current_job().
+    """
+    if job_id is None:
+        job_id = current_job()
+
+    if job_id and total:
+        Job.objects.filter(id=job_id).update(
+            progress=int(100 * done / total)
+        )
+
+
+def _call(job):
+    module_name, qualname = _registry[job.name]
+    view_name, method_name = qualname.split('.')
+    view = getattr(importlib.import_module(module_name), view_name)()
+
+    with schema_context(job.schema_name):
+        request = JobRequest(
+            data=_job_data(job),
+            user=get_user_model().objects.get(username=job.user),
+            tenant=Tenant.objects.get(schema_name=job.schema_name)
+        )
+
+        # the wrapped method is called, so that the job is not queued again
+        return getattr(view, method_name).__wrapped__(view, request)
+
+
+def run_job(job):
+    _local.job_id = job.id
+
+    try:
+        response = _call(job)
+        job.status_code = response.status_code
+        job.status = Job.DONE if response.status_code < 400 else Job.FAILED
+        job.result = JSONRenderer().render(response.data).decode('utf-8') \
+            if response.data is not None else ''
+
+    except Exception as e:
+        logger.error(
+            '%s: Job %s (%s) failed: %s' % (
+                job.schema_name.upper(), job.id, job.name, str(e)
+            )
+        )
+        job.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        job.status = Job.FAILED
+        job.result = json.dumps({'detail': str(e)})
+
+    finally:
+        _local.job_id = None
+
+    with schema_context(get_public_schema_name()):
+        job.progress = 100
+        job.date_finished = datetime.datetime.now()
+        job.save()
+
+    return job
+
+
+def run_pending_jobs():
+    """
+    Runs pending jobs until there are none left. Returns number of jobs run.
+    """
+    count = 0
+    while True:
+        job = claim_next_job()
+
+        if not job:
+            return count
+
+        run_job(job)
+        count += 1
@@ -0,0 +1,146 @@
+import difflib
+import json
+
+
+def _escape(token):
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token):
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def _key(item):
+    # keys are not sorted, so that items with keys in different order differ
+    return json.dumps(item)
+
+
+def _list_ops(old, new, path):
+    ops = []
+    # indices are shifted by operations already made on the list
+    offset = 0
+    matcher = difflib.SequenceMatcher(
+        None, [_key(item) for item in old], [_key(item) for item in new],
+        autojunk=False
+    )
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+
+        paired = 0
+        if tag == 'replace':
+            paired = min(i2 - i1, j2 - j1)
+            for k in range(paired):
+                _diff(
+                    old[i1 + k], new[j1 + k],
+                    '{}/{}'.format(path, i1 + offset + k), ops
+                )
+
+        index = i1 + offset + paired
+        for k in range(i2 - i1 - paired):
+            ops.append({'op': 'remove', 'path': '{}/{}'.format(path, index)})
+
+        for k in range(j2 - j1 - paired):
+            ops.append({
+                'op': 'add', 'path': '{}/{}'.format(path, index + k),
+                'value': new[j1 + paired + k]
+            })
+
+        offset += (j2 - j1) - (i2 - i1)
+
+    return ops
+
+
+def _diff(old, new, path, ops):
+    if type(old) != type(new):
+        ops.append({'op': 'replace', 'path': path, 'value': new})
+
+    elif isinstance(old, dict):
+        # patched dictionary has to keep the order of keys, added keys are
+        # appended to it
+        if list(new) != [key for key in old if key in new] + \
+                [key for key in new if key not in old]:
+            ops.append({'op': 'replace', 'path': path, 'value': new})
+            return
+
+        for key in old:
+            if key not in new:
+                ops.append(
+                    {'op': 'remove', 'path': path + '/' + _escape(key)}
+                )
+
+        for key, value in new.items():
+            if key in old:
+                _diff(old[key], value, path + '/' + _escape(key), ops)
+
+            else:
+                ops.append({
+                    'op': 'add', 'path': path + '/' + _escape(key),
+                    'value': value
+                })
+
+    elif isinstance(old, list):
+        if _key(old) != _key(new):
+            item_ops = _list_ops(old, new, path)
+            replace = {'op': 'replace', 'path': path, 'value': new}
+            if len(_key(item_ops)) < len(_key(replace)):
+                ops.extend(item_ops)
+
+            else:
+                ops.append(replace)
+
+    elif old != new:
+        ops.append({'op': 'replace', 'path': path, 'value': new})
+
+
+def make_patch(old, new):
+    """
+    Returns JSON patch (RFC 6902) which transforms old document into the new
+    one, made only of add, remove and replace operations. Lists are patched
+    item by item if that is shorter than replacing them as a whole.
+    """
+    ops = []
+    _diff(old, new, '', ops)
+    return ops
+
+
+def apply_patch(doc, patch):
+    """
+    Applies JSON patch made by make_patch() to the document, which is changed
+    in place, and returns patched document.
+    """
+    for op in patch:
+        tokens = [_unescape(token) for token in op['path'].split('/')[1:]]
+
+        if not tokens:
+            if op['op'] == 'remove':
+                doc = None
+
+            else:
+                doc = op['value']
+
+            continue
+
+        parent = doc
+        for token in tokens[:-1]:
+            if isinstance(parent, list):
+                parent = parent[int(token)]
+
+            else:
+                parent = parent[token]
+
+        key = tokens[-1]
+        if isinstance(parent, list):
+            key = len(parent) if key == '-' else int(key)
+
+            if op['op'] == 'add':
+                parent.insert(key, op['value'])
+                continue
+
+        if op['op'] == 'remove':
+            del parent[key]
+
+        else:
+            parent[key] = op['value']
+
+    return doc
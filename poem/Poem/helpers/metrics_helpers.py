@@ -1,167 +1,237 @@
+import hashlib
 import json
 
 import requests
 from Poem.api.models import MyAPIKey
-from Poem.helpers.history_helpers import create_history
+from Poem.helpers import webapi_client
+from Poem.helpers.history_helpers import create_history, \
+    create_histories, serialize_metric
+from Poem.helpers.jobs import set_progress
+from Poem.helpers.tenant_helpers import tenant_schemas, fan_out
+from Poem.helpers.webapi_cache import refresh_metric_profiles, \
+    invalidate_metric_profiles
 from Poem.poem import models as poem_models
 from Poem.poem_super_admin import models as admin_models
-from Poem.tenants.models import Tenant
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
-from django.core import serializers
-from django.db import IntegrityError
-from tenant_schemas.utils import schema_context, get_public_schema_name
-
-
-def import_metrics(metrictemplates, tenant, user):
-    imported = []
-    warn_imported = []
-    not_imported = []
-    unavailable = []
-    for template in metrictemplates:
-        imported_different_version = False
-        mt = admin_models.MetricTemplate.objects.get(name=template)
-        mtype = poem_models.MetricType.objects.get(name=mt.mtype.name)
-        gr = poem_models.GroupOfMetrics.objects.get(
-            name=tenant.name.upper()
+from django.db import connection, transaction
+from django.db.models import Q
+from tenant_schemas.utils import schema_context
+
+# number of metric templates imported at once
+IMPORT_CHUNK_SIZE = 500
+
+
+def _metric_from_template(template, mtype, group, probekey):
+    if not probekey:
+        return poem_models.Metric(
+            name=template.name,
+            mtype=mtype,
+            description=template.description,
+            parent=template.parent,
+            flags=template.flags,
+            group=group
         )
 
-        packages = []
-        for m in poem_models.Metric.objects.all():
-            if m.probekey:
-                packages.append(m.probekey.package)
+    return poem_models.Metric(
+        name=template.name,
+        mtype=mtype,
+        probekey=probekey,
+        description=template.description,
+        parent=template.parent,
+        group=group,
+        probeexecutable=template.probeexecutable,
+        config=template.config,
+        attribute=template.attribute,
+        dependancy=template.dependency,
+        flags=template.flags,
+        files=template.files,
+        parameter=template.parameter,
+        fileparameter=template.fileparameter
+    )
 
-        package_names = [package.name for package in packages]
 
-        try:
-            if mt.probekey:
-                if mt.probekey.package.name in package_names and \
-                        mt.probekey.package not in packages:
-                    package_version = [
-                        package for package in packages
-                        if package.name == mt.probekey.package.name
-                    ][0]
-                    try:
-                        ver = admin_models.ProbeHistory.objects.get(
-                            name=mt.probekey.name,
-                            package=package_version
-                        )
-
-                        metrictemplate = \
-                            admin_models.MetricTemplateHistory.objects.get(
-                                name=mt.name, probekey=ver
-                            )
-                        imported_different_version = True
-
-                    except admin_models.ProbeHistory.DoesNotExist:
-                        unavailable.append(mt.name)
-                        continue
-
-                    except admin_models.MetricTemplateHistory.DoesNotExist:
-                        unavailable.append(mt.name)
-                        continue
+def import_metrics(metrictemplates, tenant, user):
+    """
+    Imports metric templates with given names to tenant. If package of
+    template's probe is already used by tenant in another version, metric is
+    imported from template's version with probe from that package. Templates
+    are imported IMPORT_CHUNK_SIZE at a time, and progress of the job is set
+    after each chunk. Tenant statistics are recounted once at the end.
+    """
+    found = set(admin_models.MetricTemplate.objects.filter(
+        name__in=metrictemplates
+    ).values_list('name', flat=True))
+    for name in metrictemplates:
+        if name not in found:
+            raise admin_models.MetricTemplate.DoesNotExist(
+                'MetricTemplate matching query does not exist.'
+            )
 
-                else:
-                    metrictemplate = mt
-                    ver = mt.probekey
-
-                metric = poem_models.Metric.objects.create(
-                    name=metrictemplate.name,
-                    mtype=mtype,
-                    probekey=ver,
-                    description=metrictemplate.description,
-                    parent=metrictemplate.parent,
-                    group=gr,
-                    probeexecutable=metrictemplate.probeexecutable,
-                    config=metrictemplate.config,
-                    attribute=metrictemplate.attribute,
-                    dependancy=metrictemplate.dependency,
-                    flags=metrictemplate.flags,
-                    files=metrictemplate.files,
-                    parameter=metrictemplate.parameter,
-                    fileparameter=metrictemplate.fileparameter
-                )
-                new_tags = set([tag.name for tag in metrictemplate.tags.all()])
+    results = ([], [], [], [])
+    try:
+        for i in range(0, len(metrictemplates), IMPORT_CHUNK_SIZE):
+            chunk = metrictemplates[i:i + IMPORT_CHUNK_SIZE]
+            for result, names in zip(
+                    results, _import_metrics_chunk(chunk, tenant, user)
+            ):
+                result.extend(names)
+
+            set_progress(i + len(chunk), len(metrictemplates))
+
+    finally:
+        # bulk_create does not send post_save signal, so metrics imported in
+        # all the chunks are counted once
+        if results[0] or results[1]:
+            admin_models.update_tenant_statistics(
+                poem_models.Metric.objects.all()
+            )
 
-            else:
-                metric = poem_models.Metric.objects.create(
-                    name=mt.name,
-                    mtype=mtype,
-                    description=mt.description,
-                    parent=mt.parent,
-                    flags=mt.flags,
-                    group=gr
-                )
-                new_tags = set([tag.name for tag in mt.tags.all()])
+    return results
 
-            old_tags = set([tag.name for tag in metric.tags.all()])
 
-            if new_tags.difference(old_tags):
-                for tag_name in new_tags.difference(old_tags):
-                    metric.tags.add(
-                        admin_models.MetricTags.objects.get(name=tag_name)
-                    )
+def _import_metrics_chunk(metrictemplates, tenant, user):
+    """
+    Templates, probe versions and template versions are fetched at once, and
+    metrics, their tags and history are created in bulk.
+    """
+    imported = []
+    warn_imported = []
+    not_imported = []
+    unavailable = []
 
-            if old_tags.difference(new_tags):
-                for tag_name in old_tags.difference(new_tags):
-                    metric.tags.remove(
-                        admin_models.MetricTags.objects.get(name=tag_name)
-                    )
+    templates = dict(
+        (mt.name, mt) for mt in admin_models.MetricTemplate.objects.filter(
+            name__in=metrictemplates
+        ).select_related('mtype', 'probekey__package').prefetch_related(
+            'tags'
+        )
+    )
 
-            create_history(
-                metric, user.username, comment='Initial version.'
+    mtypes = dict(
+        (mtype.name, mtype) for mtype in poem_models.MetricType.objects.filter(
+            name__in=set(mt.mtype.name for mt in templates.values())
+        )
+    )
+    gr = poem_models.GroupOfMetrics.objects.get(name=tenant.name.upper())
+
+    existing = set(poem_models.Metric.objects.values_list('name', flat=True))
+
+    # packages in use by name, including those of metrics being imported
+    packages = dict()
+    for package in admin_models.Package.objects.filter(
+            id__in=poem_models.Metric.objects.values('probekey__package')
+    ).order_by('id'):
+        packages.setdefault(package.name, package)
+
+    # templates whose probe has to be taken from package in use
+    other_version = dict()
+    for name in metrictemplates:
+        mt = templates[name]
+        if mt.probekey:
+            package = packages.setdefault(
+                mt.probekey.package.name, mt.probekey.package
+            )
+            if package != mt.probekey.package:
+                other_version[name] = package
+
+    probe_versions = dict()
+    template_versions = dict()
+    if other_version:
+        probe_versions = dict(
+            ((ver.name, ver.package_id), ver)
+            for ver in admin_models.ProbeHistory.objects.filter(
+                name__in=set(
+                    templates[name].probekey.name for name in other_version
+                ),
+                package__in=set(other_version.values())
             )
+        )
+        template_versions = dict(
+            ((ver.name, ver.probekey_id), ver)
+            for ver in admin_models.MetricTemplateHistory.objects.filter(
+                name__in=other_version.keys(),
+                probekey__in=probe_versions.values()
+            ).prefetch_related('tags')
+        )
 
-            if imported_different_version:
-                warn_imported.append(mt.name)
+    metrics = []
+    tags = dict()
+    for name in metrictemplates:
+        mt = templates[name]
+        metrictemplate = mt
+        ver = mt.probekey
+        if name in other_version:
+            ver = probe_versions.get(
+                (mt.probekey.name, other_version[name].id)
+            )
+            metrictemplate = template_versions.get(
+                (mt.name, ver.id if ver else None)
+            )
 
-            else:
-                imported.append(mt.name)
+            if not metrictemplate:
+                unavailable.append(mt.name)
+                continue
 
-        except IntegrityError:
+        if mt.name in existing:
             not_imported.append(mt.name)
             continue
 
-    return imported, warn_imported, not_imported, unavailable
+        existing.add(mt.name)
+        metrics.append(_metric_from_template(
+            metrictemplate, mtypes[mt.mtype.name], gr, ver
+        ))
+        tags[mt.name] = list(metrictemplate.tags.all())
 
+        if name in other_version:
+            warn_imported.append(mt.name)
 
-def get_metrics_in_profiles(schema):
-    with schema_context(schema):
-        try:
-            token = MyAPIKey.objects.get(name='WEB-API')
-            headers = {
-                'Accept': 'application/json', 'x-api-key': token.token
-            }
-
-            response = requests.get(
-                settings.WEBAPI_METRIC, headers=headers, timeout=180
+        else:
+            imported.append(mt.name)
+
+    if metrics:
+        with transaction.atomic():
+            metrics = poem_models.Metric.objects.bulk_create(metrics)
+
+            through = poem_models.Metric.tags.through
+            through.objects.bulk_create([
+                through(metric_id=metric.id, metrictags_id=tag.id)
+                for metric in metrics for tag in tags[metric.name]
+            ])
+
+            # history is serialized from metrics with their tags
+            create_histories(
+                poem_models.Metric.objects.filter(
+                    id__in=[metric.id for metric in metrics]
+                ).select_related(
+                    'mtype', 'group', 'probekey__package'
+                ).prefetch_related('tags').order_by('id'),
+                user.username, comment='Initial version.'
             )
-            response.raise_for_status()
 
-            data = response.json()['data']
-            metrics_dict = dict()
-            for item in data:
-                for service in item['services']:
-                    if 'metrics' in service:
-                        for metric in service['metrics']:
-                            if metric not in metrics_dict:
-                                metrics_dict.update({
-                                    metric: [item['name']]
-                                })
+            # bulk_create does not send post_save signal
+            poem_models.expire_metricconfig_snapshot()
 
-                            else:
-                                metrics_dict.update({
-                                    metric:
-                                        metrics_dict[metric] + [item['name']]
-                                })
+    return imported, warn_imported, not_imported, unavailable
 
-            return metrics_dict
 
-        except requests.exceptions.HTTPError:
-            raise
+def get_metrics_in_profiles(schema):
+    """
+    Returns dict of lists of names of metric profiles keyed by metric name,
+    for metrics used in metric profiles of the schema. It is taken from the
+    local index of profiles' metrics, so WEB-API is not contacted.
+    """
+    with schema_context(schema):
+        metrics_dict = dict()
+        entries = poem_models.MetricProfileIndex.objects.order_by(
+            'profile__name', 'id'
+        ).values_list('metric', 'profile__name')
+        for metric, profile in entries:
+            profiles = metrics_dict.setdefault(metric, [])
+            if profile not in profiles:
+                profiles.append(profile)
 
-        except MyAPIKey.DoesNotExist:
-            raise Exception('Error fetching WEB API data: API key not found.')
+        return metrics_dict
 
 
 def update_metric_in_schema(
@@ -181,7 +251,7 @@ def update_metric_in_schema(
     else:
         probekey = None
 
-    msgs = ''
+    msgs = []
     with schema_context(schema):
         try:
             met = poem_models.Metric.objects.get(
@@ -243,16 +313,15 @@ def update_metric_in_schema(
                         poem_models.Metric
                     )
                 )[0]
-                history.serialized_data = serializers.serialize(
-                    'json', [met],
-                    use_natural_foreign_keys=True,
-                    use_natural_primary_keys=True
-                )
                 history.object_repr = met.__str__()
-                history.save()
+                poem_models.set_serialized_data(
+                    history, serialize_metric(met)
+                )
 
             if name != met.name:
-                msgs = update_metrics_in_profiles(name, met.name)
+                msgs = update_metrics_in_profiles(
+                    name, met.name, schemas=[schema]
+                )
 
         except poem_models.Metric.DoesNotExist:
             pass
@@ -261,95 +330,295 @@ def update_metric_in_schema(
 
 
 def update_metrics(metrictemplate, name, probekey, user=''):
-    schemas = list(Tenant.objects.all().values_list('schema_name', flat=True))
-    schemas.remove(get_public_schema_name())
+    schemas = tenant_schemas()
 
-    msgs = []
-    for schema in schemas:
-        msg = update_metric_in_schema(
+    def update(schema):
+        return update_metric_in_schema(
             mt_id=metrictemplate.id, name=name, pk_id=probekey.id,
             schema=schema, user=user
         )
-        if msg:
-            msgs.append(msg)
+
+    results, errors = fan_out(update, schemas)
+
+    msgs = []
+    for schema in schemas:
+        if results.get(schema):
+            msgs.extend(results[schema])
+
+        if schema in errors:
+            msgs.append(
+                '{}: Error trying to update metric: {}'.format(
+                    schema.upper(), errors[schema]
+                )
+            )
 
     return msgs
 
 
-def update_metrics_in_profiles(old_name, new_name):
-    error_msgs = []
-    if old_name == new_name:
-        pass
+# fields of metric taken from metric template's version
+METRIC_VERSION_FIELDS = [
+    'name', 'probekey', 'probeexecutable', 'description', 'parent', 'config',
+    'attribute', 'dependancy', 'flags', 'files', 'parameter', 'fileparameter'
+]
+
+
+def update_metrics_from_history(updates, schema, user=''):
+    """
+    Updates tenant's metrics to versions of metric templates at once. Updates
+    are pairs of metric name and id of metric template history entry.
+    Returns error messages of updating renamed metrics in metric profiles.
+    """
+    versions = dict(
+        (ver.id, ver) for ver in
+        admin_models.MetricTemplateHistory.objects.filter(
+            id__in=[mt_id for name, mt_id in updates]
+        ).prefetch_related('tags')
+    )
+
+    renamed = []
+    with schema_context(schema):
+        with transaction.atomic():
+            metrics = dict(
+                (met.name, met) for met in poem_models.Metric.objects.filter(
+                    name__in=[name for name, mt_id in updates]
+                ).prefetch_related('tags')
+            )
+
+            changed = []
+            added_tags = []
+            removed_tags = Q()
+            for name, mt_id in updates:
+                if name not in metrics:
+                    continue
+
+                met = metrics[name]
+                metrictemplate = versions[mt_id]
+                met.name = metrictemplate.name
+                met.probekey_id = metrictemplate.probekey_id
+                met.probeexecutable = metrictemplate.probeexecutable
+                met.description = metrictemplate.description
+                met.parent = metrictemplate.parent
+                met.attribute = metrictemplate.attribute
+                met.dependancy = metrictemplate.dependency
+                met.flags = metrictemplate.flags
+                met.files = metrictemplate.files
+                met.parameter = metrictemplate.parameter
+                met.fileparameter = metrictemplate.fileparameter
+                if metrictemplate.config:
+                    met.config = metrictemplate.config
+
+                new_tags = set(tag.id for tag in metrictemplate.tags.all())
+                old_tags = set(tag.id for tag in met.tags.all())
+                added_tags.extend(
+                    (met.id, tag) for tag in new_tags.difference(old_tags)
+                )
+                if old_tags.difference(new_tags):
+                    removed_tags |= Q(
+                        metric_id=met.id,
+                        metrictags_id__in=old_tags.difference(new_tags)
+                    )
+
+                if name != met.name:
+                    renamed.append((name, met.name))
+
+                changed.append(met)
+
+            if changed:
+                poem_models.Metric.objects.bulk_update(
+                    changed, METRIC_VERSION_FIELDS
+                )
+
+                through = poem_models.Metric.tags.through
+                if removed_tags:
+                    through.objects.filter(removed_tags).delete()
+
+                through.objects.bulk_create([
+                    through(metric_id=metric_id, metrictags_id=tag_id)
+                    for metric_id, tag_id in added_tags
+                ])
+
+                # history is serialized from metrics with their new tags
+                create_histories(
+                    poem_models.Metric.objects.filter(
+                        id__in=[met.id for met in changed]
+                    ).select_related(
+                        'mtype', 'group', 'probekey__package'
+                    ).prefetch_related('tags').order_by('id'),
+                    user
+                )
+
+                # bulk_update does not send post_save signal
+                poem_models.expire_metricconfig_snapshot()
+                admin_models.update_tenant_statistics(
+                    poem_models.Metric.objects.all()
+                )
+
+    msgs = []
+    for old_name, new_name in renamed:
+        msgs.extend(
+            update_metrics_in_profiles(old_name, new_name, schemas=[schema])
+        )
+
+    return msgs
+
+
+def _metrics_versions_digest(package):
+    version, last_modified = admin_models.get_content_version(
+        connection.schema_name
+    )
+
+    return hashlib.sha256(
+        '{}:{}'.format(package.id, version).encode('utf-8')
+    ).hexdigest()
+
+
+def _make_metrics_versions_plan(package):
+    names = list(
+        poem_models.Metric.objects.filter(
+            probekey__package__name=package.name
+        ).order_by('id').values_list('name', flat=True)
+    )
+
+    # metric templates are found by any of their versions named as metric
+    templates = dict()
+    for name, object_id in admin_models.MetricTemplateHistory.objects.filter(
+            name__in=names
+    ).order_by('id').values_list('name', 'object_id'):
+        templates.setdefault(name, object_id)
+
+    versions = dict()
+    for object_id, mt_id in admin_models.MetricTemplateHistory.objects.filter(
+            object_id__in=set(templates.values()), probekey__package=package
+    ).order_by('id').values_list('object_id', 'id'):
+        versions.setdefault(object_id, mt_id)
+
+    plan = {'updated': [], 'deleted': [], 'no_history': []}
+    for name in names:
+        if name not in templates:
+            plan['no_history'].append(name)
+
+        elif templates[name] in versions:
+            plan['updated'].append([name, versions[templates[name]]])
+
+        else:
+            plan['deleted'].append(name)
+
+    return plan
+
+
+def plan_metrics_versions(package):
+    """
+    Returns changes of tenant's metrics needed to switch to the given package
+    version: metrics updated to metric template versions with probes from
+    the package, metrics deleted since their probes are not part of it, and
+    metrics without metric template history. The plan is stored, and the
+    stored one is returned if neither tenant's nor public data has changed
+    since it was made.
+    """
+    digest = _metrics_versions_digest(package)
+
+    stored = poem_models.MetricsVersionsPlan.objects.first()
+    if stored and stored.digest == digest:
+        return json.loads(stored.data)
+
+    plan = _make_metrics_versions_plan(package)
+
+    if stored:
+        stored.digest = digest
+        stored.data = json.dumps(plan)
+        stored.save()
 
     else:
-        schemas = list(Tenant.objects.all().values_list(
-            'schema_name', flat=True
-        ))
-        schemas.remove(get_public_schema_name())
+        poem_models.MetricsVersionsPlan.objects.create(
+            digest=digest, data=json.dumps(plan)
+        )
+
+    return plan
 
-        for schema in schemas:
-            with schema_context(schema):
-                try:
-                    token = MyAPIKey.objects.get(name='WEB-API')
-                    headers = {
-                        'Accept': 'application/json', 'x-api-key': token.token
-                    }
 
-                    response = requests.get(
-                        settings.WEBAPI_METRIC, headers=headers, timeout=180
+def update_metric_in_tenant_profiles(schema, old_name, new_name):
+    with schema_context(schema):
+        if not poem_models.MetricProfileIndex.objects.filter(
+                metric=old_name
+        ).exists():
+            return
+
+        try:
+            # profiles are changed, so they are always taken fresh
+            data = refresh_metric_profiles()
+
+            for profile in data:
+                flag = 0
+                new_services = []
+                for service in profile['services']:
+                    new_metrics = []
+                    if 'metrics' in service:
+                        for metric in service['metrics']:
+                            if metric == old_name:
+                                flag += 1
+                                new_metrics.append(new_name)
+                            else:
+                                new_metrics.append(metric)
+                    new_services.append({
+                        'service': service['service'],
+                        'metrics': new_metrics
+                    })
+
+                if flag > 0:
+                    new_data = {
+                        'id': profile['id'],
+                        'name': profile['name'],
+                        'description': profile['description'],
+                        'services': new_services
+                    }
+                    webapi_client.put(
+                        settings.WEBAPI_METRIC + '/' + profile['id'],
+                        data=json.dumps(new_data)
                     )
-                    response.raise_for_status()
-
-                    data = response.json()['data']
-
-                    for profile in data:
-                        flag = 0
-                        new_services = []
-                        for service in profile['services']:
-                            new_metrics = []
-                            if 'metrics' in service:
-                                for metric in service['metrics']:
-                                    if metric == old_name:
-                                        flag += 1
-                                        new_metrics.append(new_name)
-                                    else:
-                                        new_metrics.append(metric)
-                            new_services.append({
-                                'service': service['service'],
-                                'metrics': new_metrics
-                            })
-
-                        if flag > 0:
-                            new_data = {
-                                'id': profile['id'],
-                                'name': profile['name'],
-                                'description': profile['description'],
-                                'services': new_services
-                            }
-                            response = requests.put(
-                                settings.WEBAPI_METRIC + '/' + profile['id'],
-                                headers=headers,
-                                data=json.dumps(new_data)
-                            )
-                            response.raise_for_status()
-
-                except requests.exceptions.HTTPError as e:
-                    error_msgs.append(
-                        '{}: Error trying to update metric in metric profiles: '
-                        '{}.\nPlease update metric profiles manually.'.format(
-                            schema.upper(), e
-                        )
+                    invalidate_metric_profiles()
+                    poem_models.MetricProfileIndex.objects.filter(
+                        profile__apiid=profile['id'], metric=old_name
+                    ).update(metric=new_name)
+
+        except requests.exceptions.HTTPError as e:
+            return '{}: Error trying to update metric in metric profiles: ' \
+                   '{}.\nPlease update metric profiles manually.'.format(
+                        schema.upper(), e
                     )
-                    continue
 
-                except MyAPIKey.DoesNotExist:
-                    error_msgs.append(
-                        '{}: No "WEB-API" key in the DB!'
-                        '\nPlease update metric profiles manually.'.format(
-                            schema.upper()
-                        )
+        except MyAPIKey.DoesNotExist:
+            return '{}: No "WEB-API" key in the DB!' \
+                   '\nPlease update metric profiles manually.'.format(
+                        schema.upper()
                     )
-                    continue
+
+
+def update_metrics_in_profiles(old_name, new_name, schemas=None):
+    error_msgs = []
+    if old_name == new_name:
+        pass
+
+    else:
+        if schemas is None:
+            schemas = tenant_schemas()
+
+        results, errors = fan_out(
+            lambda schema: update_metric_in_tenant_profiles(
+                schema, old_name, new_name
+            ), schemas
+        )
+
+        for schema in schemas:
+            if results.get(schema):
+                error_msgs.append(results[schema])
+
+            if schema in errors:
+                error_msgs.append(
+                    '{}: Error trying to update metric in metric profiles: '
+                    '{}.\nPlease update metric profiles manually.'.format(
+                        schema.upper(), errors[schema]
+                    )
+                )
 
     return error_msgs
 
@@ -357,20 +626,13 @@ def update_metrics_in_profiles(old_name, new_name):
 def delete_metrics_from_profile(profile, metrics):
     try:
         profile_id = poem_models.MetricProfiles.objects.get(name=profile).apiid
-        token = MyAPIKey.objects.get(name='WEB-API')
-        headers = {
-            'Accept': 'application/json', 'x-api-key': token.token
-        }
         if settings.WEBAPI_METRIC.endswith('/'):
             url = settings.WEBAPI_METRIC + profile_id
 
         else:
             url = settings.WEBAPI_METRIC + '/' + profile_id
 
-        response = requests.get(url, headers=headers, timeout=180)
-        response.raise_for_status()
-
-        data = response.json()['data'][0]
+        data = webapi_client.get(url).json()['data'][0]
 
         for metric in metrics:
             for item in data['services']:
@@ -387,10 +649,11 @@ def delete_metrics_from_profile(profile, metrics):
             'services': data['services']
         }
 
-        response = requests.put(
-            url, headers=headers, data=json.dumps(send_data)
-        )
-        response.raise_for_status()
+        webapi_client.put(url, data=json.dumps(send_data))
+        invalidate_metric_profiles()
+        poem_models.MetricProfileIndex.objects.filter(
+            profile__apiid=profile_id, metric__in=metrics
+        ).delete()
 
     except MyAPIKey.DoesNotExist:
         raise Exception(
@@ -404,3 +667,119 @@ def delete_metrics_from_profile(profile, metrics):
 
     except requests.exceptions.HTTPError:
         raise
+
+
+def delete_metrics_from_profiles(profiles):
+    """
+    Removes metrics from metric profiles of the current tenant, given as dict
+    of lists of metrics keyed by profile name. Profiles are fetched from
+    WEB-API once, and each of them is sent back with one PUT. Returns dict of
+    exceptions keyed by name of profile which could not be changed.
+    """
+    try:
+        # whole profiles are sent back, so they are always taken fresh
+        fresh = dict(
+            (profile['name'], profile)
+            for profile in refresh_metric_profiles()
+        )
+
+    except MyAPIKey.DoesNotExist:
+        error = Exception(
+            'Error deleting metric from profile: API key not found.'
+        )
+        return dict((name, error) for name in profiles)
+
+    except requests.exceptions.HTTPError as e:
+        return dict((name, e) for name in profiles)
+
+    errors = dict()
+    changed = False
+    for name, metrics in profiles.items():
+        if name not in fresh:
+            errors[name] = Exception(
+                'Error deleting metric from profile: Profile not found.'
+            )
+            continue
+
+        data = fresh[name]
+        services = []
+        for item in data['services']:
+            if set(metrics).intersection(item.get('metrics', [])):
+                item = dict(item, metrics=[
+                    metric for metric in item['metrics']
+                    if metric not in metrics
+                ])
+                if not item['metrics']:
+                    continue
+
+            services.append(item)
+
+        send_data = {
+            'id': data['id'],
+            'name': data['name'],
+            'description': data['description'],
+            'services': services
+        }
+
+        try:
+            webapi_client.put(
+                settings.WEBAPI_METRIC.rstrip('/') + '/' + data['id'],
+                data=json.dumps(send_data)
+            )
+            changed = True
+            poem_models.MetricProfileIndex.objects.filter(
+                profile__name=name, metric__in=metrics
+            ).delete()
+
+        except MyAPIKey.DoesNotExist:
+            errors[name] = Exception(
+                'Error deleting metric from profile: API key not found.'
+            )
+
+        except requests.exceptions.HTTPError as e:
+            errors[name] = e
+
+    if changed:
+        invalidate_metric_profiles()
+
+    return errors
+
+
+def delete_metrics(names):
+    """
+    Deletes tenant's metrics with given names and their history, and returns
+    names of deleted metrics. Rows are deleted without being loaded, with
+    one statement per table, so changes otherwise made on post_delete of
+    each metric and history entry are made once for all of them.
+    """
+    deleted = dict(
+        poem_models.Metric.objects.filter(name__in=names).values_list(
+            'id', 'name'
+        )
+    )
+    if not deleted:
+        return []
+
+    ids = list(deleted.keys())
+
+    with transaction.atomic():
+        history = poem_models.TenantHistory.objects.filter(
+            object_id__in=[str(pk) for pk in ids],
+            content_type=ContentType.objects.get_for_model(poem_models.Metric)
+        )
+        history._raw_delete(history.db)
+
+        poem_models.Metric.tags.through.objects.filter(
+            metric_id__in=ids
+        ).delete()
+
+        metrics = poem_models.Metric.objects.filter(id__in=ids)
+        metrics._raw_delete(metrics.db)
+
+        poem_models.expire_metricconfig_snapshot()
+        admin_models.bump_content_version()
+        admin_models.update_tenant_statistics(
+            poem_models.Metric.objects.all()
+        )
+
+    return list(deleted.values())
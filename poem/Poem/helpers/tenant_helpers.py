@@ -0,0 +1,108 @@
+import logging
+import queue
+import threading
+
+from Poem.helpers.jobs import current_job, set_progress
+from Poem.tenants.models import Tenant
+from django.conf import settings
+from django.db import connection
+from tenant_schemas.utils import get_public_schema_name
+
+logger = logging.getLogger('POEM')
+
+
+def tenant_schemas():
+    schemas = list(Tenant.objects.all().values_list('schema_name', flat=True))
+    schemas.remove(get_public_schema_name())
+
+    return schemas
+
+
+class _Progress:
+    """
+    Counts schemas which are done and sets progress of the job fan_out() is
+    called from. Job is taken in the calling thread, since workers do not
+    know about it.
+    """
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.job_id = current_job()
+        self.lock = threading.Lock()
+
+    def step(self):
+        with self.lock:
+            self.done += 1
+            done = self.done
+
+        set_progress(done, self.total, job_id=self.job_id)
+
+
+def _run(func, schema, results, errors, progress):
+    try:
+        results[schema] = func(schema)
+
+    except Exception as e:
+        logger.error('%s: %s' % (schema.upper(), str(e)))
+        errors[schema] = e
+
+    progress.step()
+
+
+def _worker(func, schemas, results, errors, progress):
+    try:
+        while True:
+            try:
+                schema = schemas.get_nowait()
+
+            except queue.Empty:
+                break
+
+            _run(func, schema, results, errors, progress)
+
+    finally:
+        connection.close()
+
+
+def fan_out(func, schemas, workers=None):
+    """
+    Calls func(schema) for each of the schemas concurrently, in at most
+    TENANT_WORKERS threads, each of them with its own DB connection. Returns
+    dict of results and dict of exceptions raised by func, both keyed by
+    schema.
+
+    Work is done in the calling thread if there is only one schema, or if
+    caller is inside transaction, since other connections would not see its
+    uncommitted changes.
+    """
+    if workers is None:
+        workers = settings.TENANT_WORKERS
+
+    workers = min(workers, len(schemas))
+
+    results = dict()
+    errors = dict()
+    progress = _Progress(len(schemas))
+
+    if workers <= 1 or connection.in_atomic_block:
+        for schema in schemas:
+            _run(func, schema, results, errors, progress)
+
+        return results, errors
+
+    pending = queue.Queue()
+    for schema in schemas:
+        pending.put(schema)
+
+    threads = [
+        threading.Thread(
+            target=_worker, args=(func, pending, results, errors, progress)
+        ) for i in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return results, errors
@@ -0,0 +1,105 @@
+import datetime
+import json
+import logging
+import threading
+
+import requests
+from Poem.helpers import webapi_client
+from Poem.poem import models as poem_models
+from django.conf import settings
+from django.db import connection
+from tenant_schemas.utils import schema_context
+
+logger = logging.getLogger('POEM')
+
+METRIC_PROFILES = 'metric_profiles'
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def fetch_metric_profiles():
+    return webapi_client.get(settings.WEBAPI_METRIC).json()['data']
+
+
+def _store(resource, data):
+    poem_models.WebApiCache.objects.update_or_create(
+        resource=resource,
+        defaults={
+            'data': json.dumps(data),
+            'date_fetched': datetime.datetime.now()
+        }
+    )
+
+
+def refresh_metric_profiles():
+    data = fetch_metric_profiles()
+    _store(METRIC_PROFILES, data)
+
+    return data
+
+
+def _refresh_in_background(schema):
+    try:
+        with schema_context(schema):
+            refresh_metric_profiles()
+
+    except Exception as e:
+        logger.warning(
+            '%s: Unable to refresh cached metric profiles: %s' % (
+                schema.upper(), str(e)
+            )
+        )
+
+    finally:
+        connection.close()
+        with _refreshing_lock:
+            _refreshing.discard(schema)
+
+
+def _start_refresh(schema):
+    with _refreshing_lock:
+        if schema in _refreshing:
+            return
+
+        _refreshing.add(schema)
+
+    threading.Thread(
+        target=_refresh_in_background, args=(schema,), daemon=True
+    ).start()
+
+
+def get_metric_profiles():
+    """
+    Returns metric profiles of the current tenant. Profiles are fetched from
+    WEB-API only if they are not cached yet, or if cached data is older than
+    WEBAPI_CACHE_MAX_STALE. Data older than WEBAPI_CACHE_TTL is still
+    returned, while it is being refreshed in the background.
+    """
+    try:
+        cached = poem_models.WebApiCache.objects.get(resource=METRIC_PROFILES)
+
+    except poem_models.WebApiCache.DoesNotExist:
+        return refresh_metric_profiles()
+
+    age = (datetime.datetime.now() - cached.date_fetched).total_seconds()
+
+    if age > settings.WEBAPI_CACHE_MAX_STALE:
+        try:
+            return refresh_metric_profiles()
+
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(
+                '%s: Using stale metric profiles, WEB-API unavailable: %s' % (
+                    connection.schema_name.upper(), str(e)
+                )
+            )
+
+    elif age > settings.WEBAPI_CACHE_TTL:
+        _start_refresh(connection.schema_name)
+
+    return json.loads(cached.data)
+
+
+def invalidate_metric_profiles():
+    poem_models.WebApiCache.objects.filter(resource=METRIC_PROFILES).delete()
@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+
+import requests
+from Poem.api.models import MyAPIKey
+from django.conf import settings
+from django.db import connection
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger('POEM')
+
+# seconds for which WEB-API token of tenant is used without looking it up
+TOKEN_TTL = 300
+
+_local = threading.local()
+
+_tokens = dict()
+_tokens_lock = threading.Lock()
+
+_stats = dict()
+_stats_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns keep-alive session, so that connections to WEB-API are reused.
+    Sessions are not guaranteed to be thread-safe, so there is one per
+    thread of the process.
+    """
+    session = getattr(_local, 'session', None)
+
+    if session is None:
+        retry = Retry(
+            total=settings.WEBAPI_RETRIES,
+            backoff_factor=0.5,
+            status_forcelist=(502, 503, 504),
+            method_whitelist=frozenset(['GET', 'PUT']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Accept': 'application/json'})
+        _local.session = session
+
+    return session
+
+
+def _get_token():
+    """
+    Returns WEB-API token of the current tenant, and whether it has been
+    taken from the cache.
+    """
+    schema = connection.schema_name
+
+    with _tokens_lock:
+        if schema in _tokens:
+            token, fetched = _tokens[schema]
+            if time.monotonic() - fetched < TOKEN_TTL:
+                return token, True
+
+    token = MyAPIKey.objects.get(name='WEB-API').token
+
+    with _tokens_lock:
+        _tokens[schema] = (token, time.monotonic())
+
+    return token, False
+
+
+def get_token():
+    return _get_token()[0]
+
+
+def clear_token_cache(schema=None):
+    with _tokens_lock:
+        if schema:
+            _tokens.pop(schema, None)
+
+        else:
+            _tokens.clear()
+
+
+@receiver(post_save, sender=MyAPIKey)
+@receiver(post_delete, sender=MyAPIKey)
+def webapi_key_changed(sender, instance, **kwargs):
+    if instance.name == 'WEB-API':
+        clear_token_cache(connection.schema_name)
+
+
+def _record(method, elapsed, failed):
+    with _stats_lock:
+        stats = _stats.setdefault(
+            method, {'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0}
+        )
+        stats['count'] += 1
+        stats['total'] += elapsed
+        stats['max'] = max(stats['max'], elapsed)
+        if failed:
+            stats['errors'] += 1
+
+
+def get_stats():
+    """
+    Returns number of calls, failed calls, and total and max latency in
+    seconds of WEB-API calls made by this process, per HTTP method.
+    """
+    with _stats_lock:
+        return dict((key, dict(value)) for key, value in _stats.items())
+
+
+def _call(method, url, timeout=None, **kwargs):
+    session = get_session()
+    send = session.get if method == 'GET' else session.put
+
+    if timeout is None:
+        timeout = settings.WEBAPI_TIMEOUT
+
+    token, cached = _get_token()
+
+    while True:
+        headers = {'Accept': 'application/json', 'x-api-key': token}
+
+        start = time.monotonic()
+        try:
+            response = send(url, headers=headers, timeout=timeout, **kwargs)
+
+        except requests.exceptions.RequestException:
+            _record(method, time.monotonic() - start, True)
+            raise
+
+        elapsed = time.monotonic() - start
+        _record(method, elapsed, response.status_code >= 400)
+        logger.debug(
+            'WEB-API %s %s: %s (%.3f s)' % (
+                method, url, response.status_code, elapsed
+            )
+        )
+
+        # cached token might have been changed by another process in the
+        # meantime, so it is looked up once again
+        if response.status_code == 401 and cached:
+            clear_token_cache(connection.schema_name)
+            token, cached = _get_token()
+            continue
+
+        break
+
+    response.raise_for_status()
+
+    return response
+
+
+def get(url, timeout=None):
+    return _call('GET', url, timeout=timeout)
+
+
+def put(url, data, timeout=None):
+    return _call('PUT', url, timeout=timeout, data=data)
@@ -0,0 +1,122 @@
+import datetime
+import logging
+import threading
+
+from Poem.api.internal_views.utils import sync_webapi
+from Poem.poem import models as poem_models
+from django.conf import settings
+from django.db import connection
+from tenant_schemas.utils import schema_context
+
+logger = logging.getLogger('POEM')
+
+METRIC_PROFILES = 'metric_profiles'
+AGGREGATION_PROFILES = 'aggregation_profiles'
+THRESHOLDS_PROFILES = 'thresholds_profiles'
+REPORTS = 'reports'
+
+# resource: (name of setting holding WEB-API URL, model of local table)
+WEBAPI_RESOURCES = {
+    METRIC_PROFILES: ('WEBAPI_METRIC', 'MetricProfiles'),
+    AGGREGATION_PROFILES: ('WEBAPI_AGGREGATION', 'Aggregation'),
+    THRESHOLDS_PROFILES: ('WEBAPI_THRESHOLDS', 'ThresholdsProfiles'),
+    REPORTS: ('WEBAPI_REPORTS', 'Reports')
+}
+
+_syncing = set()
+_syncing_lock = threading.Lock()
+
+
+def sync_resource(resource):
+    setting, model = WEBAPI_RESOURCES[resource]
+
+    sync_webapi(getattr(settings, setting), getattr(poem_models, model))
+
+    poem_models.WebApiSync.objects.update_or_create(
+        resource=resource,
+        defaults={'date_synced': datetime.datetime.now()}
+    )
+
+
+def sync_all(resources=None):
+    """
+    Syncs given (by default all) resources of the current tenant. Returns list
+    of error messages for resources which could not be synced.
+    """
+    errors = []
+    for resource in resources if resources else WEBAPI_RESOURCES.keys():
+        try:
+            sync_resource(resource)
+
+        except Exception as e:
+            errors.append(
+                '{}: Unable to sync {}: {}'.format(
+                    connection.schema_name.upper(), resource, str(e)
+                )
+            )
+
+    return errors
+
+
+def get_last_synced(resource):
+    try:
+        return poem_models.WebApiSync.objects.get(
+            resource=resource
+        ).date_synced
+
+    except poem_models.WebApiSync.DoesNotExist:
+        return None
+
+
+def _sync_in_background(schema, resource):
+    try:
+        with schema_context(schema):
+            sync_resource(resource)
+
+    except Exception as e:
+        logger.warning(
+            '%s: Unable to sync %s: %s' % (schema.upper(), resource, str(e))
+        )
+
+    finally:
+        connection.close()
+        with _syncing_lock:
+            _syncing.discard((schema, resource))
+
+
+def _start_sync(schema, resource):
+    with _syncing_lock:
+        if (schema, resource) in _syncing:
+            return
+
+        _syncing.add((schema, resource))
+
+    threading.Thread(
+        target=_sync_in_background, args=(schema, resource), daemon=True
+    ).start()
+
+
+def sync_forced(request):
+    """
+    Returns True if view is asked to sync with ?sync=true.
+    """
+    return request.query_params.get('sync') in ['true', 'True', '1']
+
+
+def request_sync(resource, force=False):
+    """
+    Called by views before reading local tables. If force is set, or the
+    resource has never been synced, it is synced right away and errors are
+    raised to the caller. Otherwise, if resource has not been synced in the
+    last WEBAPI_SYNC_INTERVAL seconds, sync is started in the background, and
+    views carry on with local data.
+    """
+    last_synced = None if force else get_last_synced(resource)
+
+    if not last_synced:
+        sync_resource(resource)
+
+    elif (
+            datetime.datetime.now() - last_synced
+    ).total_seconds() > settings.WEBAPI_SYNC_INTERVAL:
+        _start_sync(connection.schema_name, resource)
@@ -1,15 +1,28 @@
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+import copy
+import functools
 import json
+import operator
 
-from Poem.poem.models import Metric
-from Poem.poem_super_admin import models as admin_models
-from Poem.tenants.models import Tenant
+from Poem.helpers.json_patch import make_patch, apply_patch
+from Poem.poem_super_admin.models import bump_content_version
 
-from tenant_schemas.utils import schema_context, get_public_schema_name
+
+class MissingKeyframe(Exception):
+    """
+    Raised if version stored as delta has no preceding keyframe, e.g. if it
+    was deleted by hand, so its complete data cannot be reconstructed.
+    """
+    def __init__(self, version):
+        super().__init__(
+            'Version {} of {} is stored as delta, but there is no preceding '
+            'complete version.'.format(version.id, version.object_repr)
+        )
 
 
 class TenantHistoryManager(models.Manager):
@@ -21,7 +34,8 @@ class TenantHistory(models.Model):
     """
     Tenant history model is going to store versions of tenant specific
     models; unlike History model which stores versions in public Postgres
-    schema.
+    schema. Version marked as delta stores JSON patch against the previous
+    version of the same object instead of complete serialized data.
     """
     object_id = models.CharField(max_length=191)
     serialized_data = models.TextField()
@@ -30,6 +44,7 @@ class TenantHistory(models.Model):
     date_created = models.DateTimeField(auto_now_add=True)
     comment = models.TextField(blank=True)
     user = models.CharField(max_length=32)
+    delta = models.BooleanField(default=False)
 
     objects = TenantHistoryManager()
 
@@ -39,30 +54,238 @@ class TenantHistory(models.Model):
     def natural_key(self):
         return (self.object_repr,)
 
+    def get_serialized_data(self):
+        """
+        Returns complete serialized data of the version, reconstructed from
+        the preceding keyframe if the version is stored as delta.
+        """
+        if not self.delta:
+            return self.serialized_data
 
-@receiver(post_save, sender=admin_models.Package)
-def update_metric_history(sender, instance, created, **kwargs):
-    if not created:
-        schemas = list(
-            Tenant.objects.all().values_list('schema_name', flat=True)
+        versions = TenantHistory.objects.filter(
+            object_id=self.object_id, content_type_id=self.content_type_id
         )
-        schemas.remove(get_public_schema_name())
-        probes = admin_models.ProbeHistory.objects.filter(
-            package=instance
-        )
-        for schema in schemas:
-            with schema_context(schema):
-                for probe in probes:
-                    metrics = Metric.objects.filter(probekey=probe)
-                    for metric in metrics:
-                        vers = TenantHistory.objects.filter(
-                            object_id=metric.id
-                        ).order_by('-date_created')
-
-                        for ver in vers:
-                            serialized_data = json.loads(ver.serialized_data)
-                            serialized_data[0]['fields']['probekey'] = [
-                                probe.name, probe.package.version
-                            ]
-                            ver.serialized_data = json.dumps(serialized_data)
-                            ver.save()
+        keyframe = versions.filter(id__lt=self.id, delta=False).order_by(
+            '-id'
+        ).values_list('id', flat=True).first()
+        if keyframe is None:
+            raise MissingKeyframe(self)
+
+        chain = versions.filter(
+            id__gte=keyframe, id__lte=self.id
+        ).order_by('-id')
+
+        return json.dumps(_snapshot(list(chain)))
+
+
+def _keyframe_interval():
+    return max(settings.HISTORY_KEYFRAME_INTERVAL, 1)
+
+
+def _snapshot(chain):
+    # chain holds versions from the newest one to its keyframe
+    if chain[-1].delta:
+        raise MissingKeyframe(chain[0])
+
+    data = json.loads(chain[-1].serialized_data)
+    for version in reversed(chain[:-1]):
+        data = apply_patch(data, json.loads(version.serialized_data))
+
+    return data
+
+
+def latest_versions(object_id, content_type):
+    """
+    Returns the newest versions of the object, from the latest one to the
+    keyframe it is based on.
+    """
+    versions = TenantHistory.objects.filter(
+        object_id=object_id, content_type=content_type
+    ).order_by('-id')
+
+    chain = []
+    batch = _keyframe_interval()
+    while True:
+        fetched = list(versions[len(chain):len(chain) + batch])
+        for version in fetched:
+            chain.append(version)
+            if not version.delta:
+                return chain
+
+        if len(fetched) < batch:
+            return chain
+
+
+def latest_versions_of(object_ids, content_type):
+    """
+    Returns latest_versions() of many objects, fetched together, in a
+    dictionary keyed by object id.
+    """
+    versions = TenantHistory.objects.filter(content_type=content_type)
+    keyframes = versions.filter(
+        object_id__in=[str(object_id) for object_id in object_ids],
+        delta=False
+    ).values('object_id').annotate(keyframe=models.Max('id')).values_list(
+        'object_id', 'keyframe'
+    )
+
+    chains = dict()
+    if keyframes:
+        condition = functools.reduce(operator.or_, [
+            models.Q(object_id=object_id, id__gte=keyframe)
+            for object_id, keyframe in keyframes
+        ])
+        for version in versions.filter(condition).order_by(
+                'object_id', '-id'
+        ):
+            chains.setdefault(version.object_id, []).append(version)
+
+    return chains
+
+
+def latest_serialized_data(chain):
+    """
+    Returns complete serialized data of the latest version in chain returned
+    by latest_versions(), or None if there are no versions.
+    """
+    if not chain:
+        return None
+
+    elif not chain[0].delta:
+        return chain[0].serialized_data
+
+    else:
+        return json.dumps(_snapshot(chain))
+
+
+def encode_version(version, chain):
+    """
+    Stores unsaved version as delta against the latest version in chain
+    returned by latest_versions(), unless keyframe is due.
+    """
+    if chain and len(chain) < _keyframe_interval():
+        version.serialized_data = json.dumps(make_patch(
+            json.loads(latest_serialized_data(chain)),
+            json.loads(version.serialized_data)
+        ))
+        version.delta = True
+
+    return version
+
+
+def iterate_serialized_data(versions):
+    """
+    Yields version and its complete serialized data (deserialized) for given
+    versions of the same object ordered from the newest to the oldest one.
+    Deltas are kept only until the keyframe they are based on is reached.
+    Raises MissingKeyframe if the oldest versions are deltas.
+    """
+    pending = []
+    for version in versions:
+        if version.delta:
+            pending.append(version)
+            continue
+
+        data = json.loads(version.serialized_data)
+        snapshots = [(version, data)]
+        for delta in reversed(pending):
+            data = apply_patch(
+                copy.deepcopy(data), json.loads(delta.serialized_data)
+            )
+            snapshots.append((delta, data))
+
+        pending = []
+        for snapshot in reversed(snapshots):
+            yield snapshot
+
+    if pending:
+        raise MissingKeyframe(pending[0])
+
+
+def set_serialized_data(version, serialized_data):
+    """
+    Replaces serialized data of stored version, which is saved as keyframe.
+    The following version is converted to keyframe if it was a delta against
+    the old data.
+    """
+    following = TenantHistory.objects.filter(
+        object_id=version.object_id, content_type_id=version.content_type_id,
+        id__gt=version.id
+    ).order_by('id').first()
+
+    if following and following.delta:
+        following.serialized_data = following.get_serialized_data()
+        following.delta = False
+        following.save()
+
+    version.serialized_data = serialized_data
+    version.delta = False
+    version.save()
+
+
+def encode_history(batch_size=100):
+    """
+    Converts all versions stored in the current schema to the configured
+    keyframe interval: every interval-th version of each object is stored
+    complete, and the ones in between as deltas. Returns number of converted
+    versions.
+    """
+    interval = _keyframe_interval()
+    objects = TenantHistory.objects.order_by().values_list(
+        'content_type_id', 'object_id'
+    ).distinct()
+
+    converted = 0
+    changed = []
+    for content_type_id, object_id in objects:
+        versions = TenantHistory.objects.filter(
+            content_type_id=content_type_id, object_id=object_id
+        ).order_by('id')
+
+        data = None
+        for i, version in enumerate(versions.iterator()):
+            previous = data
+            if version.delta:
+                data = apply_patch(
+                    copy.deepcopy(previous),
+                    json.loads(version.serialized_data)
+                )
+
+            else:
+                data = json.loads(version.serialized_data)
+
+            # delta is always made against the previous version, so only
+            # versions which change the kind of storage are converted
+            keyframe = i % interval == 0
+            if version.delta != keyframe:
+                continue
+
+            if keyframe:
+                version.serialized_data = json.dumps(data)
+                version.delta = False
+
+            else:
+                version.serialized_data = json.dumps(
+                    make_patch(previous, data)
+                )
+                version.delta = True
+
+            changed.append(version)
+            if len(changed) >= batch_size:
+                TenantHistory.objects.bulk_update(
+                    changed, ['serialized_data', 'delta']
+                )
+                converted += len(changed)
+                changed = []
+
+    if changed:
+        TenantHistory.objects.bulk_update(changed, ['serialized_data', 'delta'])
+        converted += len(changed)
+
+    return converted
+
+
+@receiver(post_save, sender=TenantHistory)
+@receiver(post_delete, sender=TenantHistory)
+def tenant_history_changed(sender, **kwargs):
+    bump_content_version()
@@ -0,0 +1,15 @@
+from django.db import models
+
+
+class MetricsVersionsPlan(models.Model):
+    """
+    Changes of metrics found by the latest dry run of switching to another
+    package version. There is at most one row per tenant schema. Digest is
+    made of package and content versions of tenant and public schema, so the
+    plan is applied as it is if nothing has changed since the dry run.
+    """
+    digest = models.CharField(max_length=64)
+    data = models.TextField()
+
+    class Meta:
+        app_label = 'poem'
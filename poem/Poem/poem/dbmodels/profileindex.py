@@ -0,0 +1,74 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+import json
+
+from Poem.poem.dbmodels.history import TenantHistory, latest_versions_of, \
+    latest_serialized_data
+from Poem.poem.dbmodels.metricprofiles import MetricProfiles
+
+
+class MetricProfileIndex(models.Model):
+    """
+    Metrics of metric profiles, as found in the latest stored version of each
+    profile, so that profiles using a metric are found without fetching all
+    the profiles from WEB-API.
+    """
+    metric = models.CharField(max_length=128, db_index=True)
+    service = models.CharField(max_length=128)
+    profile = models.ForeignKey(MetricProfiles, on_delete=models.CASCADE)
+
+    class Meta:
+        app_label = 'poem'
+
+    def __str__(self):
+        return u'%s (%s, %s)' % (self.metric, self.service, self.profile_id)
+
+
+def set_metric_profile_index(metricinstances):
+    """
+    Replaces index entries of metric profiles with given ones, given as dict
+    of lists of [service, metric] pairs keyed by profile id.
+    """
+    entries = [
+        MetricProfileIndex(metric=metric, service=service, profile_id=pk)
+        for pk, items in metricinstances.items() for service, metric in items
+    ]
+
+    with transaction.atomic():
+        MetricProfileIndex.objects.filter(
+            profile_id__in=list(metricinstances.keys())
+        ).delete()
+        MetricProfileIndex.objects.bulk_create(entries)
+
+
+def update_metric_profile_index(profile_ids=None):
+    """
+    Rebuilds index entries of metric profiles with given ids, or of all the
+    profiles, from their latest stored versions.
+    """
+    profiles = MetricProfiles.objects.all()
+    if profile_ids is not None:
+        profiles = profiles.filter(id__in=profile_ids)
+
+    metricinstances = dict(
+        (pk, []) for pk in profiles.values_list('id', flat=True)
+    )
+    chains = latest_versions_of(
+        metricinstances.keys(),
+        ContentType.objects.get_for_model(MetricProfiles)
+    )
+    for object_id, chain in chains.items():
+        fields = json.loads(latest_serialized_data(chain))[0]['fields']
+        metricinstances[int(object_id)] = fields.get('metricinstances', [])
+
+    set_metric_profile_index(metricinstances)
+
+
+@receiver(post_save, sender=TenantHistory)
+def profile_history_saved(sender, instance, **kwargs):
+    if instance.content_type_id == \
+            ContentType.objects.get_for_model(MetricProfiles).id:
+        update_metric_profile_index([instance.object_id])
@@ -0,0 +1,82 @@
+from django.db import models, connection
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete, \
+    m2m_changed
+from django.dispatch import receiver
+
+from Poem.poem.models import Metric
+from Poem.poem_super_admin import models as admin_models
+from Poem.poem_super_admin.models import bump_content_version, \
+    remember_probekey, count_saved, count_deleted
+from Poem.tenants.models import Tenant
+
+from tenant_schemas.utils import schema_context, get_public_schema_name
+
+
+class MetricConfigSnapshot(models.Model):
+    """
+    Pre-serialized metric configuration document served by /api/v2/metrics.
+    There is at most one row per tenant schema. Every change of metrics (or of
+    public data referenced by metrics) bumps generation and clears the
+    document, so it is rebuilt on the next request.
+    """
+    generation = models.PositiveIntegerField(default=0)
+    etag = models.CharField(max_length=64, blank=True, default='')
+    data = models.TextField(blank=True, default='')
+
+    class Meta:
+        app_label = 'poem'
+
+
+def expire_metricconfig_snapshot(all_schemas=False):
+    if all_schemas:
+        schemas = list(
+            Tenant.objects.all().values_list('schema_name', flat=True)
+        )
+        schemas.remove(get_public_schema_name())
+
+    elif connection.schema_name != get_public_schema_name():
+        schemas = [connection.schema_name]
+
+    else:
+        schemas = []
+
+    for schema in schemas:
+        with schema_context(schema):
+            MetricConfigSnapshot.objects.update(
+                generation=F('generation') + 1, etag='', data=''
+            )
+
+
+@receiver(pre_save, sender=Metric)
+def metric_saving(sender, instance, **kwargs):
+    remember_probekey(Metric, instance)
+
+
+@receiver(post_save, sender=Metric)
+def metric_saved(sender, instance, created, **kwargs):
+    expire_metricconfig_snapshot()
+    bump_content_version()
+    count_saved(Metric, instance, created)
+
+
+@receiver(post_delete, sender=Metric)
+def metric_deleted(sender, instance, **kwargs):
+    expire_metricconfig_snapshot()
+    bump_content_version()
+    count_deleted(Metric, instance)
+
+
+@receiver(m2m_changed, sender=Metric.tags.through)
+def metric_tags_changed(sender, action, **kwargs):
+    if action in ['post_add', 'post_remove', 'post_clear']:
+        expire_metricconfig_snapshot()
+        bump_content_version()
+
+
+@receiver(post_save, sender=admin_models.MetricTags)
+@receiver(post_delete, sender=admin_models.MetricTags)
+@receiver(post_save, sender=admin_models.ProbeHistory)
+@receiver(post_delete, sender=admin_models.ProbeHistory)
+def metric_dependency_changed(sender, **kwargs):
+    expire_metricconfig_snapshot(all_schemas=True)
@@ -0,0 +1,32 @@
+from django.db import models
+
+
+class WebApiCache(models.Model):
+    """
+    Local copy of data fetched from WEB-API, so that POEM does not need to
+    wait for WEB-API on every request which needs e.g. metric profiles.
+    """
+    resource = models.CharField(max_length=128, unique=True)
+    data = models.TextField()
+    date_fetched = models.DateTimeField()
+
+    class Meta:
+        app_label = 'poem'
+
+    def __str__(self):
+        return u'%s' % self.resource
+
+
+class WebApiSync(models.Model):
+    """
+    Time of the last successful sync of resource fetched from WEB-API into
+    local tables (profiles, reports).
+    """
+    resource = models.CharField(max_length=128, unique=True)
+    date_synced = models.DateTimeField()
+
+    class Meta:
+        app_label = 'poem'
+
+    def __str__(self):
+        return u'%s (%s)' % (self.resource, self.date_synced)
@@ -0,0 +1,24 @@
+from Poem.poem.models import encode_history
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from tenant_schemas.utils import get_public_schema_name
+
+
+class Command(BaseCommand):
+    help = """Convert tenant's history to the storage set by
+              HistoryKeyframeInterval: every given number of versions is
+              stored complete, and the versions in between as deltas."""
+
+    def handle(self, *args, **kwargs):
+        if connection.schema_name == get_public_schema_name():
+            self.stderr.write('Public schema has no tenant history.')
+            return
+
+        converted = encode_history()
+
+        self.stdout.write(
+            'Converted {} version(s) with keyframe interval {}.'.format(
+                converted, settings.HISTORY_KEYFRAME_INTERVAL
+            )
+        )
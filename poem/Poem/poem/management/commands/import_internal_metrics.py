@@ -13,10 +13,11 @@ class Command(BaseCommand):
 
     def handle(self, *args, **kwargs):
         tenant = connection.tenant
-        internal_metrics = [
-            mt.name for mt in admin_models.MetricTemplate.objects.all()
-            if 'internal' in [tag.name for tag in mt.tags.all()]
-        ]
+        internal_metrics = list(
+            admin_models.MetricTemplate.objects.filter(
+                tags__name='internal'
+            ).order_by('id').values_list('name', flat=True)
+        )
         if len(internal_metrics) > 0:
             try:
                 user = get_user_model().objects.get(
@@ -0,0 +1,20 @@
+from Poem.api.internal_views.utils import get_tenant_resources
+from Poem.tenants.models import Tenant
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = """Recount number of metrics and probes of all the tenants shown
+              in the list of tenants."""
+
+    def handle(self, *args, **kwargs):
+        schemas = Tenant.objects.order_by('schema_name').values_list(
+            'schema_name', flat=True
+        )
+
+        for schema in schemas:
+            get_tenant_resources(schema)
+
+        self.stdout.write(
+            'Rebuilt statistics of {} tenant(s).'.format(len(schemas))
+        )
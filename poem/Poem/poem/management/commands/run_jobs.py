@@ -0,0 +1,26 @@
+import time
+
+import Poem.api.views_internal  # noqa: F401 -- registers background jobs
+from Poem.helpers.jobs import run_pending_jobs
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = """Run queued background jobs of all tenants. Without --loop,
+              command exits once there are no pending jobs left."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true')
+        parser.add_argument('--sleep', type=int, default=5)
+
+    def handle(self, *args, **kwargs):
+        while True:
+            count = run_pending_jobs()
+
+            if count:
+                self.stdout.write('Ran {} job(s).'.format(count))
+
+            if not kwargs['loop']:
+                break
+
+            time.sleep(kwargs['sleep'])
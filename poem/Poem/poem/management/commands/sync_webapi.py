@@ -0,0 +1,27 @@
+from Poem.helpers.webapi_sync import sync_all, WEBAPI_RESOURCES
+from django.core.management.base import BaseCommand
+from django.db import connection
+from tenant_schemas.utils import get_public_schema_name
+
+
+class Command(BaseCommand):
+    help = """Sync tenant's profiles and reports with WEB-API. If no resource
+              is given, all of them are synced."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resource', nargs='*', choices=sorted(WEBAPI_RESOURCES.keys())
+        )
+
+    def handle(self, *args, **kwargs):
+        if connection.schema_name == get_public_schema_name():
+            self.stderr.write('Public schema is not synced with WEB-API.')
+            return
+
+        errors = sync_all(kwargs['resource'])
+
+        for error in errors:
+            self.stderr.write(error)
+
+        if not errors:
+            self.stdout.write('Successfully synced with WEB-API.')
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.19 on 2021-06-21 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poem', '0019_userprofile_groupsofreports'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricConfigSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.PositiveIntegerField(default=0)),
+                ('etag', models.CharField(blank=True, default='', max_length=64)),
+                ('data', models.TextField(blank=True, default='')),
+            ],
+        ),
+    ]
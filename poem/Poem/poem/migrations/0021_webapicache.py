@@ -0,0 +1,22 @@
+# Generated by Django 2.2.19 on 2021-06-23 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poem', '0020_metricconfigsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebApiCache',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=128, unique=True)),
+                ('data', models.TextField()),
+                ('date_fetched', models.DateTimeField()),
+            ],
+        ),
+    ]
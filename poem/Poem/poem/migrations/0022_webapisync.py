@@ -0,0 +1,21 @@
+# Generated by Django 2.2.19 on 2021-06-24 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poem', '0021_webapicache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebApiSync',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=128, unique=True)),
+                ('date_synced', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.19 on 2021-06-30 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poem', '0022_webapisync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenanthistory',
+            name='delta',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 2.2.19 on 2021-07-02 10:27
+
+from django.db import migrations
+
+import copy
+import json
+
+
+def _convert_history(apps, convert):
+    from Poem.helpers.json_patch import make_patch, apply_patch
+
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TenantHistory = apps.get_model('poem', 'TenantHistory')
+
+    ct = ContentType.objects.filter(app_label='poem', model='metric').first()
+    if not ct:
+        return
+
+    versions = TenantHistory.objects.filter(content_type=ct).order_by(
+        'object_id', 'id'
+    )
+
+    changed = []
+    object_id = None
+    for version in versions.iterator():
+        if version.object_id != object_id:
+            object_id = version.object_id
+            data = None
+            converted = None
+
+        stored = json.loads(version.serialized_data)
+        if version.delta:
+            data = apply_patch(data, stored)
+
+        else:
+            data = stored
+
+        previous = converted
+        converted = copy.deepcopy(data)
+        fields = converted[0]['fields']
+        fields['probekey'] = convert(fields.get('probekey'))
+
+        # deltas are made again from converted complete versions
+        if version.delta:
+            new = make_patch(previous, converted)
+
+        else:
+            new = converted
+
+        if new != stored:
+            version.serialized_data = json.dumps(new)
+            changed.append(version)
+
+        if len(changed) >= 100:
+            TenantHistory.objects.bulk_update(changed, ['serialized_data'])
+            changed = []
+
+    if changed:
+        TenantHistory.objects.bulk_update(changed, ['serialized_data'])
+
+
+def _probe_versions(apps):
+    ProbeHistory = apps.get_model('poem_super_admin', 'ProbeHistory')
+
+    return ProbeHistory.objects.values_list('id', 'name', 'package__version')
+
+
+def probekey_to_id(apps, schema_editor):
+    ids = dict(
+        ((name, version), id) for id, name, version in _probe_versions(apps)
+    )
+
+    # probe versions which no longer exist are left with their names
+    _convert_history(
+        apps, lambda value: [ids[tuple(value)]] + value
+        if value and len(value) == 2 and tuple(value) in ids else value
+    )
+
+
+def probekey_to_natural_key(apps, schema_editor):
+    keys = dict(
+        (id, [name, version]) for id, name, version in _probe_versions(apps)
+    )
+
+    _convert_history(
+        apps, lambda value: keys.get(value[0], value[1:])
+        if value and len(value) == 3 else value
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('poem_super_admin', '0027_metrictemplateimportindex'),
+        ('poem', '0023_tenanthistory_delta'),
+    ]
+
+    operations = [
+        migrations.RunPython(probekey_to_id, probekey_to_natural_key),
+    ]
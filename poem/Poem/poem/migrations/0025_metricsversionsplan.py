@@ -0,0 +1,21 @@
+# Generated by Django 2.2.19 on 2021-07-06 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poem', '0024_tenanthistory_probekey_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricsVersionsPlan',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64)),
+                ('data', models.TextField()),
+            ],
+        ),
+    ]
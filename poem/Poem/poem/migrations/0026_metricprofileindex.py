@@ -0,0 +1,72 @@
+# Generated by Django 2.2.19 on 2021-07-08 09:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+import json
+
+
+def build_index(apps, schema_editor):
+    from Poem.helpers.json_patch import apply_patch
+
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TenantHistory = apps.get_model('poem', 'TenantHistory')
+    MetricProfiles = apps.get_model('poem', 'MetricProfiles')
+    MetricProfileIndex = apps.get_model('poem', 'MetricProfileIndex')
+
+    ct = ContentType.objects.filter(
+        app_label='poem', model='metricprofiles'
+    ).first()
+    if not ct:
+        return
+
+    profiles = set(
+        str(pk) for pk in MetricProfiles.objects.values_list('id', flat=True)
+    )
+
+    latest = dict()
+    versions = TenantHistory.objects.filter(content_type=ct).order_by(
+        'object_id', 'id'
+    )
+    for version in versions.iterator():
+        if version.object_id not in profiles:
+            continue
+
+        stored = json.loads(version.serialized_data)
+        if version.delta:
+            latest[version.object_id] = apply_patch(
+                latest.get(version.object_id), stored
+            )
+
+        else:
+            latest[version.object_id] = stored
+
+    entries = []
+    for object_id, data in latest.items():
+        for service, metric in data[0]['fields'].get('metricinstances', []):
+            entries.append(MetricProfileIndex(
+                metric=metric, service=service, profile_id=int(object_id)
+            ))
+
+    MetricProfileIndex.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('poem', '0025_metricsversionsplan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricProfileIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(db_index=True, max_length=128)),
+                ('service', models.CharField(max_length=128)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='poem.MetricProfiles')),
+            ],
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
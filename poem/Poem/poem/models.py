@@ -4,5 +4,9 @@ from Poem.poem.dbmodels.aggregations import *
 from Poem.poem.dbmodels.metricprofiles import *
 from Poem.poem.dbmodels.user import *
 from Poem.poem.dbmodels.history import *
+from Poem.poem.dbmodels.profileindex import *
 from Poem.poem.dbmodels.thresholdsprofiles import *
 from Poem.poem.dbmodels.reports import *
+from Poem.poem.dbmodels.snapshots import *
+from Poem.poem.dbmodels.metricsversions import *
+from Poem.poem.dbmodels.webapi import *
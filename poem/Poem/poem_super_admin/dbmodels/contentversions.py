@@ -0,0 +1,97 @@
+import datetime
+
+from django.db import models, connection
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from Poem.poem_super_admin.models import MetricTemplate, \
+    MetricTemplateHistory, MetricTags, Probe, ProbeHistory, Package, YumRepo
+
+from tenant_schemas.utils import get_public_schema_name
+
+
+class ContentVersion(models.Model):
+    """
+    Per schema change counter used for conditional GET on public API. It is
+    stored in public schema, so tenant's and public counter are fetched in
+    one query.
+    """
+    schema_name = models.CharField(max_length=63, unique=True)
+    version = models.BigIntegerField(default=0)
+    date_modified = models.DateTimeField()
+
+    class Meta:
+        app_label = 'poem_super_admin'
+
+    def __str__(self):
+        return u'%s (%s)' % (self.schema_name, self.version)
+
+
+def bump_content_version(schema_name=None):
+    if not schema_name:
+        schema_name = connection.schema_name
+
+    now = datetime.datetime.now()
+    updated = ContentVersion.objects.filter(schema_name=schema_name).update(
+        version=F('version') + 1, date_modified=now
+    )
+
+    if not updated:
+        ContentVersion.objects.get_or_create(
+            schema_name=schema_name,
+            defaults={'version': 1, 'date_modified': now}
+        )
+
+
+def get_content_version(schema_name):
+    """
+    Returns version string combining tenant and public counter, and the time
+    of the latest change, or None if nothing has been recorded yet.
+    """
+    versions = dict(
+        (item.schema_name, item) for item in ContentVersion.objects.filter(
+            schema_name__in=[schema_name, get_public_schema_name()]
+        )
+    )
+
+    version = '{}.{}'.format(
+        versions[schema_name].version if schema_name in versions else 0,
+        versions[get_public_schema_name()].version
+        if get_public_schema_name() in versions else 0
+    )
+
+    if versions:
+        last_modified = max(
+            [item.date_modified for item in versions.values()]
+        )
+
+    else:
+        last_modified = None
+
+    return version, last_modified
+
+
+@receiver(post_save, sender=MetricTemplate)
+@receiver(post_delete, sender=MetricTemplate)
+@receiver(post_save, sender=MetricTemplateHistory)
+@receiver(post_delete, sender=MetricTemplateHistory)
+@receiver(post_save, sender=MetricTags)
+@receiver(post_delete, sender=MetricTags)
+@receiver(post_save, sender=Probe)
+@receiver(post_delete, sender=Probe)
+@receiver(post_save, sender=ProbeHistory)
+@receiver(post_delete, sender=ProbeHistory)
+@receiver(post_save, sender=Package)
+@receiver(post_delete, sender=Package)
+@receiver(post_save, sender=YumRepo)
+@receiver(post_delete, sender=YumRepo)
+def public_data_changed(sender, **kwargs):
+    bump_content_version(get_public_schema_name())
+
+
+@receiver(m2m_changed, sender=Package.repos.through)
+@receiver(m2m_changed, sender=MetricTemplate.tags.through)
+def public_relations_changed(sender, action, **kwargs):
+    if action in ['post_add', 'post_remove', 'post_clear']:
+        bump_content_version(get_public_schema_name())
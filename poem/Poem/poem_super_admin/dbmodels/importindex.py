@@ -0,0 +1,158 @@
+from django.db import models
+from django.db.models import Prefetch
+from django.db.models.signals import post_save, post_delete, \
+    pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from Poem.poem_super_admin.models import MetricTemplate, \
+    MetricTemplateHistory, OSTag, ProbeHistory, Package, YumRepo
+
+
+class MetricTemplateImportIndex(models.Model):
+    """
+    Newest probe version of metric template available for each OS tag, as
+    shown to tenants importing metric templates. Entries are derived from
+    metric template history, and rebuilt on changes of history, probe
+    versions and package repos.
+    """
+    metrictemplate = models.ForeignKey(
+        MetricTemplate, on_delete=models.CASCADE
+    )
+    ostag = models.ForeignKey(OSTag, on_delete=models.CASCADE)
+    probekey = models.ForeignKey(ProbeHistory, on_delete=models.CASCADE)
+
+    class Meta:
+        app_label = 'poem_super_admin'
+        unique_together = [['metrictemplate', 'ostag']]
+
+    def __str__(self):
+        return u'%s (%s)' % (self.metrictemplate.name, self.ostag.name)
+
+
+def import_index_entries(histories):
+    """
+    Returns (metric template id, OS tag id, probe version id) for given
+    history entries, which should be ordered from the newest to the oldest.
+    """
+    entries = dict()
+    for history in histories:
+        if not history.probekey:
+            continue
+
+        for repo in history.probekey.package.repos.all():
+            key = (history.object_id_id, repo.tag_id)
+            if key not in entries:
+                entries[key] = history.probekey_id
+
+    return [(key[0], key[1], value) for key, value in entries.items()]
+
+
+def update_import_index(metrictemplates=None, probekeys=None, packages=None):
+    """
+    Rebuilds index entries of metric templates with given ids, or of those
+    whose history refers to given probe versions or packages. If nothing is
+    given, whole index is rebuilt.
+    """
+    histories = MetricTemplateHistory.objects.all()
+
+    if metrictemplates is not None:
+        histories = histories.filter(object_id__in=metrictemplates)
+
+    elif probekeys is not None or packages is not None:
+        metrictemplates = _affected_metrictemplates(
+            probekeys=probekeys, packages=packages
+        )
+
+        if not metrictemplates:
+            return
+
+        histories = histories.filter(object_id__in=metrictemplates)
+
+    histories = histories.select_related('probekey__package').prefetch_related(
+        Prefetch('probekey__package__repos', queryset=YumRepo.objects.only(
+            'id', 'tag_id'
+        ))
+    ).order_by('-date_created', '-id')
+
+    entries = [
+        MetricTemplateImportIndex(
+            metrictemplate_id=mt_id, ostag_id=ostag_id, probekey_id=pk_id
+        ) for mt_id, ostag_id, pk_id in import_index_entries(histories)
+    ]
+
+    old = MetricTemplateImportIndex.objects.all()
+    if metrictemplates is not None:
+        old = old.filter(metrictemplate__in=metrictemplates)
+
+    old.delete()
+    MetricTemplateImportIndex.objects.bulk_create(entries)
+
+
+def _affected_metrictemplates(probekeys=None, packages=None):
+    histories = MetricTemplateHistory.objects.all()
+    if probekeys is not None:
+        histories = histories.filter(probekey__in=probekeys)
+
+    else:
+        histories = histories.filter(probekey__package__in=packages)
+
+    return set(histories.values_list('object_id', flat=True))
+
+
+@receiver(post_save, sender=MetricTemplateHistory)
+@receiver(post_delete, sender=MetricTemplateHistory)
+def metrictemplate_history_changed(sender, instance, **kwargs):
+    update_import_index(metrictemplates=[instance.object_id_id])
+
+
+@receiver(post_save, sender=ProbeHistory)
+def probe_history_changed(sender, instance, created, **kwargs):
+    if not created:
+        update_import_index(probekeys=[instance.id])
+
+
+@receiver(post_save, sender=YumRepo)
+def yumrepo_changed(sender, instance, created, **kwargs):
+    if not created:
+        update_import_index(packages=Package.objects.filter(repos=instance))
+
+
+# history entries of deleted probe versions are set to null, and packages
+# lose deleted repos without m2m_changed signal, so metric templates to be
+# updated are found before deletion
+@receiver(pre_delete, sender=ProbeHistory)
+def probe_history_deleting(sender, instance, **kwargs):
+    instance._import_index = _affected_metrictemplates(probekeys=[instance])
+
+
+@receiver(pre_delete, sender=YumRepo)
+def yumrepo_deleting(sender, instance, **kwargs):
+    instance._import_index = _affected_metrictemplates(
+        packages=Package.objects.filter(repos=instance)
+    )
+
+
+@receiver(post_delete, sender=ProbeHistory)
+@receiver(post_delete, sender=YumRepo)
+def import_index_source_deleted(sender, instance, **kwargs):
+    metrictemplates = getattr(instance, '_import_index', None)
+    if metrictemplates:
+        update_import_index(metrictemplates=metrictemplates)
+
+
+@receiver(m2m_changed, sender=Package.repos.through)
+def package_repos_changed(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+
+    if reverse:
+        # repo.package_set was changed
+        if pk_set:
+            update_import_index(packages=list(pk_set))
+
+        else:
+            update_import_index()
+
+    else:
+        update_import_index(packages=[instance.id])
@@ -0,0 +1,40 @@
+from django.db import models
+
+
+class Job(models.Model):
+    """
+    Long-running operation started from the UI and run by poem-runjobs
+    worker outside of the request. Jobs of all tenants are kept in public
+    schema, together with the schema they should be run in.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed')
+    )
+
+    name = models.CharField(max_length=128)
+    schema_name = models.CharField(max_length=63)
+    user = models.CharField(max_length=32)
+    args = models.TextField(default='{}')
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=PENDING, db_index=True
+    )
+    progress = models.PositiveSmallIntegerField(default=0)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    result = models.TextField(blank=True, default='')
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_started = models.DateTimeField(null=True)
+    date_finished = models.DateTimeField(null=True)
+
+    class Meta:
+        app_label = 'poem_super_admin'
+
+    def __str__(self):
+        return u'%s (%s, %s)' % (self.name, self.schema_name, self.status)
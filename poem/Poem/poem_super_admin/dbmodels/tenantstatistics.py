@@ -0,0 +1,148 @@
+import datetime
+
+from django.db import models, connection
+from django.db.models import Count, F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from Poem.poem_super_admin.models import MetricTemplate
+from Poem.tenants.models import Tenant
+
+from tenant_schemas.utils import get_public_schema_name
+
+
+class TenantStatistics(models.Model):
+    """
+    Per schema number of metrics (metric templates in public schema) and of
+    distinct probes they use, shown in the list of tenants. It is stored in
+    public schema, so the counters of all the tenants are fetched in one
+    query.
+    """
+    schema_name = models.CharField(max_length=63, unique=True)
+    metrics = models.PositiveIntegerField(default=0)
+    probes = models.PositiveIntegerField(default=0)
+    date_modified = models.DateTimeField()
+
+    class Meta:
+        app_label = 'poem_super_admin'
+
+    def __str__(self):
+        return u'%s (%s, %s)' % (self.schema_name, self.metrics, self.probes)
+
+
+def update_tenant_statistics(metrics, schema_name=None):
+    """
+    Counts metrics in given queryset and distinct probes they use, stores the
+    counters for the schema and returns them. It is used after changes made
+    in bulk; single objects adjust the counters on their own signals.
+    """
+    if not schema_name:
+        schema_name = connection.schema_name
+
+    counts = metrics.aggregate(
+        metrics=Count('id'), probes=Count('probekey', distinct=True)
+    )
+    counts['date_modified'] = datetime.datetime.now()
+
+    updated = TenantStatistics.objects.filter(
+        schema_name=schema_name
+    ).update(**counts)
+
+    if not updated:
+        TenantStatistics.objects.update_or_create(
+            schema_name=schema_name, defaults=counts
+        )
+
+    return counts
+
+
+def change_tenant_statistics(metrics, probes, queryset, schema_name=None):
+    """
+    Adds given numbers to stored counters of the schema. Schema without
+    stored counters is counted from given queryset instead.
+    """
+    if not schema_name:
+        schema_name = connection.schema_name
+
+    updated = TenantStatistics.objects.filter(schema_name=schema_name).update(
+        metrics=F('metrics') + metrics, probes=F('probes') + probes,
+        date_modified=datetime.datetime.now()
+    )
+
+    if not updated:
+        update_tenant_statistics(queryset, schema_name)
+
+
+def remember_probekey(model, instance):
+    """
+    Stores probekey of the saved object as found in the DB before the save,
+    so that the change of probes in use is known after it.
+    """
+    instance._stored_probekey_id = None
+    if instance.pk:
+        instance._stored_probekey_id = model.objects.filter(
+            pk=instance.pk
+        ).values_list('probekey_id', flat=True).first()
+
+
+def _probe_in_use(model, probekey_id, instance):
+    return model.objects.filter(probekey_id=probekey_id).exclude(
+        pk=instance.pk
+    ).exists()
+
+
+def count_saved(model, instance, created, schema_name=None):
+    """
+    Adjusts counters of the schema after object of model using probes has
+    been saved.
+    """
+    old = None if created else getattr(instance, '_stored_probekey_id', None)
+    new = instance.probekey_id
+
+    probes = 0
+    if old != new:
+        if new and not _probe_in_use(model, new, instance):
+            probes += 1
+
+        if old and not _probe_in_use(model, old, instance):
+            probes -= 1
+
+    if created or probes:
+        change_tenant_statistics(
+            1 if created else 0, probes, model.objects.all(), schema_name
+        )
+
+
+def count_deleted(model, instance, schema_name=None):
+    """
+    Adjusts counters of the schema after object of model using probes has
+    been deleted.
+    """
+    probes = 0
+    if instance.probekey_id and \
+            not _probe_in_use(model, instance.probekey_id, instance):
+        probes = -1
+
+    change_tenant_statistics(-1, probes, model.objects.all(), schema_name)
+
+
+@receiver(pre_save, sender=MetricTemplate)
+def metric_template_saving(sender, instance, **kwargs):
+    remember_probekey(MetricTemplate, instance)
+
+
+@receiver(post_save, sender=MetricTemplate)
+def metric_template_saved(sender, instance, created, **kwargs):
+    count_saved(
+        MetricTemplate, instance, created, get_public_schema_name()
+    )
+
+
+@receiver(post_delete, sender=MetricTemplate)
+def metric_template_deleted(sender, instance, **kwargs):
+    count_deleted(MetricTemplate, instance, get_public_schema_name())
+
+
+@receiver(post_delete, sender=Tenant)
+def tenant_deleted(sender, instance, **kwargs):
+    TenantStatistics.objects.filter(schema_name=instance.schema_name).delete()
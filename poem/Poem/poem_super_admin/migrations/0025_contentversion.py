@@ -0,0 +1,22 @@
+# Generated by Django 2.2.19 on 2021-06-22 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poem_super_admin', '0024_metrictemplatehistory_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schema_name', models.CharField(max_length=63, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+                ('date_modified', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.19 on 2021-06-28 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poem_super_admin', '0025_contentversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+                ('schema_name', models.CharField(max_length=63)),
+                ('user', models.CharField(max_length=32)),
+                ('args', models.TextField(default='{}')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=16)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('status_code', models.PositiveSmallIntegerField(null=True)),
+                ('result', models.TextField(blank=True, default='')),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_started', models.DateTimeField(null=True)),
+                ('date_finished', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
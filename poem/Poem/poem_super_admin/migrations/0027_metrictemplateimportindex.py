@@ -0,0 +1,51 @@
+# Generated by Django 2.2.19 on 2021-06-29 09:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_import_index(apps, schema_editor):
+    from Poem.poem_super_admin.dbmodels.importindex import \
+        import_index_entries
+
+    MetricTemplateHistory = apps.get_model(
+        'poem_super_admin', 'MetricTemplateHistory'
+    )
+    MetricTemplateImportIndex = apps.get_model(
+        'poem_super_admin', 'MetricTemplateImportIndex'
+    )
+
+    histories = MetricTemplateHistory.objects.select_related(
+        'probekey__package'
+    ).prefetch_related(
+        'probekey__package__repos'
+    ).order_by('-date_created', '-id')
+
+    MetricTemplateImportIndex.objects.bulk_create([
+        MetricTemplateImportIndex(
+            metrictemplate_id=mt_id, ostag_id=ostag_id, probekey_id=pk_id
+        ) for mt_id, ostag_id, pk_id in import_index_entries(histories)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poem_super_admin', '0026_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricTemplateImportIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metrictemplate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='poem_super_admin.MetricTemplate')),
+                ('ostag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='poem_super_admin.OSTag')),
+                ('probekey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='poem_super_admin.ProbeHistory')),
+            ],
+            options={
+                'unique_together': {('metrictemplate', 'ostag')},
+            },
+        ),
+        migrations.RunPython(build_import_index, migrations.RunPython.noop),
+    ]
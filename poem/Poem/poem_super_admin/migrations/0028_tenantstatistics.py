@@ -0,0 +1,23 @@
+# Generated by Django 2.2.19 on 2021-07-05 08:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poem_super_admin', '0027_metrictemplateimportindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantStatistics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schema_name', models.CharField(max_length=63, unique=True)),
+                ('metrics', models.PositiveIntegerField(default=0)),
+                ('probes', models.PositiveIntegerField(default=0)),
+                ('date_modified', models.DateTimeField()),
+            ],
+        ),
+    ]
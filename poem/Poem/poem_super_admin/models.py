@@ -2,3 +2,7 @@ from Poem.poem_super_admin.dbmodels.history import *
 from Poem.poem_super_admin.dbmodels.yumrepos import *
 from Poem.poem_super_admin.dbmodels.probes import *
 from Poem.poem_super_admin.dbmodels.metrictemplates import *
+from Poem.poem_super_admin.dbmodels.contentversions import *
+from Poem.poem_super_admin.dbmodels.jobs import *
+from Poem.poem_super_admin.dbmodels.importindex import *
+from Poem.poem_super_admin.dbmodels.tenantstatistics import *
@@ -17,6 +17,14 @@ try:
     # General
     DEBUG = bool(config.getboolean('GENERAL', 'debug'))
     TIME_ZONE = config.get('GENERAL', 'timezone')
+    TENANT_WORKERS = config.getint('GENERAL', 'TenantWorkers', fallback=8)
+    STREAMING_THRESHOLD = config.getint(
+        'GENERAL', 'StreamingThreshold', fallback=1000
+    )
+    HISTORY_KEYFRAME_INTERVAL = config.getint(
+        'GENERAL', 'HistoryKeyframeInterval', fallback=1
+    )
+    JOB_TIMEOUT = config.getint('GENERAL', 'JobTimeout', fallback=3600)
 
     DBNAME = config.get('DATABASE', 'name')
     DBUSER = config.get('DATABASE', 'user')
@@ -44,6 +52,9 @@ try:
     HOST_CERT = config.get('SECURITY', 'HostCert')
     HOST_KEY = config.get('SECURITY', 'HostKey')
     SECRETKEY_PATH = config.get('SECURITY', 'SecretKeyPath')
+    API_KEY_CACHE_TTL = config.getint(
+        'SECURITY', 'ApiKeyCacheTTL', fallback=60
+    )
     WEBAPI_METRIC = config.get('WEBAPI', 'MetricProfile')
     WEBAPI_AGGREGATION = config.get('WEBAPI', 'AggregationProfile')
     WEBAPI_THRESHOLDS = config.get('WEBAPI', 'ThresholdsProfile')
@@ -52,6 +63,15 @@ try:
     WEBAPI_REPORTSTAGS = config.get('WEBAPI', 'ReportsTopologyTags')
     WEBAPI_REPORTSTOPOLOGYGROUPS = config.get('WEBAPI', 'ReportsTopologyGroups')
     WEBAPI_REPORTSTOPOLOGYENDPOINTS = config.get('WEBAPI', 'ReportsTopologyEndpoints')
+    WEBAPI_CACHE_TTL = config.getint('WEBAPI', 'CacheTTL', fallback=300)
+    WEBAPI_CACHE_MAX_STALE = config.getint(
+        'WEBAPI', 'CacheMaxStale', fallback=86400
+    )
+    WEBAPI_SYNC_INTERVAL = config.getint(
+        'WEBAPI', 'SyncInterval', fallback=600
+    )
+    WEBAPI_TIMEOUT = config.getint('WEBAPI', 'Timeout', fallback=180)
+    WEBAPI_RETRIES = config.getint('WEBAPI', 'Retries', fallback=3)
 
 
 except NoSectionError as e: